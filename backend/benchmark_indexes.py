@@ -0,0 +1,291 @@
+"""
+Benchmark the live-row partial indexes (migration 0003) against the
+previous index set on a seeded scratch database.
+
+Run this script from the backend directory:
+    python benchmark_indexes.py [--appointments 1000000] [--runs 5]
+
+It drops and recreates the database "<POSTGRES_DB>_bench", seeds it with
+generate_series, then runs the hot repository query shapes under
+EXPLAIN (ANALYZE, BUFFERS) with the old indexes and with the new ones, and
+prints the median execution time and the plan of each.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+from pathlib import Path
+
+import asyncpg
+
+# Add the src directory to the path
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel
+
+from src.config.database import Database
+from src.config.settings import settings
+from src.database import db  # noqa: F401  (registers the tables)
+
+
+BENCH_DB = f"{settings.POSTGRES_DB}_bench"
+
+# Indexes that 0003 replaced, recreated for the "before" run
+LEGACY_INDEXES = [
+    "CREATE INDEX idx_appointment_created_at ON appointments (created_at)",
+    "CREATE INDEX idx_delivery_created_at ON deliveries (created_at)",
+]
+LEGACY_INDEX_NAMES = ["idx_appointment_created_at", "idx_delivery_created_at"]
+
+# Sizes are formatted in as integers ({name}); asyncpg cannot infer
+# parameter types inside generate_series arithmetic
+SEED = [
+    """
+    INSERT INTO grains (name, price, created_at, updated_at)
+    SELECT 'Grain ' || g, 10 + g, now(), now() FROM generate_series(1, 5) g
+    """,
+    """
+    INSERT INTO users (name, email, password, salt, phone, address, role,
+                       account_status, created_at, updated_at)
+    SELECT 'User ' || g, 'user' || g || '@bench.local', 'x', 'x', '0', 'bench',
+           CASE WHEN g <= {warehouses} THEN 'WAREHOUSE_ADMIN' ELSE 'FARMER' END::userrole,
+           true, now() - g * interval '1 minute', now()
+    FROM generate_series(1, {warehouses} + {farmers}) g
+    """,
+    """
+    INSERT INTO warehouse (manager_id, name, location, x_float, y_float, status,
+                           created_at, updated_at)
+    SELECT g, 'Warehouse ' || g, 'bench', 0, 0, 'ACTIVE', now(), now()
+    FROM generate_series(1, {warehouses}) g
+    """,
+    """
+    INSERT INTO storagezones (warehouse_id, grain_type_id, name, total_capacity,
+                              available_capacity, status, created_at, updated_at,
+                              deleted_at)
+    SELECT 1 + (g - 1) % {warehouses}, 1 + g % 5, 'Zone ' || g, 100000, 100000,
+           CASE WHEN g % 10 = 0 THEN 'NOT_ACTIVE' ELSE 'ACTIVE' END::zonestatus,
+           now() - g * interval '1 minute', now(),
+           CASE WHEN g % 10 = 5 THEN now() END
+    FROM generate_series(1, {zones}) g
+    """,
+    """
+    INSERT INTO timeslots (zone_id, start_at, end_at, status, created_at,
+                           updated_at, deleted_at)
+    SELECT 1 + (g - 1) % {zones},
+           date_trunc('day', now()) - interval '180 days'
+               + ((g - 1) / {zones}) * interval '1 hour',
+           date_trunc('day', now()) - interval '180 days'
+               + ((g - 1) / {zones}) * interval '1 hour' + interval '30 minutes',
+           CASE WHEN g % 3 = 0 THEN 'NOT_ACTIVE' ELSE 'ACTIVE' END::timeslotstatus,
+           now(), now(),
+           CASE WHEN g % 7 = 0 THEN now() END
+    FROM generate_series(1, {zones} * {slots_per_zone}) g
+    """,
+    """
+    INSERT INTO appointments (farmer_id, zone_id, grain_type_id, timeslot_id,
+                              requested_quantity, status, created_at, updated_at,
+                              deleted_at)
+    SELECT {warehouses} + 1 + (g * 7919) % {farmers},
+           1 + (g - 1) % {zones},
+           1 + g % 5,
+           1 + (g - 1) % ({zones} * {slots_per_zone}),
+           10,
+           -- Past the first pass over the slots the slot is taken, so the
+           -- would-be live bookings are REFUSED (uq_appointment_timeslot_booked)
+           CASE WHEN g > {zones} * {slots_per_zone} AND g % 5 IN (0, 4)
+                THEN 'REFUSED'
+                ELSE (ARRAY['PENDING', 'ACCEPTED', 'CANCELLED', 'REFUSED', 'COMPLETED'])[1 + g % 5]
+           END::appointmentstatus,
+           now() - g * interval '10 seconds', now(),
+           CASE WHEN g % 5 = 1 THEN now() END
+    FROM generate_series(1, {appointments}) g
+    """,
+    """
+    INSERT INTO deliveries (appointment_id, receipt_code, total_price,
+                            created_at, updated_at, deleted_at)
+    SELECT appointment_id, 'R' || appointment_id, 100, created_at, now(),
+           CASE WHEN appointment_id % 11 = 0 THEN now() END
+    FROM appointments WHERE status = 'COMPLETED'
+    """,
+]
+
+# Hot query shapes, as issued by the repositories
+QUERIES = {
+    "appointments by farmer": """
+        SELECT * FROM appointments
+        WHERE deleted_at IS NULL AND farmer_id = :farmer_id
+        ORDER BY created_at DESC, appointment_id DESC LIMIT 100
+    """,
+    "appointments by farmer and status": """
+        SELECT * FROM appointments
+        WHERE deleted_at IS NULL AND farmer_id = :farmer_id AND status = 'PENDING'
+        ORDER BY created_at DESC, appointment_id DESC LIMIT 100
+    """,
+    "appointments of a warehouse's zones": """
+        SELECT * FROM appointments
+        WHERE deleted_at IS NULL AND zone_id IN (
+            SELECT zone_id FROM storagezones
+            WHERE deleted_at IS NULL AND warehouse_id = 1)
+        ORDER BY created_at DESC, appointment_id DESC LIMIT 100
+    """,
+    "appointments newest page": """
+        SELECT * FROM appointments WHERE deleted_at IS NULL
+        ORDER BY created_at DESC, appointment_id DESC LIMIT 100
+    """,
+    "appointment by timeslot": """
+        SELECT * FROM appointments
+        WHERE deleted_at IS NULL AND timeslot_id = :timeslot_id
+    """,
+    "available timeslots of a zone": """
+        SELECT * FROM timeslots
+        WHERE deleted_at IS NULL AND zone_id = :zone_id AND status = 'ACTIVE'
+          AND start_at > now() - interval '90 days'
+        ORDER BY start_at, time_id LIMIT 100
+    """,
+    "zones of a warehouse": """
+        SELECT * FROM storagezones
+        WHERE deleted_at IS NULL AND warehouse_id = 1
+        ORDER BY created_at DESC, zone_id DESC LIMIT 100
+    """,
+    "deliveries newest page": """
+        SELECT * FROM deliveries WHERE deleted_at IS NULL
+        ORDER BY created_at DESC, delivery_id DESC LIMIT 100
+    """,
+    "delivery by appointment": """
+        SELECT * FROM deliveries
+        WHERE deleted_at IS NULL AND appointment_id = :appointment_id
+    """,
+}
+
+
+def live_indexes():
+    """Indexes added by 0003 (partial, not the unique slot index from 0002)"""
+    indexes = []
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            if (
+                index.dialect_options["postgresql"]["where"] is not None
+                and not index.unique
+            ):
+                indexes.append(index)
+    return indexes
+
+
+def describe_plan(node: dict) -> str:
+    """Compact one-line plan: node types and the indexes they use"""
+    label = node["Node Type"]
+    if "Index Name" in node:
+        direction = " Backward" if node.get("Scan Direction") == "Backward" else ""
+        label += f"{direction} ({node['Index Name']})"
+    children = [describe_plan(child) for child in node.get("Plans", [])]
+    if children:
+        label += " > " + ", ".join(children)
+    return label
+
+
+async def explain(conn, sql: str, params: dict, runs: int):
+    timings = []
+    plan = None
+    # One warm-up run so both sides start with a hot cache
+    for _ in range(runs + 1):
+        result = await conn.execute(
+            text("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql), params
+        )
+        raw = result.scalar_one()
+        output = (json.loads(raw) if isinstance(raw, str) else raw)[0]
+        timings.append(output["Execution Time"])
+        plan = output["Plan"]
+    return statistics.median(timings[1:]), describe_plan(plan)
+
+
+async def run_queries(conn, params: dict, runs: int) -> dict:
+    await conn.execute(text("ANALYZE"))
+    results = {}
+    for name, sql in QUERIES.items():
+        results[name] = await explain(conn, sql, params, runs)
+    return results
+
+
+async def recreate_database() -> None:
+    conn = await asyncpg.connect(f"{Database.BASE_URL}/postgres")
+    await conn.execute(f'DROP DATABASE IF EXISTS "{BENCH_DB}";')
+    await conn.execute(f'CREATE DATABASE "{BENCH_DB}";')
+    await conn.close()
+
+
+async def benchmark(args) -> None:
+    print(f"Seeding {BENCH_DB} ...")
+    await recreate_database()
+    engine = create_async_engine(f"{Database.SQLALCHEMY_URL}/{BENCH_DB}")
+
+    sizes = {
+        "farmers": args.farmers,
+        "warehouses": args.warehouses,
+        "zones": args.warehouses * args.zones_per_warehouse,
+        "slots_per_zone": args.slots_per_zone,
+        "appointments": args.appointments,
+    }
+
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+        for sql in SEED:
+            await conn.execute(text(sql.format(**sizes)))
+
+    params = {
+        "farmer_id": sizes["warehouses"] + 1,
+        "timeslot_id": 1,
+        "zone_id": 1,
+        "appointment_id": 5,
+    }
+
+    async with engine.begin() as conn:
+        # Before: the index set of revision 0002
+        for index in live_indexes():
+            await conn.execute(text(f"DROP INDEX {index.name}"))
+        for sql in LEGACY_INDEXES:
+            await conn.execute(text(sql))
+        before = await run_queries(conn, params, args.runs)
+
+        # After: revision 0003
+        for name in LEGACY_INDEX_NAMES:
+            await conn.execute(text(f"DROP INDEX {name}"))
+        for index in live_indexes():
+            await conn.run_sync(lambda sync_conn, index=index: index.create(sync_conn))
+        after = await run_queries(conn, params, args.runs)
+
+    await engine.dispose()
+
+    print(
+        f"\n{sizes['appointments']} appointments, {sizes['zones']} zones, "
+        f"{sizes['zones'] * sizes['slots_per_zone']} time slots, "
+        f"median of {args.runs} runs\n"
+    )
+    for name in QUERIES:
+        before_ms, before_plan = before[name]
+        after_ms, after_plan = after[name]
+        speedup = before_ms / after_ms if after_ms else float("inf")
+        print(f"{name}: {before_ms:.3f} ms -> {after_ms:.3f} ms ({speedup:.1f}x)")
+        print(f"    before: {before_plan}")
+        print(f"    after:  {after_plan}")
+
+    if not args.keep:
+        conn = await asyncpg.connect(f"{Database.BASE_URL}/postgres")
+        await conn.execute(f'DROP DATABASE IF EXISTS "{BENCH_DB}";')
+        await conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--farmers", type=int, default=20000)
+    parser.add_argument("--warehouses", type=int, default=50)
+    parser.add_argument("--zones-per-warehouse", type=int, default=10)
+    parser.add_argument("--slots-per-zone", type=int, default=1000)
+    parser.add_argument("--appointments", type=int, default=1000000)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--keep", action="store_true", help="keep the scratch database afterwards"
+    )
+    asyncio.run(benchmark(parser.parse_args()))
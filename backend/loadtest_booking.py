@@ -0,0 +1,214 @@
+"""
+Concurrency load test of appointment booking: many farmers race for the
+same time slot and exactly one of them must get it.
+
+Run this script from the backend directory:
+    python loadtest_booking.py [--concurrency 500] [--slots 10]
+
+It drops and recreates the database "<POSTGRES_DB>_loadtest", seeds one
+zone with --slots open time slots, then for each slot fires --concurrency
+simultaneous AppointementService.create_appointment calls, each on its own
+session. It checks that every slot has exactly one winner, both in the
+responses and in the appointments table, and prints latency percentiles
+over all booking attempts.
+"""
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import asyncpg
+
+# Add the src directory to the path
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlmodel import SQLModel
+
+from src.config.database import Database
+from src.config.settings import settings
+from src.database import db  # noqa: F401  (registers the tables)
+from src.database.db import AppointmentStatus
+from src.models.appointment import AppointmentCreate
+from src.repositories.appointment import AppointmentRepo
+from src.services.appointment import AppointementService
+
+
+LOADTEST_DB = f"{settings.POSTGRES_DB}_loadtest"
+
+# Sizes are formatted in as integers ({name}), as in benchmark_indexes.py
+SEED = [
+    """
+    INSERT INTO grains (name, price, created_at, updated_at)
+    VALUES ('Wheat', 10, now(), now())
+    """,
+    """
+    INSERT INTO users (name, email, password, salt, phone, address, role,
+                       account_status, created_at, updated_at)
+    SELECT 'User ' || g, 'user' || g || '@loadtest.local', 'x', 'x', '0', 'loadtest',
+           CASE WHEN g = 1 THEN 'WAREHOUSE_ADMIN' ELSE 'FARMER' END::userrole,
+           true, now(), now()
+    FROM generate_series(1, 1 + {concurrency}) g
+    """,
+    """
+    INSERT INTO warehouse (manager_id, name, location, x_float, y_float, status,
+                           created_at, updated_at)
+    VALUES (1, 'Warehouse', 'loadtest', 0, 0, 'ACTIVE', now(), now())
+    """,
+    """
+    INSERT INTO storagezones (warehouse_id, grain_type_id, name, total_capacity,
+                              available_capacity, status, created_at, updated_at)
+    VALUES (1, 1, 'Zone', 1000000000, 1000000000, 'ACTIVE', now(), now())
+    """,
+    """
+    INSERT INTO timeslots (zone_id, start_at, end_at, status, created_at, updated_at)
+    SELECT 1,
+           date_trunc('day', now()) + interval '1 day' + g * interval '1 hour',
+           date_trunc('day', now()) + interval '1 day' + g * interval '1 hour'
+               + interval '30 minutes',
+           'ACTIVE', now(), now()
+    FROM generate_series(1, {slots}) g
+    """,
+]
+
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile of values"""
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+async def book(sessionmaker, farmer_id: int, timeslot_id: int, start: asyncio.Event):
+    """One booking attempt; returns (outcome, seconds)"""
+    data = AppointmentCreate(
+        farmer_id=farmer_id,
+        zone_id=1,
+        grain_type_id=1,
+        timeslot_id=timeslot_id,
+        requested_quantity=10,
+        status=AppointmentStatus.PENDING,
+    )
+    await start.wait()
+    began = time.perf_counter()
+    async with sessionmaker() as session:
+        try:
+            await AppointementService.create_appointment(data, session, farmer_id)
+            outcome = "booked"
+        except AppointmentRepo.SlotAlreadyBooked:
+            outcome = "conflict"
+        except Exception as e:
+            outcome = f"error: {getattr(e, 'detail', e)}"
+    return outcome, time.perf_counter() - began
+
+
+async def recreate_database() -> None:
+    conn = await asyncpg.connect(f"{Database.BASE_URL}/postgres")
+    await conn.execute(f'DROP DATABASE IF EXISTS "{LOADTEST_DB}";')
+    await conn.execute(f'CREATE DATABASE "{LOADTEST_DB}";')
+    await conn.close()
+
+
+async def loadtest(args) -> bool:
+    print(f"Seeding {LOADTEST_DB} ...")
+    await recreate_database()
+    engine = create_async_engine(
+        f"{Database.SQLALCHEMY_URL}/{LOADTEST_DB}",
+        pool_size=args.pool_size,
+        max_overflow=0,
+        pool_timeout=300,
+    )
+
+    sizes = {"concurrency": args.concurrency, "slots": args.slots}
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+        for sql in SEED:
+            await conn.execute(text(sql.format(**sizes)))
+
+    sessionmaker = async_sessionmaker(
+        engine, class_=AsyncSession, expire_on_commit=False
+    )
+
+    latencies = []
+    errors = []
+    ok = True
+    began = time.perf_counter()
+    for timeslot_id in range(1, args.slots + 1):
+        start = asyncio.Event()
+        attempts = [
+            asyncio.create_task(book(sessionmaker, farmer_id, timeslot_id, start))
+            for farmer_id in range(2, 2 + args.concurrency)
+        ]
+        # Let every task reach the barrier, then release them together
+        await asyncio.sleep(0)
+        start.set()
+        results = await asyncio.gather(*attempts)
+
+        winners = sum(1 for outcome, _ in results if outcome == "booked")
+        errors.extend(outcome for outcome, _ in results if outcome.startswith("error"))
+        latencies.extend(seconds for _, seconds in results)
+        if winners != 1:
+            ok = False
+            print(f"slot {timeslot_id}: {winners} bookings succeeded, expected 1")
+    elapsed = time.perf_counter() - began
+
+    async with engine.connect() as conn:
+        result = await conn.execute(
+            text(
+                """
+                SELECT timeslot_id, count(*) FROM appointments
+                WHERE deleted_at IS NULL
+                GROUP BY timeslot_id HAVING count(*) <> 1
+                """
+            )
+        )
+        for timeslot_id, count in result.all():
+            ok = False
+            print(f"slot {timeslot_id}: {count} appointments stored, expected 1")
+        booked = await conn.execute(
+            text("SELECT count(*) FROM timeslots WHERE status = 'NOT_ACTIVE'")
+        )
+        closed = booked.scalar_one()
+        if closed != args.slots:
+            ok = False
+            print(f"{closed} of {args.slots} slots closed")
+
+    await engine.dispose()
+
+    attempts = len(latencies)
+    ms = [seconds * 1000 for seconds in latencies]
+    print(
+        f"\n{args.slots} slots x {args.concurrency} concurrent bookings "
+        f"({attempts} attempts, pool of {args.pool_size}) in {elapsed:.2f} s, "
+        f"{attempts / elapsed:.0f} attempts/s"
+    )
+    print(
+        f"latency: p50 {percentile(ms, 50):.1f} ms, p95 {percentile(ms, 95):.1f} ms, "
+        f"p99 {percentile(ms, 99):.1f} ms, max {max(ms):.1f} ms, "
+        f"mean {statistics.mean(ms):.1f} ms"
+    )
+    if errors:
+        ok = False
+        print(f"{len(errors)} attempts failed unexpectedly, e.g. {errors[0]}")
+    print("PASS: exactly one booking per slot" if ok else "FAIL")
+
+    if not args.keep:
+        conn = await asyncpg.connect(f"{Database.BASE_URL}/postgres")
+        await conn.execute(f'DROP DATABASE IF EXISTS "{LOADTEST_DB}";')
+        await conn.close()
+
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--slots", type=int, default=10)
+    parser.add_argument("--pool-size", type=int, default=20)
+    parser.add_argument(
+        "--keep", action="store_true", help="keep the scratch database afterwards"
+    )
+    sys.exit(0 if asyncio.run(loadtest(parser.parse_args())) else 1)
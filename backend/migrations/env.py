@@ -0,0 +1,65 @@
+import asyncio
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import inspect, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+from sqlmodel import SQLModel
+
+from src.config.database import Database
+from src.config.settings import settings
+import src.database.db  # noqa: F401 - registers the tables on SQLModel.metadata
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = SQLModel.metadata
+DATABASE_URL = f"{Database.SQLALCHEMY_URL}/{settings.POSTGRES_DB}"
+
+# Serializes concurrent `alembic upgrade` runs (several containers starting at once)
+MIGRATION_LOCK_ID = 727_001
+
+# Schema the old create_all startup produced (see 0001_baseline)
+BASELINE_REVISION = "0001"
+
+
+def run_migrations_offline() -> None:
+    """Emit the migration SQL without connecting to the database"""
+    context.configure(
+        url=DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def do_run_migrations(connection) -> None:
+    context.configure(connection=connection, target_metadata=target_metadata)
+    with context.begin_transaction():
+        connection.execute(
+            text("SELECT pg_advisory_xact_lock(:lock_id)"),
+            {"lock_id": MIGRATION_LOCK_ID},
+        )
+        tables = inspect(connection)
+        if not tables.has_table("alembic_version") and tables.has_table("users"):
+            # Built by the old create_all startup: adopt it instead of
+            # recreating its tables
+            context.get_context().stamp(context.script, BASELINE_REVISION)
+        context.run_migrations()
+
+
+async def run_migrations_online() -> None:
+    engine = create_async_engine(DATABASE_URL, poolclass=NullPool)
+    async with engine.connect() as connection:
+        await connection.run_sync(do_run_migrations)
+    await engine.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    asyncio.run(run_migrations_online())
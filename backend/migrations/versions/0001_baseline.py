@@ -0,0 +1,223 @@
+"""baseline schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+
+Matches the schema previously created by SQLModel.metadata.create_all.
+Databases bootstrapped that way are stamped with this revision instead of
+upgraded; env.py does it when it finds tables but no alembic_version.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+user_role = sa.Enum("FARMER", "WAREHOUSE_ADMIN", "ADMIN", name="userrole")
+zone_status = sa.Enum("ACTIVE", "NOT_ACTIVE", name="zonestatus")
+timeslot_status = sa.Enum("ACTIVE", "NOT_ACTIVE", name="timeslotstatus")
+appointment_status = sa.Enum(
+    "PENDING", "ACCEPTED", "CANCELLED", "REFUSED", "COMPLETED",
+    name="appointmentstatus",
+)
+
+
+def upgrade() -> None:
+    op.create_table(
+        "grains",
+        sa.Column("grain_id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("price", sa.Numeric(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("deleted_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index("idx_grain_created_at", "grains", ["created_at"])
+
+    op.create_table(
+        "users",
+        sa.Column("user_id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("email", sa.String(), nullable=False, unique=True),
+        sa.Column("password", sa.String(), nullable=False),
+        sa.Column("salt", sa.String(), nullable=False),
+        sa.Column("phone", sa.String(), nullable=False),
+        sa.Column("address", sa.String(), nullable=False),
+        sa.Column("role", user_role, nullable=False),
+        sa.Column("email_verified_at", sa.DateTime(), nullable=True),
+        sa.Column("account_status", sa.Boolean(), nullable=False),
+        sa.Column("suspended_at", sa.DateTime(), nullable=True),
+        sa.Column("suspended_reason", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.Column("deleted_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("idx_user_email", "users", ["email"])
+    op.create_index("idx_user_role", "users", ["role"])
+    op.create_index("idx_user_account_status", "users", ["account_status"])
+
+    op.create_table(
+        "warehouse",
+        sa.Column("warehouse_id", sa.Integer(), primary_key=True),
+        sa.Column(
+            "manager_id", sa.Integer(), sa.ForeignKey("users.user_id"), nullable=False
+        ),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("location", sa.String(), nullable=False),
+        sa.Column("x_float", sa.Float(), nullable=False),
+        sa.Column("y_float", sa.Float(), nullable=False),
+        sa.Column("status", zone_status, nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.Column("deleted_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("idx_warehouse_manager_id", "warehouse", ["manager_id"])
+    op.create_index("idx_warehouse_status", "warehouse", ["status"])
+
+    op.create_table(
+        "storagezones",
+        sa.Column("zone_id", sa.Integer(), primary_key=True),
+        sa.Column(
+            "warehouse_id",
+            sa.Integer(),
+            sa.ForeignKey("warehouse.warehouse_id"),
+            nullable=False,
+        ),
+        sa.Column("grain_type_id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("total_capacity", sa.Integer(), nullable=False),
+        sa.Column("available_capacity", sa.Integer(), nullable=False),
+        sa.Column(
+            "status",
+            postgresql.ENUM(
+                "ACTIVE", "NOT_ACTIVE", name="zonestatus", create_type=False
+            ),
+            nullable=False,
+        ),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.Column("deleted_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("idx_storagezone_warehouse_id", "storagezones", ["warehouse_id"])
+    op.create_index(
+        "idx_storagezone_grain_type_id", "storagezones", ["grain_type_id"]
+    )
+    op.create_index("idx_storagezone_status", "storagezones", ["status"])
+
+    op.create_table(
+        "timeslot_templates",
+        sa.Column("template_id", sa.Integer(), primary_key=True),
+        sa.Column(
+            "zone_id",
+            sa.Integer(),
+            sa.ForeignKey("storagezones.zone_id"),
+            nullable=False,
+        ),
+        sa.Column("day_of_week", sa.Integer(), nullable=False),
+        sa.Column("start_time", sa.Time(), nullable=False),
+        sa.Column("end_time", sa.Time(), nullable=False),
+        sa.Column("max_appointments", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+    )
+
+    op.create_table(
+        "timeslots",
+        sa.Column("time_id", sa.Integer(), primary_key=True),
+        sa.Column(
+            "zone_id",
+            sa.Integer(),
+            sa.ForeignKey("storagezones.zone_id"),
+            nullable=False,
+        ),
+        sa.Column("start_at", sa.DateTime(), nullable=False),
+        sa.Column("end_at", sa.DateTime(), nullable=False),
+        sa.Column("status", timeslot_status, nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.Column("deleted_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("idx_timeslot_zone_id", "timeslots", ["zone_id"])
+    op.create_index("idx_timeslot_start_at", "timeslots", ["start_at"])
+    op.create_index("idx_timeslot_status", "timeslots", ["status"])
+    op.create_index("idx_timeslot_zone_start", "timeslots", ["zone_id", "start_at"])
+
+    op.create_table(
+        "appointments",
+        sa.Column("appointment_id", sa.Integer(), primary_key=True),
+        sa.Column(
+            "farmer_id", sa.Integer(), sa.ForeignKey("users.user_id"), nullable=False
+        ),
+        sa.Column(
+            "zone_id",
+            sa.Integer(),
+            sa.ForeignKey("storagezones.zone_id"),
+            nullable=False,
+        ),
+        sa.Column(
+            "grain_type_id",
+            sa.Integer(),
+            sa.ForeignKey("grains.grain_id"),
+            nullable=False,
+        ),
+        sa.Column(
+            "timeslot_id",
+            sa.Integer(),
+            sa.ForeignKey("timeslots.time_id"),
+            nullable=False,
+        ),
+        sa.Column("requested_quantity", sa.Integer(), nullable=False),
+        sa.Column("status", appointment_status, nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.Column("deleted_at", sa.DateTime(), nullable=True),
+    )
+    op.create_index("idx_appointment_farmer_id", "appointments", ["farmer_id"])
+    op.create_index("idx_appointment_zone_id", "appointments", ["zone_id"])
+    op.create_index("idx_appointment_timeslot_id", "appointments", ["timeslot_id"])
+    op.create_index("idx_appointment_status", "appointments", ["status"])
+    op.create_index("idx_appointment_created_at", "appointments", ["created_at"])
+
+    op.create_table(
+        "deliveries",
+        sa.Column("delivery_id", sa.Integer(), primary_key=True),
+        sa.Column(
+            "appointment_id",
+            sa.Integer(),
+            sa.ForeignKey("appointments.appointment_id"),
+            nullable=False,
+        ),
+        sa.Column("receipt_code", sa.String(), nullable=False),
+        sa.Column("total_price", sa.Numeric(), nullable=False),
+        sa.Column("deleted_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index(
+        "idx_delivery_appointment_id", "deliveries", ["appointment_id"]
+    )
+    op.create_index("idx_delivery_receipt_code", "deliveries", ["receipt_code"])
+    op.create_index("idx_delivery_created_at", "deliveries", ["created_at"])
+
+
+def downgrade() -> None:
+    op.drop_table("deliveries")
+    op.drop_table("appointments")
+    op.drop_table("timeslots")
+    op.drop_table("timeslot_templates")
+    op.drop_table("storagezones")
+    op.drop_table("warehouse")
+    op.drop_table("users")
+    op.drop_table("grains")
+
+    appointment_status.drop(op.get_bind(), checkfirst=True)
+    timeslot_status.drop(op.get_bind(), checkfirst=True)
+    zone_status.drop(op.get_bind(), checkfirst=True)
+    user_role.drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,60 @@
+"""unique live timeslot per zone and start time
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+
+Existing duplicates are folded into the oldest slot first: their
+appointments are moved onto it and the extra slots are soft-deleted.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(
+        """
+        CREATE TEMP TABLE timeslot_dupes ON COMMIT DROP AS
+        SELECT time_id,
+               min(time_id) OVER (PARTITION BY zone_id, start_at) AS keep_id
+        FROM timeslots
+        WHERE deleted_at IS NULL
+        """
+    )
+    op.execute(
+        """
+        UPDATE appointments a
+        SET timeslot_id = d.keep_id
+        FROM timeslot_dupes d
+        WHERE a.timeslot_id = d.time_id AND d.time_id <> d.keep_id
+        """
+    )
+    op.execute(
+        """
+        UPDATE timeslots t
+        SET deleted_at = now() AT TIME ZONE 'utc'
+        FROM timeslot_dupes d
+        WHERE t.time_id = d.time_id AND d.time_id <> d.keep_id
+        """
+    )
+
+    op.drop_index("idx_timeslot_zone_start", table_name="timeslots")
+    op.create_index(
+        "uq_timeslot_zone_start",
+        "timeslots",
+        ["zone_id", "start_at"],
+        unique=True,
+        postgresql_where=sa.text("deleted_at IS NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_timeslot_zone_start", table_name="timeslots")
+    op.create_index("idx_timeslot_zone_start", "timeslots", ["zone_id", "start_at"])
@@ -0,0 +1,64 @@
+"""partial indexes on live rows
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+
+Repository queries always filter deleted_at IS NULL, so the listing and
+lookup indexes below skip soft-deleted rows. The plain created_at indexes
+are superseded by the (created_at, id) ones. The single-column foreign key
+indexes stay: foreign key checks do not filter on deleted_at.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+LIVE_ROWS = sa.text("deleted_at IS NULL")
+
+LIVE_INDEXES = [
+    ("idx_warehouse_manager_live", "warehouse", ["manager_id"]),
+    (
+        "idx_storagezone_warehouse_live",
+        "storagezones",
+        ["warehouse_id", "created_at", "zone_id"],
+    ),
+    ("idx_storagezone_grain_status_live", "storagezones", ["grain_type_id", "status"]),
+    ("idx_timeslot_zone_status_live", "timeslots", ["zone_id", "status", "start_at"]),
+    (
+        "idx_appointment_farmer_live",
+        "appointments",
+        ["farmer_id", "status", "created_at", "appointment_id"],
+    ),
+    (
+        "idx_appointment_zone_live",
+        "appointments",
+        ["zone_id", "created_at", "appointment_id"],
+    ),
+    ("idx_appointment_timeslot_live", "appointments", ["timeslot_id"]),
+    ("idx_appointment_created_live", "appointments", ["created_at", "appointment_id"]),
+    ("idx_delivery_appointment_live", "deliveries", ["appointment_id"]),
+    ("idx_delivery_created_live", "deliveries", ["created_at", "delivery_id"]),
+]
+
+
+def upgrade() -> None:
+    for name, table, columns in LIVE_INDEXES:
+        op.create_index(name, table, columns, postgresql_where=LIVE_ROWS)
+
+    op.drop_index("idx_appointment_created_at", table_name="appointments")
+    op.drop_index("idx_delivery_created_at", table_name="deliveries")
+
+
+def downgrade() -> None:
+    op.create_index("idx_delivery_created_at", "deliveries", ["created_at"])
+    op.create_index("idx_appointment_created_at", "appointments", ["created_at"])
+
+    for name, table, _ in reversed(LIVE_INDEXES):
+        op.drop_index(name, table_name=table)
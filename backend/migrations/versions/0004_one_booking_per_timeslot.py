@@ -0,0 +1,51 @@
+"""at most one booking per time slot
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+
+Slots that already hold several bookings keep the oldest one; the later
+ones are marked REFUSED so the farmers see them as not honoured.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+LIVE_BOOKINGS = "deleted_at IS NULL AND status NOT IN ('CANCELLED', 'REFUSED')"
+
+
+def upgrade() -> None:
+    op.execute(
+        f"""
+        UPDATE appointments a
+        SET status = 'REFUSED', updated_at = now() AT TIME ZONE 'utc'
+        FROM (
+            SELECT appointment_id,
+                   row_number() OVER (
+                       PARTITION BY timeslot_id ORDER BY created_at, appointment_id
+                   ) AS rank
+            FROM appointments
+            WHERE {LIVE_BOOKINGS}
+        ) d
+        WHERE a.appointment_id = d.appointment_id AND d.rank > 1
+        """
+    )
+
+    op.create_index(
+        "uq_appointment_timeslot_booked",
+        "appointments",
+        ["timeslot_id"],
+        unique=True,
+        postgresql_where=sa.text(LIVE_BOOKINGS),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_appointment_timeslot_booked", table_name="appointments")
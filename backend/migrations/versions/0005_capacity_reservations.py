@@ -0,0 +1,58 @@
+"""capacity reservation ledger
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+
+Accepting an appointment now reserves its quantity from the zone's
+available_capacity; cancel and refuse release it, delivery settles it.
+No rows are backfilled: appointments accepted before this revision hold
+no reservation, so cancelling them leaves available_capacity alone, as
+it did before.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+reservation_status = sa.Enum(
+    "RESERVED", "RELEASED", "SETTLED", name="reservationstatus"
+)
+
+
+def upgrade() -> None:
+    op.create_table(
+        "capacity_reservations",
+        sa.Column("reservation_id", sa.Integer(), primary_key=True),
+        sa.Column(
+            "appointment_id",
+            sa.Integer(),
+            sa.ForeignKey("appointments.appointment_id"),
+            nullable=False,
+            unique=True,
+        ),
+        sa.Column(
+            "zone_id",
+            sa.Integer(),
+            sa.ForeignKey("storagezones.zone_id"),
+            nullable=False,
+        ),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+        sa.Column("status", reservation_status, nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index(
+        "idx_reservation_zone_status", "capacity_reservations", ["zone_id", "status"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("capacity_reservations")
+    reservation_status.drop(op.get_bind(), checkfirst=True)
@@ -1,8 +1,17 @@
 import asyncpg
+import logging
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Optional
 from sqlmodel import SQLModel
 from src.config.settings import settings
 
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy import event, exc, Select
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 RED = "\033[31m"
 GREEN = "\033[32m"
@@ -10,6 +19,8 @@ BLUE = "\033[34m"
 YELLOW = "\033[33m"
 RESET = "\033[0m"
 
+logger = logging.getLogger(__name__)
+
 
 class Database:
     BASE_URL = f"postgresql://{settings.POSTGRES_USER}:{settings.POSTGRES_PASSWORD.get_secret_value()}@{settings.POSTGRES_HOST}:{settings.POSTGRES_PORT}"
@@ -33,38 +44,295 @@ class Database:
 
     @staticmethod
     async def init_db():
-        engine = create_async_engine(
-            f"{Database.SQLALCHEMY_URL}/{settings.POSTGRES_DB}"
-        )
+        engine = await ConManager.get_engine(settings.POSTGRES_DB)
         async with engine.begin() as conn:
             await conn.run_sync(SQLModel.metadata.create_all)
-        await engine.dispose()
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long callers wait to get a connection.
+
+    Measured around connect(), once per checkout: _do_get calls itself when
+    it retries or opens an overflow connection, so timing it would count
+    those checkouts several times.
+    """
+
+    checkouts: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+    timeouts: int = 0
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            self.checkouts += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+
+
+# Per-request routing state, set by the read-your-writes middleware
+_routing_state: ContextVar[Optional[dict]] = ContextVar("db_routing_state", default=None)
+
+
+class RoutingSession(Session):
+    """Session that sends plain SELECTs to the replica and everything else to the primary.
+
+    Once the session writes (flush, DML, locking read, raw SQL) it stays on
+    the primary so the rest of the request reads its own writes.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        replica = ConManager._replica_engine
+        state = _routing_state.get()
+
+        if replica is None or self.info.get("use_primary"):
+            return super().get_bind(mapper, clause=clause, **kwargs)
+
+        if state is not None and state["pinned"]:
+            self.info["use_primary"] = True
+            return super().get_bind(mapper, clause=clause, **kwargs)
+
+        is_plain_read = (
+            isinstance(clause, Select)
+            and clause._for_update_arg is None
+            and not self._flushing
+        )
+        if not is_plain_read:
+            self.info["use_primary"] = True
+            if state is not None:
+                state["wrote"] = True
+            return super().get_bind(mapper, clause=clause, **kwargs)
+
+        return replica.sync_engine
+
+
+# Per-request statement counters, set by the query stats middleware
+_query_state: ContextVar[Optional[dict]] = ContextVar("db_query_state", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _query_state.get() is not None:
+        context._query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    state = _query_state.get()
+    if state is None or not hasattr(context, "_query_start"):
+        return
+    state["count"] += 1
+    state["time"] += time.perf_counter() - context._query_start
+    # Statements are parameterized, so the SQL text is the query shape
+    state["shapes"][statement] += 1
 
 
 class ConManager:
     _engine = None
+    _replica_engine = None
+    _route_query_stats: dict = {}
+
+    @staticmethod
+    def engine_options() -> dict:
+        """Engine and pool profile driven by settings"""
+        return {
+            "echo": settings.DB_ECHO,
+            "poolclass": InstrumentedPool,
+            "pool_size": settings.DB_POOL_SIZE,
+            "max_overflow": settings.DB_MAX_OVERFLOW,
+            "pool_timeout": settings.DB_POOL_TIMEOUT,
+            "pool_recycle": settings.DB_POOL_RECYCLE,
+            "pool_pre_ping": settings.DB_POOL_PRE_PING,
+            "connect_args": {
+                "statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE
+            },
+        }
 
     @staticmethod
     async def get_engine(db_name: str = settings.POSTGRES_DB):
         if ConManager._engine is None:
-            if ConManager._engine is None:
-                DATABASE_URL = (
-                    f"postgresql+asyncpg://{settings.POSTGRES_USER}:{settings.POSTGRES_PASSWORD.get_secret_value()}"
-                    f"@{settings.POSTGRES_HOST}:{settings.POSTGRES_PORT}/{db_name}"
-                )
-                print(
-                    f"{BLUE}[INFO]{RESET} Initializing SQLModel engine for DB: {db_name} ..."
+            DATABASE_URL = (
+                f"postgresql+asyncpg://{settings.POSTGRES_USER}:{settings.POSTGRES_PASSWORD.get_secret_value()}"
+                f"@{settings.POSTGRES_HOST}:{settings.POSTGRES_PORT}/{db_name}"
+            )
+            print(
+                f"{BLUE}[INFO]{RESET} Initializing SQLModel engine for DB: {db_name} ..."
+            )
+            ConManager._engine = create_async_engine(
+                DATABASE_URL, **ConManager.engine_options()
+            )
+            ConManager._instrument(ConManager._engine)
+            if settings.POSTGRES_REPLICA_URL is not None:
+                print(f"{BLUE}[INFO]{RESET} Initializing read replica engine ...")
+                ConManager._replica_engine = create_async_engine(
+                    settings.POSTGRES_REPLICA_URL.get_secret_value(),
+                    **ConManager.engine_options(),
                 )
-                ConManager._engine = create_async_engine(DATABASE_URL, echo=True)
+                ConManager._instrument(ConManager._replica_engine)
         return ConManager._engine
 
+    @staticmethod
+    def _instrument(engine) -> None:
+        if settings.DB_QUERY_STATS:
+            event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+    @staticmethod
+    def track_queries() -> dict:
+        """Start counting the statements of the current request"""
+        state = {"count": 0, "time": 0.0, "shapes": Counter()}
+        _query_state.set(state)
+        return state
+
+    @staticmethod
+    def record_queries(route: str, state: dict) -> list:
+        """Add a finished request to the per-route totals.
+
+        Returns the statement shapes that ran more than DB_N_PLUS_ONE_THRESHOLD
+        times, as (statement, count) pairs.
+        """
+        threshold = settings.DB_N_PLUS_ONE_THRESHOLD
+        repeated = []
+        if threshold > 0:
+            repeated = [
+                (statement, count)
+                for statement, count in state["shapes"].most_common()
+                if count > threshold
+            ]
+
+        stats = ConManager._route_query_stats.setdefault(
+            route,
+            {
+                "requests": 0,
+                "queries": 0,
+                "db_time": 0.0,
+                "max_queries": 0,
+                "n_plus_one_warnings": 0,
+            },
+        )
+        stats["requests"] += 1
+        stats["queries"] += state["count"]
+        stats["db_time"] += state["time"]
+        stats["max_queries"] = max(stats["max_queries"], state["count"])
+        if repeated:
+            stats["n_plus_one_warnings"] += 1
+        return repeated
+
+    @staticmethod
+    def query_stats() -> dict:
+        """Per-route statement counts and database time since startup"""
+        return {
+            route: {
+                "requests": s["requests"],
+                "queries": s["queries"],
+                "queries_avg": round(s["queries"] / s["requests"], 2),
+                "queries_max": s["max_queries"],
+                "db_time_total_ms": round(s["db_time"] * 1000, 3),
+                "db_time_avg_ms": round(s["db_time"] * 1000 / s["requests"], 3),
+                "n_plus_one_warnings": s["n_plus_one_warnings"],
+            }
+            for route, s in sorted(ConManager._route_query_stats.items())
+        }
+
+    @staticmethod
+    def replica_enabled() -> bool:
+        return settings.POSTGRES_REPLICA_URL is not None
+
+    @staticmethod
+    def track_request(pinned: bool) -> dict:
+        """Start routing state for the current request.
+
+        pinned=True sends every read of the request to the primary (the client
+        wrote recently). The returned dict reports whether the request wrote.
+        """
+        state = {"pinned": pinned, "wrote": False}
+        _routing_state.set(state)
+        return state
+
+    @staticmethod
+    def use_primary(session: AsyncSession) -> None:
+        """Force all further statements of this session to the primary"""
+        session.sync_session.info["use_primary"] = True
+
+    @staticmethod
+    @asynccontextmanager
+    async def unit_of_work(session: AsyncSession):
+        """Run several repository calls (made with commit=False) as one transaction.
+
+        Commits once when the block exits, rolls everything back on error.
+        A block opened inside another one on the same session joins it: only
+        the outermost block commits, then runs the after_commit callbacks.
+        """
+        depth = session.info.get("unit_of_work_depth", 0)
+        session.info["unit_of_work_depth"] = depth + 1
+        try:
+            yield session
+            if depth == 0:
+                await session.commit()
+                for callback in session.info.pop("after_commit", []):
+                    callback()
+        except Exception:
+            session.info.pop("after_commit", None)
+            await session.rollback()
+            raise
+        finally:
+            session.info["unit_of_work_depth"] = depth
+
+    @staticmethod
+    def after_commit(session: AsyncSession, callback) -> None:
+        """Run callback once the session's writes so far are committed.
+
+        Inside a unit of work that is when the outermost block commits, and
+        the callback is dropped if it rolls back; outside one the caller has
+        already committed, so it runs at once.
+        """
+        if session.info.get("unit_of_work_depth", 0) == 0:
+            callback()
+        else:
+            session.info.setdefault("after_commit", []).append(callback)
+
+    @staticmethod
+    def pool_stats() -> dict:
+        """Live statistics of the connection pools"""
+        if ConManager._engine is None:
+            return {"initialized": False}
+
+        stats = ConManager._engine_pool_stats(ConManager._engine)
+        if ConManager._replica_engine is not None:
+            stats["replica"] = ConManager._engine_pool_stats(
+                ConManager._replica_engine
+            )
+        return stats
+
+    @staticmethod
+    def _engine_pool_stats(engine) -> dict:
+        pool = engine.pool
+        checkouts = pool.checkouts
+        return {
+            "initialized": True,
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": max(pool.overflow(), 0),
+            "max_overflow": settings.DB_MAX_OVERFLOW,
+            "checkouts": checkouts,
+            "timeouts": pool.timeouts,
+            "wait_time_total_ms": round(pool.total_wait * 1000, 3),
+            "wait_time_avg_ms": round(pool.total_wait * 1000 / checkouts, 3)
+            if checkouts
+            else 0.0,
+            "wait_time_max_ms": round(pool.max_wait * 1000, 3),
+        }
+
     @staticmethod
     async def get_session() -> AsyncSession:
         engine = await ConManager.get_engine(settings.POSTGRES_DB)
-        print(
-            f"{BLUE}[INFO]{RESET} Creating a new SQLModel session for DB: {settings.POSTGRES_DB} ..."
-        )
+        logger.debug(f"Creating a new SQLModel session for DB: {settings.POSTGRES_DB}")
         async with AsyncSession(
-            engine, expire_on_commit=False
+            engine, expire_on_commit=False, sync_session_class=RoutingSession
         ) as session:  # ← Add expire_on_commit=False
             yield session
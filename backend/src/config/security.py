@@ -1,12 +1,14 @@
 from datetime import datetime, timedelta
+from typing import Optional
 
 from src.config.settings import settings
 
-from fastapi import Depends, HTTPException
+from fastapi import Depends, HTTPException, Query
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from passlib.context import CryptContext
 from src.config.database import ConManager
+from src.database.db import UserRole
 from src.repositories.user import User
 from src.repositories.user import UserRepo
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -15,6 +17,8 @@ from sqlalchemy.ext.asyncio import AsyncSession
 SECRET_KEY = settings.SECRET_KEY
 ALGORITHM = settings.ALGORITHM
 ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
+# Scope claim of events tokens; access tokens carry none
+EVENTS_TOKEN_SCOPE = "events"
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -50,10 +54,21 @@ def verify_token(token: str) -> dict | None:
         return None
 
 
+def create_events_token(user_id: int) -> str:
+    """Short-lived token that only opens the appointment events stream"""
+    expire = datetime.utcnow() + timedelta(seconds=settings.EVENTS_TOKEN_SECONDS)
+    return jwt.encode(
+        {"sub": str(user_id), "scope": EVENTS_TOKEN_SCOPE, "exp": expire},
+        settings.SECRET_KEY.get_secret_value(),
+        algorithm=settings.ALGORITHM,
+    )
+
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="user/login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="user/login", auto_error=False)
 
 
-async def get_current_user(token: str = Depends(oauth2_scheme), session: AsyncSession = Depends(ConManager.get_session)) -> User:
+def _token_user_id(token: str, scope: Optional[str] = None) -> int:
     try:
         payload = jwt.decode(
             token,
@@ -62,14 +77,47 @@ async def get_current_user(token: str = Depends(oauth2_scheme), session: AsyncSe
         )
 
         user_id = payload.get("sub")
-        if user_id is None:
+        if user_id is None or payload.get("scope") != scope:
             raise HTTPException(status_code=401, detail="Invalid token")
-        user_id = int(user_id)
+        return int(user_id)
     except (JWTError, TypeError, ValueError) as e:
         raise HTTPException(status_code=401, detail=f"Invalid token: {str(e)}")
 
+
+def access_token_user_id(token: str) -> Optional[int]:
+    """User id of a valid access token, None for anything else"""
+    try:
+        return _token_user_id(token)
+    except HTTPException:
+        return None
+
+
+async def _get_user(session: AsyncSession, user_id: int) -> User:
     try:
         user = await UserRepo.get_by_id(session, user_id)
         return user
     except UserRepo.UserNotFound:
         raise HTTPException(status_code=404, detail="User not found")
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme), session: AsyncSession = Depends(ConManager.get_session)) -> User:
+    return await _get_user(session, _token_user_id(token))
+
+
+async def get_events_user(
+    token: Optional[str] = Query(None, description="Token from POST /appointment/events/token"),
+    bearer: Optional[str] = Depends(optional_oauth2_scheme),
+    session: AsyncSession = Depends(ConManager.get_session),
+) -> User:
+    """User of the events stream, from ?token= (EventSource) or the Authorization header"""
+    if token is not None:
+        return await _get_user(session, _token_user_id(token, EVENTS_TOKEN_SCOPE))
+    if bearer is not None:
+        return await _get_user(session, _token_user_id(bearer))
+    raise HTTPException(status_code=401, detail="Not authenticated")
+
+
+async def get_current_admin(current_user: User = Depends(get_current_user)) -> User:
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user
@@ -1,3 +1,4 @@
+from typing import Literal, Optional
 from pydantic import SecretStr
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -17,6 +18,54 @@ class Settings(BaseSettings):
     POSTGRES_USER: str
     POSTGRES_PASSWORD: SecretStr
 
+    # Engine / connection pool profile
+    DB_ECHO: bool = False
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_CACHE_SIZE: int = 100
+
+    # Schema management at startup:
+    #   "migrations" - no DDL at boot, schema is managed by `alembic upgrade head`
+    #   "create_all" - create the database and tables on boot (local development)
+    DB_SCHEMA_MODE: Literal["migrations", "create_all"] = "migrations"
+
+    # Optional read replica (full postgresql+asyncpg DSN)
+    POSTGRES_REPLICA_URL: Optional[SecretStr] = None
+    # Seconds a client keeps reading from the primary after it wrote
+    DB_REPLICA_STICKY_SECONDS: int = 5
+
+    # Per-request SQL statistics (Server-Timing / X-DB-Query-Count headers)
+    DB_QUERY_STATS: bool = True
+    # Warn when one statement shape runs more than this many times in a
+    # request (likely N+1); 0 disables the check
+    DB_N_PLUS_ONE_THRESHOLD: int = 0
+
+    # Seconds aggregated appointment statistics are served from memory
+    STATS_CACHE_SECONDS: int = 30
+
+    # Where bookable time slots come from:
+    #   "pregenerated" - rows created from templates by the scheduler
+    #   "virtual" - computed from templates on read; a row is only inserted
+    #               when a slot is booked, and no generation job runs
+    TIMESLOT_MODE: Literal["pregenerated", "virtual"] = "pregenerated"
+    # Days ahead listed by /time/available in virtual mode (booking itself
+    # accepts any future template time)
+    TIMESLOT_HORIZON_DAYS: int = 28
+
+    # Seconds a zone's free-slot index is served from memory before it is
+    # rebuilt; bounds staleness for writes made by other processes (0 disables)
+    AVAILABILITY_INDEX_SECONDS: int = 10
+
+    # Seconds a stored Idempotency-Key response is replayed
+    IDEMPOTENCY_TTL_SECONDS: int = 86400
+
+    # Seconds the ?token= of GET /appointment/events is accepted; browser
+    # EventSource clients cannot send the Authorization header
+    EVENTS_TOKEN_SECONDS: int = 60
+
     # Initial admin setup
     REDIS_HOST: str
     REDIS_PORT: int
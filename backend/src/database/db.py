@@ -2,8 +2,14 @@ from typing import Optional
 from datetime import datetime,time
 from decimal import Decimal
 from enum import Enum
+from sqlalchemy import Column, text
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlmodel import Field, SQLModel, Relationship, Index
 
+# Predicate of partial indexes that only cover rows that are not soft-deleted
+LIVE_ROWS = text("deleted_at IS NULL")
+# Appointments that hold their time slot (cancelled and refused ones do not)
+LIVE_BOOKINGS = text("deleted_at IS NULL AND status NOT IN ('CANCELLED', 'REFUSED')")
 
 class UserRole(str, Enum):
     FARMER = "farmer"
@@ -34,6 +40,12 @@ class TimeSlotStatus(str, Enum):
     NOT_ACTIVE = "not_active"
 
 
+class ReservationStatus(str, Enum):
+    RESERVED = "reserved"  # held for an accepted appointment
+    RELEASED = "released"  # given back on cancel or refuse
+    SETTLED = "settled"  # grain delivered, now occupying the zone
+
+
 class User(SQLModel, table=True):
     __tablename__ = "users"
 
@@ -83,6 +95,7 @@ class Warehouse(SQLModel, table=True):
     __table_args__ = (
         Index("idx_warehouse_manager_id", "manager_id"),
         Index("idx_warehouse_status", "status"),
+        Index("idx_warehouse_manager_live", "manager_id", postgresql_where=LIVE_ROWS),
     )
 
 
@@ -109,6 +122,19 @@ class StorageZone(SQLModel, table=True):
         Index("idx_storagezone_warehouse_id", "warehouse_id"),
         Index("idx_storagezone_grain_type_id", "grain_type_id"),
         Index("idx_storagezone_status", "status"),
+        Index(
+            "idx_storagezone_warehouse_live",
+            "warehouse_id",
+            "created_at",
+            "zone_id",
+            postgresql_where=LIVE_ROWS,
+        ),
+        Index(
+            "idx_storagezone_grain_status_live",
+            "grain_type_id",
+            "status",
+            postgresql_where=LIVE_ROWS,
+        ),
     )
 
 
@@ -157,7 +183,21 @@ class TimeSlot(SQLModel, table=True):
         Index("idx_timeslot_zone_id", "zone_id"),
         Index("idx_timeslot_start_at", "start_at"),
         Index("idx_timeslot_status", "status"),
-        Index("idx_timeslot_zone_start", "zone_id", "start_at"),
+        Index(
+            "idx_timeslot_zone_status_live",
+            "zone_id",
+            "status",
+            "start_at",
+            postgresql_where=LIVE_ROWS,
+        ),
+        # One live slot per zone and start time; soft-deleted rows don't count
+        Index(
+            "uq_timeslot_zone_start",
+            "zone_id",
+            "start_at",
+            unique=True,
+            postgresql_where=LIVE_ROWS,
+        ),
     )
 
 
@@ -186,7 +226,39 @@ class Appointment(SQLModel, table=True):
         Index("idx_appointment_zone_id", "zone_id"),
         Index("idx_appointment_timeslot_id", "timeslot_id"),
         Index("idx_appointment_status", "status"),
-        Index("idx_appointment_created_at", "created_at"),
+        # Listing indexes end in (created_at, id) so a backward scan serves
+        # ORDER BY created_at DESC, id DESC and keyset cursors without a sort
+        Index(
+            "idx_appointment_farmer_live",
+            "farmer_id",
+            "status",
+            "created_at",
+            "appointment_id",
+            postgresql_where=LIVE_ROWS,
+        ),
+        Index(
+            "idx_appointment_zone_live",
+            "zone_id",
+            "created_at",
+            "appointment_id",
+            postgresql_where=LIVE_ROWS,
+        ),
+        Index(
+            "idx_appointment_timeslot_live", "timeslot_id", postgresql_where=LIVE_ROWS
+        ),
+        # At most one booking per time slot, however many requests race for it
+        Index(
+            "uq_appointment_timeslot_booked",
+            "timeslot_id",
+            unique=True,
+            postgresql_where=LIVE_BOOKINGS,
+        ),
+        Index(
+            "idx_appointment_created_live",
+            "created_at",
+            "appointment_id",
+            postgresql_where=LIVE_ROWS,
+        ),
     )
 
 
@@ -208,5 +280,50 @@ class Delivery(SQLModel, table=True):
     __table_args__ = (
         Index("idx_delivery_appointment_id", "appointment_id"),
         Index("idx_delivery_receipt_code", "receipt_code"),
-        Index("idx_delivery_created_at", "created_at"),
+        Index(
+            "idx_delivery_appointment_live", "appointment_id", postgresql_where=LIVE_ROWS
+        ),
+        Index(
+            "idx_delivery_created_live",
+            "created_at",
+            "delivery_id",
+            postgresql_where=LIVE_ROWS,
+        ),
+    )
+
+
+class CapacityReservation(SQLModel, table=True):
+    """Ledger of storage zone capacity held by accepted appointments"""
+
+    __tablename__ = "capacity_reservations"
+
+    reservation_id: Optional[int] = Field(default=None, primary_key=True)
+    appointment_id: int = Field(
+        foreign_key="appointments.appointment_id", nullable=False, unique=True
+    )
+    zone_id: int = Field(foreign_key="storagezones.zone_id", nullable=False)
+    quantity: int = Field(nullable=False)
+    status: ReservationStatus = Field(nullable=False)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    __table_args__ = (
+        Index("idx_reservation_zone_status", "zone_id", "status"),
     )
+
+
+class IdempotencyKey(SQLModel, table=True):
+    """Stored outcome of a POST sent with an Idempotency-Key header"""
+
+    __tablename__ = "idempotency_keys"
+
+    key: str = Field(primary_key=True, max_length=255)
+    user_id: int = Field(primary_key=True)
+    endpoint: str = Field(primary_key=True)
+    request_hash: str = Field(nullable=False)
+    status_code: Optional[int] = None  # NULL while the first request runs
+    response: Optional[dict] = Field(default=None, sa_column=Column(JSONB))
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    expires_at: datetime = Field(nullable=False)
+
+    __table_args__ = (Index("idx_idempotency_expires_at", "expires_at"),)
@@ -2,7 +2,9 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi import FastAPI, Request, status
 from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
-from src.config.database import Database
+from src.config.database import Database, ConManager
+from src.config.settings import settings
+from src.config.security import access_token_user_id
 
 from src.routes.user import router as user_router
 from src.routes.warehouse import router as warehouse_router
@@ -16,6 +18,7 @@ from src.routes.location import router as location_router
 from src.routes.geolocation import router as geolocation_router
 from src.routes.admin import router as admin_router
 from src.services.scheduler import setup_scheduler, shutdown_scheduler
+from src.services.events import AppointmentEventService
 
 import os
 import logging
@@ -48,14 +51,23 @@ root_logger.addHandler(stream_handler)
 async def lifespan(app: FastAPI):
     print("✅ Connected!")
 
-    await Database.create_db()
-    await Database.init_db()
+    if settings.DB_SCHEMA_MODE == "create_all":
+        await Database.create_db()
+        await Database.init_db()
+    else:
+        # Schema is owned by migrations; just warm up the pooled engine
+        await ConManager.get_engine()
 
     # Start the scheduler for time slot generation
     await setup_scheduler()
 
+    # Forward committed appointment changes to SSE subscribers
+    AppointmentEventService.start()
+
     yield
 
+    await AppointmentEventService.stop()
+
     # Shutdown scheduler on app close
     shutdown_scheduler()
 
@@ -74,6 +86,11 @@ app.add_middleware(
     allow_headers=["*"],
     expose_headers=[
         "Content-Disposition",
+        "X-Next-Cursor",
+        "Server-Timing",
+        "X-DB-Query-Count",
+        "Idempotent-Replayed",
+        "X-DB-Primary-Until",
     ],
 )
 
@@ -111,6 +128,111 @@ async def log_requests(request: Request, call_next):
         )
         raise
 
+def _record_queries(endpoint: str, state: dict) -> None:
+    repeated = ConManager.record_queries(endpoint, state)
+    for statement, count in repeated:
+        logging.getLogger("query_stats").warning(
+            f"⚠️  Possible N+1: {endpoint} ran the same statement "
+            f"{count} times: {' '.join(statement.split())[:200]}"
+        )
+
+
+async def _record_after_stream(body, endpoint: str, state: dict):
+    try:
+        async for chunk in body:
+            yield chunk
+    finally:
+        _record_queries(endpoint, state)
+
+
+# Count the SQL statements and database time of each request
+@app.middleware("http")
+async def query_stats(request: Request, call_next):
+    if not settings.DB_QUERY_STATS:
+        return await call_next(request)
+
+    state = ConManager.track_queries()
+    response = await call_next(request)
+
+    # Key by route template so metrics stay bounded; unmatched paths share one
+    route = request.scope.get("route")
+    endpoint = f"{request.method} {route.path if route is not None else '<unmatched>'}"
+
+    if "content-length" not in response.headers:
+        # Streamed body (exports, events): its queries run after the headers
+        # are sent, so it gets no headers and is recorded when the stream ends
+        response.body_iterator = _record_after_stream(
+            response.body_iterator, endpoint, state
+        )
+        return response
+
+    _record_queries(endpoint, state)
+    db_ms = state["time"] * 1000
+    response.headers["Server-Timing"] = (
+        f'db;dur={db_ms:.1f};desc="{state["count"]} queries"'
+    )
+    response.headers["X-DB-Query-Count"] = str(state["count"])
+    return response
+
+
+PRIMARY_PIN_COOKIE = "db_primary_until"
+# Same deadline for clients that do not keep cookies: they send back the
+# value of the response header on their next requests
+PRIMARY_PIN_HEADER = "X-DB-Primary-Until"
+# Pin deadlines of authenticated users who wrote, so bearer-token clients
+# (mobile app, cross-origin) are pinned even if they return neither
+_user_primary_until: dict[int, float] = {}
+
+
+def _pin_deadline(value: str | None) -> float:
+    try:
+        return float(value or 0)
+    except ValueError:
+        return 0.0
+
+
+def _bearer_user_id(request: Request) -> int | None:
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    return access_token_user_id(token)
+
+
+# Read-your-writes: after a request writes, the client reads from the primary
+# for DB_REPLICA_STICKY_SECONDS so it never sees replica lag on its own data
+@app.middleware("http")
+async def route_reads_after_writes(request: Request, call_next):
+    if not ConManager.replica_enabled():
+        return await call_next(request)
+
+    now = time.time()
+    user_id = _bearer_user_id(request)
+    deadline = max(
+        _pin_deadline(request.cookies.get(PRIMARY_PIN_COOKIE)),
+        _pin_deadline(request.headers.get(PRIMARY_PIN_HEADER)),
+        _user_primary_until.get(user_id, 0.0),
+    )
+
+    state = ConManager.track_request(deadline > now)
+    response = await call_next(request)
+
+    if state["wrote"]:
+        now = time.time()
+        until = now + settings.DB_REPLICA_STICKY_SECONDS
+        response.set_cookie(
+            PRIMARY_PIN_COOKIE,
+            str(until),
+            max_age=settings.DB_REPLICA_STICKY_SECONDS,
+            httponly=True,
+        )
+        response.headers[PRIMARY_PIN_HEADER] = str(until)
+        if user_id is not None:
+            # Expired pins are dropped here so the map only holds recent writers
+            for expired in [u for u, t in _user_primary_until.items() if t <= now]:
+                del _user_primary_until[expired]
+            _user_primary_until[user_id] = until
+    return response
+
 # Exception handler for better error logging
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
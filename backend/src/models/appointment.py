@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field, ConfigDict
-from typing import Optional
+from pydantic import BaseModel, Field, ConfigDict, model_validator
+from typing import List, Optional
 from datetime import datetime
 from ..database.db import AppointmentStatus
 
@@ -34,7 +34,15 @@ class AppointmentCreateFromFrontend(BaseModel):
     grainTypeId: int = Field(..., gt=0, alias="grainTypeId")
     requestedQuantity: float = Field(..., gt=0, alias="requestedQuantity", description="Requested quantity in kg (kilograms)")
     warehouseZoneId: int = Field(..., gt=0, alias="warehouseZoneId")
-    timeSlotId: int = Field(..., gt=0, alias="timeSlotId")
+    timeSlotId: Optional[int] = Field(None, gt=0, alias="timeSlotId")
+    # Virtual time slots (TIMESLOT_MODE=virtual) are booked by start time
+    startAt: Optional[datetime] = Field(None, alias="startAt")
+
+    @model_validator(mode="after")
+    def check_slot(self):
+        if self.timeSlotId is None and self.startAt is None:
+            raise ValueError("timeSlotId or startAt is required")
+        return self
 
     model_config = ConfigDict(
         json_schema_extra={
@@ -67,6 +75,21 @@ class AppointmentUpdate(BaseModel):
     )
 
 
+class AppointmentBulkStatus(BaseModel):
+    """Accept or refuse many pending appointments at once (warehouse admin)"""
+    appointment_ids: List[int] = Field(..., min_length=1, max_length=500)
+    status: AppointmentStatus
+
+    model_config = ConfigDict(
+        json_schema_extra={
+            "example": {
+                "appointment_ids": [12, 15, 16],
+                "status": "accepted"
+            }
+        }
+    )
+
+
 class AppointmentResponse(AppointmentBase):
     appointment_id: int
     farmer_id: int
@@ -1,18 +1,45 @@
-from typing import Optional, List
+from typing import Optional, List, Sequence, Union
 from datetime import datetime
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete, func
+from sqlalchemy.ext.asyncio import AsyncResult, AsyncSession
+from sqlalchemy import Row, String, Text, and_, cast, select, update, delete, func
 from sqlalchemy.exc import IntegrityError
 from fastapi import status
 
-from src.database.db import Appointment, AppointmentStatus
+from src.database.db import (
+    Appointment,
+    AppointmentStatus,
+    Grain,
+    StorageZone,
+    TimeSlot,
+    Warehouse,
+)
 from src.models.appointment import AppointmentCreate
 from src.HTTPBaseException import HTTPBaseException
+from src.utils.pagination import paginate, InvalidCursor
+from src.utils.include import apply_includes, live, load, InvalidInclude
 
 
 class AppointmentRepo:
     """Repository class for Appointment operations with static methods and proper error handling"""
 
+    # Related rows that get_by_id / get_all can load with include=
+    INCLUDES = {
+        "grain": load(live(Appointment.grain_type, Grain)),
+        "timeslot": load(live(Appointment.time_slot, TimeSlot)),
+        "zone": load(live(Appointment.zone, StorageZone)),
+        "warehouse": load(
+            live(Appointment.zone, StorageZone), live(StorageZone.warehouse, Warehouse)
+        ),
+    }
+
+    # Keys count() can group by
+    GROUP_COLUMNS = {
+        "zone": Appointment.zone_id,
+        "warehouse": StorageZone.warehouse_id,
+        "status": Appointment.status,
+        "day": func.date(Appointment.created_at),
+    }
+
     class AppointmentNotFound(HTTPBaseException):
         code = status.HTTP_404_NOT_FOUND
         message = "Appointment not found"
@@ -29,6 +56,10 @@ class AppointmentRepo:
         code = status.HTTP_404_NOT_FOUND
         message = "Time slot not found"
 
+    class SlotAlreadyBooked(HTTPBaseException):
+        code = status.HTTP_409_CONFLICT
+        message = "Time slot already booked"
+
     class CreateError(HTTPBaseException):
         code = status.HTTP_500_INTERNAL_SERVER_ERROR
         message = "Failed to create appointment"
@@ -57,24 +88,51 @@ class AppointmentRepo:
         code = status.HTTP_500_INTERNAL_SERVER_ERROR
         message = "Failed to count appointments"
 
+    class NotifyError(HTTPBaseException):
+        code = status.HTTP_500_INTERNAL_SERVER_ERROR
+        message = "Failed to publish appointment changes"
+
+    class InvalidGroupBy(HTTPBaseException):
+        code = status.HTTP_400_BAD_REQUEST
+        message = "group_by must be made of zone, warehouse, status and day"
+
     class ExistsError(HTTPBaseException):
         code = status.HTTP_500_INTERNAL_SERVER_ERROR
         message = "Failed to check appointment existence"
 
+    @staticmethod
+    def _filter(stmt, columns, status, created_from, created_to):
+        """Status (one or several) and created_at range filters shared by listings"""
+        if status:
+            if isinstance(status, AppointmentStatus):
+                stmt = stmt.where(columns.status == status)
+            else:
+                stmt = stmt.where(columns.status.in_(list(status)))
+        if created_from:
+            stmt = stmt.where(columns.created_at >= created_from)
+        if created_to:
+            stmt = stmt.where(columns.created_at < created_to)
+        return stmt
+
     @staticmethod
     async def create(
-        session: AsyncSession, appointment_data: AppointmentCreate
+        session: AsyncSession, appointment_data: AppointmentCreate, commit: bool = True
     ) -> Appointment:
         """Create a new appointment"""
         try:
             appointment_dict = appointment_data.model_dump()
             orm_appointment = Appointment(**appointment_dict)
             session.add(orm_appointment)
-            await session.commit()
-            await session.refresh(orm_appointment)
+            if commit:
+                await session.commit()
+                await session.refresh(orm_appointment)
+            else:
+                await session.flush()
             return orm_appointment
-        except IntegrityError:
+        except IntegrityError as e:
             await session.rollback()
+            if "uq_appointment_timeslot_booked" in str(e.orig):
+                raise AppointmentRepo.SlotAlreadyBooked()
             raise AppointmentRepo.CreateError()
         except Exception:
             await session.rollback()
@@ -82,7 +140,9 @@ class AppointmentRepo:
 
     @staticmethod
     async def get_by_id(
-        session: AsyncSession, appointment_id: int
+        session: AsyncSession,
+        appointment_id: int,
+        include: Optional[Sequence[str]] = None,
     ) -> Optional[Appointment]:
         """Get appointment by ID"""
         try:
@@ -90,12 +150,13 @@ class AppointmentRepo:
                 Appointment.appointment_id == appointment_id,
                 Appointment.deleted_at.is_(None),
             )
+            stmt = apply_includes(stmt, AppointmentRepo.INCLUDES, include)
             result = await session.execute(stmt)
             appointment = result.scalar_one_or_none()
             if appointment is None:
                 raise AppointmentRepo.AppointmentNotFound()
             return appointment
-        except AppointmentRepo.AppointmentNotFound:
+        except (AppointmentRepo.AppointmentNotFound, InvalidInclude):
             raise
         except Exception:
             raise AppointmentRepo.GetError()
@@ -107,9 +168,21 @@ class AppointmentRepo:
         farmer_id: Optional[int] = None,
         skip: int = 0,
         limit: int = 100,
-        status: Optional[AppointmentStatus] = None,
+        status: Optional[Union[AppointmentStatus, Sequence[AppointmentStatus]]] = None,
+        cursor: Optional[str] = None,
+        manager_id: Optional[int] = None,
+        include: Optional[Sequence[str]] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
     ) -> List[Appointment]:
-        """Get all appointments with optional filters"""
+        """Get all appointments with optional filters, newest first.
+
+        Pass the cursor of the previous page instead of skip for keyset paging,
+        and names from INCLUDES to eager-load related rows. manager_id keeps
+        appointments in zones of any warehouse that user manages. status may
+        be one status or several; created_from/created_to bound created_at
+        as [from, to).
+        """
         try:
             stmt = select(Appointment).where(Appointment.deleted_at.is_(None))
 
@@ -119,15 +192,193 @@ class AppointmentRepo:
             if zone_id:
                 stmt = stmt.where(Appointment.zone_id == zone_id)
 
-            if status:
-                stmt = stmt.where(Appointment.status == status)
+            if manager_id:
+                stmt = (
+                    stmt.join(StorageZone, StorageZone.zone_id == Appointment.zone_id)
+                    .join(Warehouse, Warehouse.warehouse_id == StorageZone.warehouse_id)
+                    .where(
+                        Warehouse.manager_id == manager_id,
+                        StorageZone.deleted_at.is_(None),
+                        Warehouse.deleted_at.is_(None),
+                    )
+                )
 
-            stmt = (
-                stmt.offset(skip).limit(limit).order_by(Appointment.created_at.desc())
+            stmt = AppointmentRepo._filter(
+                stmt, Appointment.__table__.c, status, created_from, created_to
             )
 
+            stmt = paginate(
+                stmt,
+                Appointment.created_at,
+                Appointment.appointment_id,
+                limit,
+                cursor=cursor,
+                skip=skip,
+            )
+            stmt = apply_includes(stmt, AppointmentRepo.INCLUDES, include)
+
             result = await session.execute(stmt)
             return list(result.scalars().all())
+        except (InvalidCursor, InvalidInclude):
+            raise
+        except Exception:
+            raise AppointmentRepo.GetAllError()
+
+    @staticmethod
+    def _joined_select():
+        """Appointments outer-joined to grain, slot, zone and warehouse.
+
+        Projects only flat columns; related rows that are missing or
+        soft-deleted come back as NULLs.
+        """
+        a = Appointment.__table__.c
+        g = Grain.__table__.c
+        t = TimeSlot.__table__.c
+        z = StorageZone.__table__.c
+        w = Warehouse.__table__.c
+
+        return (
+            select(
+                a.appointment_id,
+                a.farmer_id,
+                a.zone_id,
+                a.grain_type_id,
+                a.timeslot_id,
+                a.requested_quantity,
+                a.status,
+                a.created_at,
+                a.updated_at,
+                g.name.label("grain_name"),
+                t.time_id,
+                t.start_at,
+                t.end_at,
+                z.name.label("zone_name"),
+                w.warehouse_id,
+                w.name.label("warehouse_name"),
+                w.location.label("warehouse_location"),
+            )
+            .select_from(Appointment.__table__)
+            .outerjoin(
+                Grain.__table__,
+                and_(g.grain_id == a.grain_type_id, g.deleted_at.is_(None)),
+            )
+            .outerjoin(
+                TimeSlot.__table__,
+                and_(t.time_id == a.timeslot_id, t.deleted_at.is_(None)),
+            )
+            .outerjoin(
+                StorageZone.__table__,
+                and_(z.zone_id == a.zone_id, z.deleted_at.is_(None)),
+            )
+            .outerjoin(
+                Warehouse.__table__,
+                and_(w.warehouse_id == z.warehouse_id, w.deleted_at.is_(None)),
+            )
+            .where(a.deleted_at.is_(None))
+        )
+
+    @staticmethod
+    async def get_farmer_feed(
+        session: AsyncSession,
+        farmer_id: int,
+        status: Optional[Union[AppointmentStatus, Sequence[AppointmentStatus]]] = None,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+    ) -> Sequence[Row]:
+        """A farmer's appointments with grain, slot, zone and warehouse, newest first.
+
+        One outer-joined Core query projecting only what the feed shows.
+        """
+        try:
+            a = Appointment.__table__.c
+            stmt = AppointmentRepo._joined_select().where(a.farmer_id == farmer_id)
+            stmt = AppointmentRepo._filter(stmt, a, status, created_from, created_to)
+            stmt = paginate(stmt, a.created_at, a.appointment_id, limit, cursor=cursor)
+
+            result = await session.execute(stmt)
+            return result.all()
+        except InvalidCursor:
+            raise
+        except Exception:
+            raise AppointmentRepo.GetAllError()
+
+    @staticmethod
+    async def stream_rows(
+        session: AsyncSession,
+        zone_id: Optional[int] = None,
+        farmer_id: Optional[int] = None,
+        manager_id: Optional[int] = None,
+        status: Optional[Union[AppointmentStatus, Sequence[AppointmentStatus]]] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        batch_size: int = 1000,
+    ) -> AsyncResult:
+        """Open a server-side cursor over the joined appointment rows, oldest first.
+
+        Same filters as get_all. Rows are fetched batch_size at a time as
+        the caller iterates, so the result set is never held in memory.
+        """
+        try:
+            a = Appointment.__table__.c
+            stmt = AppointmentRepo._joined_select()
+
+            if zone_id:
+                stmt = stmt.where(a.zone_id == zone_id)
+            if farmer_id:
+                stmt = stmt.where(a.farmer_id == farmer_id)
+            if manager_id:
+                stmt = stmt.where(Warehouse.__table__.c.manager_id == manager_id)
+            stmt = AppointmentRepo._filter(stmt, a, status, created_from, created_to)
+            stmt = stmt.order_by(a.created_at, a.appointment_id)
+
+            return await session.stream(
+                stmt.execution_options(yield_per=batch_size)
+            )
+        except Exception:
+            raise AppointmentRepo.GetAllError()
+
+    @staticmethod
+    async def get_for_update(
+        session: AsyncSession, appointment_ids: Sequence[int]
+    ) -> Sequence[Row]:
+        """Lock the given appointments and return them with their warehouse's manager.
+
+        One query for the whole batch, oldest first; the rows stay locked
+        until the caller's transaction ends. manager_id is NULL when the
+        zone or warehouse is gone.
+        """
+        try:
+            a = Appointment.__table__.c
+            z = StorageZone.__table__.c
+            w = Warehouse.__table__.c
+
+            stmt = (
+                select(
+                    a.appointment_id,
+                    a.zone_id,
+                    a.timeslot_id,
+                    a.requested_quantity,
+                    a.status,
+                    w.manager_id,
+                )
+                .select_from(Appointment.__table__)
+                .outerjoin(
+                    StorageZone.__table__,
+                    and_(z.zone_id == a.zone_id, z.deleted_at.is_(None)),
+                )
+                .outerjoin(
+                    Warehouse.__table__,
+                    and_(w.warehouse_id == z.warehouse_id, w.deleted_at.is_(None)),
+                )
+                .where(a.appointment_id.in_(appointment_ids), a.deleted_at.is_(None))
+                .order_by(a.created_at, a.appointment_id)
+                .with_for_update(of=Appointment.__table__)
+            )
+
+            result = await session.execute(stmt)
+            return result.all()
         except Exception:
             raise AppointmentRepo.GetAllError()
 
@@ -146,9 +397,29 @@ class AppointmentRepo:
         except Exception:
             raise AppointmentRepo.GetError()
 
+    @staticmethod
+    async def is_booked(session: AsyncSession, timeslot_id: int) -> bool:
+        """Whether a live, not cancelled or refused appointment holds the timeslot"""
+        try:
+            stmt = select(
+                select(Appointment.appointment_id)
+                .where(
+                    Appointment.timeslot_id == timeslot_id,
+                    Appointment.deleted_at.is_(None),
+                    Appointment.status.notin_(
+                        [AppointmentStatus.CANCELLED, AppointmentStatus.REFUSED]
+                    ),
+                )
+                .exists()
+            )
+            result = await session.execute(stmt)
+            return bool(result.scalar())
+        except Exception:
+            raise AppointmentRepo.GetError()
+
     @staticmethod
     async def update(
-        session: AsyncSession, appointment_id: int, **kwargs
+        session: AsyncSession, appointment_id: int, commit: bool = True, **kwargs
     ) -> Optional[Appointment]:
         """Update appointment by ID"""
         try:
@@ -165,7 +436,10 @@ class AppointmentRepo:
             )
 
             result = await session.execute(stmt)
-            await session.commit()
+            if commit:
+                await session.commit()
+            else:
+                await session.flush()
 
             updated = result.scalar_one_or_none()
             if updated is None:
@@ -178,7 +452,119 @@ class AppointmentRepo:
             raise AppointmentRepo.UpdateError()
 
     @staticmethod
-    async def soft_delete(session: AsyncSession, appointment_id: int) -> bool:
+    async def transition(
+        session: AsyncSession,
+        appointment_id: int,
+        to_status: AppointmentStatus,
+        from_statuses: Sequence[AppointmentStatus],
+        commit: bool = True,
+    ) -> Optional[Appointment]:
+        """Move an appointment to to_status only if it is in one of from_statuses.
+
+        A single conditional UPDATE, so of two concurrent transitions only one
+        applies. Returns None when the appointment is missing or in another
+        status.
+        """
+        try:
+            stmt = (
+                update(Appointment)
+                .where(
+                    Appointment.appointment_id == appointment_id,
+                    Appointment.status.in_(from_statuses),
+                    Appointment.deleted_at.is_(None),
+                )
+                .values(status=to_status, updated_at=datetime.utcnow())
+                .returning(Appointment)
+            )
+
+            result = await session.execute(stmt)
+            updated = result.scalar_one_or_none()
+            if commit:
+                await session.commit()
+            else:
+                await session.flush()
+            return updated
+        except Exception:
+            await session.rollback()
+            raise AppointmentRepo.UpdateError()
+
+    @staticmethod
+    async def transition_many(
+        session: AsyncSession,
+        appointment_ids: Sequence[int],
+        to_status: AppointmentStatus,
+        from_statuses: Sequence[AppointmentStatus],
+        commit: bool = True,
+    ) -> List[int]:
+        """Bulk transition; returns the ids that were in from_statuses and moved"""
+        try:
+            if not appointment_ids:
+                return []
+            stmt = (
+                update(Appointment)
+                .where(
+                    Appointment.appointment_id.in_(appointment_ids),
+                    Appointment.status.in_(from_statuses),
+                    Appointment.deleted_at.is_(None),
+                )
+                .values(status=to_status, updated_at=datetime.utcnow())
+                .returning(Appointment.appointment_id)
+            )
+
+            result = await session.execute(stmt)
+            updated = list(result.scalars().all())
+            if commit:
+                await session.commit()
+            else:
+                await session.flush()
+            return updated
+        except Exception:
+            await session.rollback()
+            raise AppointmentRepo.UpdateError()
+
+    @staticmethod
+    async def notify_changes(
+        session: AsyncSession,
+        appointment_ids: Sequence[int],
+        channel: str,
+        commit: bool = True,
+    ) -> None:
+        """Queue one NOTIFY per appointment with its current state.
+
+        Postgres delivers the notifications only if the transaction commits,
+        so call it (commit=False) in the same unit of work as the write.
+        """
+        try:
+            if not appointment_ids:
+                return
+            payload = func.json_build_object(
+                "appointment_id", Appointment.appointment_id,
+                "farmer_id", Appointment.farmer_id,
+                "zone_id", Appointment.zone_id,
+                "warehouse_id", StorageZone.warehouse_id,
+                "manager_id", Warehouse.manager_id,
+                "status", func.lower(cast(Appointment.status, String)),
+                "updated_at", Appointment.updated_at,
+            )
+            stmt = (
+                select(func.pg_notify(channel, cast(payload, Text)))
+                .select_from(Appointment)
+                .outerjoin(StorageZone, StorageZone.zone_id == Appointment.zone_id)
+                .outerjoin(Warehouse, Warehouse.warehouse_id == StorageZone.warehouse_id)
+                .where(Appointment.appointment_id.in_(appointment_ids))
+            )
+
+            await session.execute(stmt)
+            if commit:
+                await session.commit()
+            else:
+                await session.flush()
+        except Exception:
+            await session.rollback()
+            raise AppointmentRepo.NotifyError()
+
+    @staticmethod
+    async def soft_delete(session: AsyncSession, appointment_id: int, commit: bool = True) -> bool:
         """Soft delete appointment by setting deleted_at timestamp"""
         try:
             stmt = (
@@ -191,7 +577,10 @@ class AppointmentRepo:
             )
 
             result = await session.execute(stmt)
-            await session.commit()
+            if commit:
+                await session.commit()
+            else:
+                await session.flush()
 
             return result.rowcount > 0
         except Exception:
@@ -199,7 +588,7 @@ class AppointmentRepo:
             raise AppointmentRepo.SoftDeleteError()
 
     @staticmethod
-    async def hard_delete(session: AsyncSession, appointment_id: int) -> bool:
+    async def hard_delete(session: AsyncSession, appointment_id: int, commit: bool = True) -> bool:
         """Hard delete appointment from database"""
         try:
             stmt = delete(Appointment).where(
@@ -207,7 +596,10 @@ class AppointmentRepo:
             )
 
             result = await session.execute(stmt)
-            await session.commit()
+            if commit:
+                await session.commit()
+            else:
+                await session.flush()
 
             return result.rowcount > 0
         except Exception:
@@ -219,13 +611,49 @@ class AppointmentRepo:
         session: AsyncSession,
         farmer_id: Optional[int] = None,
         zone_id: Optional[int] = None,
-        status: Optional[AppointmentStatus] = None,
-    ) -> int:
-        """Count appointments with optional filters"""
+        status: Optional[Union[AppointmentStatus, Sequence[AppointmentStatus]]] = None,
+        group_by: Optional[Sequence[str]] = None,
+        manager_id: Optional[int] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+    ) -> Union[int, Sequence[Row]]:
+        """Count appointments with optional filters.
+
+        With group_by (names from GROUP_COLUMNS) this is one GROUP BY query
+        returning a row per group with its count and requested_quantity
+        (sum, in kg) instead of a single int.
+        """
         try:
-            stmt = select(func.count(Appointment.appointment_id)).where(
-                Appointment.deleted_at.is_(None)
-            )
+            if group_by and not set(group_by) <= AppointmentRepo.GROUP_COLUMNS.keys():
+                raise AppointmentRepo.InvalidGroupBy()
+
+            if group_by:
+                keys = [
+                    AppointmentRepo.GROUP_COLUMNS[name].label(name) for name in group_by
+                ]
+                stmt = select(
+                    *keys,
+                    func.count(Appointment.appointment_id).label("count"),
+                    func.coalesce(func.sum(Appointment.requested_quantity), 0).label(
+                        "requested_quantity"
+                    ),
+                )
+            else:
+                stmt = select(func.count(Appointment.appointment_id))
+            stmt = stmt.where(Appointment.deleted_at.is_(None))
+
+            if manager_id or (group_by and "warehouse" in group_by):
+                stmt = stmt.join(
+                    StorageZone, StorageZone.zone_id == Appointment.zone_id
+                ).where(StorageZone.deleted_at.is_(None))
+
+            if manager_id:
+                stmt = stmt.join(
+                    Warehouse, Warehouse.warehouse_id == StorageZone.warehouse_id
+                ).where(
+                    Warehouse.manager_id == manager_id,
+                    Warehouse.deleted_at.is_(None),
+                )
 
             if farmer_id:
                 stmt = stmt.where(Appointment.farmer_id == farmer_id)
@@ -233,11 +661,19 @@ class AppointmentRepo:
             if zone_id:
                 stmt = stmt.where(Appointment.zone_id == zone_id)
 
-            if status:
-                stmt = stmt.where(Appointment.status == status)
+            stmt = AppointmentRepo._filter(
+                stmt, Appointment.__table__.c, status, created_from, created_to
+            )
+
+            if group_by:
+                stmt = stmt.group_by(*keys).order_by(*keys)
+                result = await session.execute(stmt)
+                return result.all()
 
             result = await session.execute(stmt)
             return result.scalar_one()
+        except AppointmentRepo.InvalidGroupBy:
+            raise
         except Exception:
             raise AppointmentRepo.CountError()
 
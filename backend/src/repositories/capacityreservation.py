@@ -0,0 +1,259 @@
+from typing import Optional, List, Sequence, Tuple
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import Integer, column, select, update, func, values
+from sqlalchemy.dialects.postgresql import insert
+from fastapi import status
+
+from src.database.db import CapacityReservation, ReservationStatus, StorageZone
+from src.HTTPBaseException import HTTPBaseException
+
+
+class CapacityReservationRepo:
+    """Capacity ledger: every change to a zone's available_capacity made on
+    behalf of an appointment goes through here, in the caller's transaction.
+
+    Each step is a single guarded UPDATE, so concurrent accepts can never
+    take a zone below zero and a reservation is released or settled once.
+    """
+
+    class InsufficientCapacity(HTTPBaseException):
+        code = status.HTTP_409_CONFLICT
+        message = "Storage capacity not sufficient"
+
+    class AlreadyReserved(HTTPBaseException):
+        code = status.HTTP_409_CONFLICT
+        message = "Capacity already reserved for this appointment"
+
+    class ReserveError(HTTPBaseException):
+        code = status.HTTP_500_INTERNAL_SERVER_ERROR
+        message = "Failed to reserve storage capacity"
+
+    class ReleaseError(HTTPBaseException):
+        code = status.HTTP_500_INTERNAL_SERVER_ERROR
+        message = "Failed to release storage capacity"
+
+    class SettleError(HTTPBaseException):
+        code = status.HTTP_500_INTERNAL_SERVER_ERROR
+        message = "Failed to settle storage capacity"
+
+    @staticmethod
+    async def reserve(
+        session: AsyncSession,
+        appointment_id: int,
+        zone_id: int,
+        quantity: int,
+        commit: bool = True,
+    ) -> CapacityReservation:
+        """Take quantity from the zone's available capacity for an appointment"""
+        try:
+            now = datetime.utcnow()
+            stmt = (
+                insert(CapacityReservation)
+                .values(
+                    appointment_id=appointment_id,
+                    zone_id=zone_id,
+                    quantity=quantity,
+                    status=ReservationStatus.RESERVED,
+                    created_at=now,
+                    updated_at=now,
+                )
+                .on_conflict_do_nothing(index_elements=["appointment_id"])
+                .returning(CapacityReservation)
+            )
+            result = await session.execute(stmt)
+            reservation = result.scalar_one_or_none()
+            if reservation is None:
+                raise CapacityReservationRepo.AlreadyReserved()
+
+            stmt = (
+                update(StorageZone)
+                .where(
+                    StorageZone.zone_id == zone_id,
+                    StorageZone.deleted_at.is_(None),
+                    StorageZone.available_capacity >= quantity,
+                )
+                .values(
+                    available_capacity=StorageZone.available_capacity - quantity,
+                    updated_at=now,
+                )
+                .returning(StorageZone.zone_id)
+            )
+            result = await session.execute(stmt)
+            if result.scalar_one_or_none() is None:
+                raise CapacityReservationRepo.InsufficientCapacity()
+
+            if commit:
+                await session.commit()
+            else:
+                await session.flush()
+            return reservation
+        except (
+            CapacityReservationRepo.AlreadyReserved,
+            CapacityReservationRepo.InsufficientCapacity,
+        ):
+            await session.rollback()
+            raise
+        except Exception:
+            await session.rollback()
+            raise CapacityReservationRepo.ReserveError()
+
+    @staticmethod
+    async def reserve_many(
+        session: AsyncSession,
+        requests: Sequence[Tuple[int, int, int]],
+        commit: bool = True,
+    ) -> List[int]:
+        """Reserve capacity for many (appointment_id, zone_id, quantity) at once.
+
+        The zones are locked and requests are granted in the given order
+        while their zone has room; those that do not fit are skipped.
+        Returns the appointment ids that got a reservation.
+        """
+        try:
+            if not requests:
+                return []
+            now = datetime.utcnow()
+
+            stmt = (
+                select(StorageZone.zone_id, StorageZone.available_capacity)
+                .where(
+                    StorageZone.zone_id.in_({zone_id for _, zone_id, _ in requests}),
+                    StorageZone.deleted_at.is_(None),
+                )
+                .with_for_update()
+            )
+            result = await session.execute(stmt)
+            remaining = dict(result.all())
+
+            granted = []
+            for appointment_id, zone_id, quantity in requests:
+                if remaining.get(zone_id, -1) >= quantity:
+                    remaining[zone_id] -= quantity
+                    granted.append(
+                        {
+                            "appointment_id": appointment_id,
+                            "zone_id": zone_id,
+                            "quantity": quantity,
+                            "status": ReservationStatus.RESERVED,
+                            "created_at": now,
+                            "updated_at": now,
+                        }
+                    )
+            if not granted:
+                return []
+
+            stmt = (
+                insert(CapacityReservation)
+                .values(granted)
+                .on_conflict_do_nothing(index_elements=["appointment_id"])
+                .returning(
+                    CapacityReservation.appointment_id,
+                    CapacityReservation.zone_id,
+                    CapacityReservation.quantity,
+                )
+            )
+            result = await session.execute(stmt)
+            reserved = result.all()
+
+            taken = defaultdict(int)
+            for _, zone_id, quantity in reserved:
+                taken[zone_id] += quantity
+            if taken:
+                per_zone = values(
+                    column("zone_id", Integer), column("quantity", Integer), name="taken"
+                ).data(list(taken.items()))
+                zones = StorageZone.__table__
+                await session.execute(
+                    update(zones)
+                    .where(zones.c.zone_id == per_zone.c.zone_id)
+                    .values(
+                        available_capacity=zones.c.available_capacity
+                        - per_zone.c.quantity,
+                        updated_at=now,
+                    )
+                )
+
+            if commit:
+                await session.commit()
+            else:
+                await session.flush()
+            return [appointment_id for appointment_id, _, _ in reserved]
+        except Exception:
+            await session.rollback()
+            raise CapacityReservationRepo.ReserveError()
+
+    @staticmethod
+    async def release(
+        session: AsyncSession, appointment_id: int, commit: bool = True
+    ) -> Optional[CapacityReservation]:
+        """Give a held reservation back to its zone.
+
+        Returns None when the appointment holds nothing (never accepted,
+        already released or settled).
+        """
+        try:
+            now = datetime.utcnow()
+            stmt = (
+                update(CapacityReservation)
+                .where(
+                    CapacityReservation.appointment_id == appointment_id,
+                    CapacityReservation.status == ReservationStatus.RESERVED,
+                )
+                .values(status=ReservationStatus.RELEASED, updated_at=now)
+                .returning(CapacityReservation)
+            )
+            result = await session.execute(stmt)
+            reservation = result.scalar_one_or_none()
+
+            if reservation is not None:
+                # Capped in case an admin lowered the total meanwhile
+                stmt = (
+                    update(StorageZone)
+                    .where(StorageZone.zone_id == reservation.zone_id)
+                    .values(
+                        available_capacity=func.least(
+                            StorageZone.available_capacity + reservation.quantity,
+                            StorageZone.total_capacity,
+                        ),
+                        updated_at=now,
+                    )
+                )
+                await session.execute(stmt)
+
+            if commit:
+                await session.commit()
+            else:
+                await session.flush()
+            return reservation
+        except Exception:
+            await session.rollback()
+            raise CapacityReservationRepo.ReleaseError()
+
+    @staticmethod
+    async def settle(
+        session: AsyncSession, appointment_id: int, commit: bool = True
+    ) -> Optional[CapacityReservation]:
+        """Mark a held reservation as delivered; the capacity stays taken"""
+        try:
+            stmt = (
+                update(CapacityReservation)
+                .where(
+                    CapacityReservation.appointment_id == appointment_id,
+                    CapacityReservation.status == ReservationStatus.RESERVED,
+                )
+                .values(status=ReservationStatus.SETTLED, updated_at=datetime.utcnow())
+                .returning(CapacityReservation)
+            )
+            result = await session.execute(stmt)
+            reservation = result.scalar_one_or_none()
+
+            if commit:
+                await session.commit()
+            else:
+                await session.flush()
+            return reservation
+        except Exception:
+            await session.rollback()
+            raise CapacityReservationRepo.SettleError()
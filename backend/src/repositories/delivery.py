@@ -1,18 +1,42 @@
-from typing import Optional, List
+from typing import Optional, List, Sequence
 from datetime import datetime
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete, func
+from sqlalchemy.ext.asyncio import AsyncResult, AsyncSession
+from sqlalchemy import and_, select, update, delete, func
 from sqlalchemy.exc import IntegrityError
 from fastapi import status
 
-from src.database.db import Delivery
+from src.database.db import (
+    Appointment,
+    Delivery,
+    Grain,
+    StorageZone,
+    TimeSlot,
+    Warehouse,
+)
 from src.models.delivery import DeliveryCreate
 from src.HTTPBaseException import HTTPBaseException
+from src.utils.pagination import paginate, InvalidCursor
+from src.utils.include import apply_includes, live, load, InvalidInclude
 
 
 class DeliveryRepo:
     """Repository class for Delivery operations with static methods and proper error handling"""
 
+    # Related rows that get_by_id / get_all can load with include=;
+    # everything but the appointment itself is reached through it
+    _appointment = live(Delivery.appointment, Appointment)
+    INCLUDES = {
+        "appointment": load(_appointment),
+        "grain": load(_appointment, live(Appointment.grain_type, Grain)),
+        "timeslot": load(_appointment, live(Appointment.time_slot, TimeSlot)),
+        "zone": load(_appointment, live(Appointment.zone, StorageZone)),
+        "warehouse": load(
+            _appointment,
+            live(Appointment.zone, StorageZone),
+            live(StorageZone.warehouse, Warehouse),
+        ),
+    }
+
     class DeliveryNotFound(HTTPBaseException):
         code = status.HTTP_404_NOT_FOUND
         message = "Delivery not found"
@@ -58,14 +82,17 @@ class DeliveryRepo:
         message = "Failed to check delivery existence"
 
     @staticmethod
-    async def create(session: AsyncSession, delivery_data: DeliveryCreate) -> Delivery:
+    async def create(session: AsyncSession, delivery_data: DeliveryCreate, commit: bool = True) -> Delivery:
         """Create a new delivery"""
         try:
             delivery_dict = delivery_data.model_dump()
             orm_delivery = Delivery(**delivery_dict)
             session.add(orm_delivery)
-            await session.commit()
-            await session.refresh(orm_delivery)
+            if commit:
+                await session.commit()
+                await session.refresh(orm_delivery)
+            else:
+                await session.flush()
             return orm_delivery
         except IntegrityError:
             await session.rollback()
@@ -75,18 +102,23 @@ class DeliveryRepo:
             raise DeliveryRepo.CreateError()
 
     @staticmethod
-    async def get_by_id(session: AsyncSession, delivery_id: int) -> Optional[Delivery]:
+    async def get_by_id(
+        session: AsyncSession,
+        delivery_id: int,
+        include: Optional[Sequence[str]] = None,
+    ) -> Optional[Delivery]:
         """Get delivery by ID"""
         try:
             stmt = select(Delivery).where(
                 Delivery.delivery_id == delivery_id, Delivery.deleted_at.is_(None)
             )
+            stmt = apply_includes(stmt, DeliveryRepo.INCLUDES, include)
             result = await session.execute(stmt)
             delivery = result.scalar_one_or_none()
             if delivery is None:
                 raise DeliveryRepo.DeliveryNotFound()
             return delivery
-        except DeliveryRepo.DeliveryNotFound:
+        except (DeliveryRepo.DeliveryNotFound, InvalidInclude):
             raise
         except Exception:
             raise DeliveryRepo.GetError()
@@ -117,32 +149,136 @@ class DeliveryRepo:
         limit: int = 100,
         appointment_id: Optional[int] = None,
         farmer_id: Optional[int] = None,
+        cursor: Optional[str] = None,
+        manager_id: Optional[int] = None,
+        include: Optional[Sequence[str]] = None,
     ) -> List[Delivery]:
-        """Get all deliveries with optional filters"""
+        """Get all deliveries with optional filters, newest first.
+
+        manager_id keeps deliveries of appointments in zones of any warehouse
+        that user manages.
+        """
         try:
-            from src.database.db import Appointment
-            
             stmt = select(Delivery).where(Delivery.deleted_at.is_(None))
 
             if appointment_id:
                 stmt = stmt.where(Delivery.appointment_id == appointment_id)
             
-            if farmer_id:
-                # Join with appointments to filter by farmer_id
+            if farmer_id or manager_id:
+                # Join with appointments to filter by farmer or warehouse
                 stmt = stmt.join(Appointment, Delivery.appointment_id == Appointment.appointment_id)
-                stmt = stmt.where(Appointment.farmer_id == farmer_id)
                 stmt = stmt.where(Appointment.deleted_at.is_(None))
 
-            stmt = stmt.offset(skip).limit(limit).order_by(Delivery.created_at.desc())
+            if farmer_id:
+                stmt = stmt.where(Appointment.farmer_id == farmer_id)
+
+            if manager_id:
+                stmt = (
+                    stmt.join(StorageZone, StorageZone.zone_id == Appointment.zone_id)
+                    .join(Warehouse, Warehouse.warehouse_id == StorageZone.warehouse_id)
+                    .where(
+                        Warehouse.manager_id == manager_id,
+                        StorageZone.deleted_at.is_(None),
+                        Warehouse.deleted_at.is_(None),
+                    )
+                )
+
+            stmt = paginate(
+                stmt,
+                Delivery.created_at,
+                Delivery.delivery_id,
+                limit,
+                cursor=cursor,
+                skip=skip,
+            )
+            stmt = apply_includes(stmt, DeliveryRepo.INCLUDES, include)
 
             result = await session.execute(stmt)
             return list(result.scalars().all())
+        except (InvalidCursor, InvalidInclude):
+            raise
+        except Exception:
+            raise DeliveryRepo.GetAllError()
+
+    @staticmethod
+    async def stream_rows(
+        session: AsyncSession,
+        zone_id: Optional[int] = None,
+        farmer_id: Optional[int] = None,
+        manager_id: Optional[int] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+        batch_size: int = 1000,
+    ) -> AsyncResult:
+        """Open a server-side cursor over deliveries with their appointment,
+        grain, zone and warehouse, oldest first.
+
+        Rows are fetched batch_size at a time as the caller iterates.
+        created_from/created_to bound the delivery's created_at as [from, to).
+        """
+        try:
+            d = Delivery.__table__.c
+            a = Appointment.__table__.c
+            g = Grain.__table__.c
+            z = StorageZone.__table__.c
+            w = Warehouse.__table__.c
+
+            stmt = (
+                select(
+                    d.delivery_id,
+                    d.appointment_id,
+                    d.receipt_code,
+                    d.total_price,
+                    d.created_at,
+                    a.farmer_id,
+                    a.zone_id,
+                    a.requested_quantity,
+                    g.name.label("grain_name"),
+                    z.name.label("zone_name"),
+                    w.warehouse_id,
+                    w.name.label("warehouse_name"),
+                )
+                .select_from(Delivery.__table__)
+                .join(
+                    Appointment.__table__,
+                    and_(a.appointment_id == d.appointment_id, a.deleted_at.is_(None)),
+                )
+                .outerjoin(
+                    Grain.__table__,
+                    and_(g.grain_id == a.grain_type_id, g.deleted_at.is_(None)),
+                )
+                .outerjoin(
+                    StorageZone.__table__,
+                    and_(z.zone_id == a.zone_id, z.deleted_at.is_(None)),
+                )
+                .outerjoin(
+                    Warehouse.__table__,
+                    and_(w.warehouse_id == z.warehouse_id, w.deleted_at.is_(None)),
+                )
+                .where(d.deleted_at.is_(None))
+            )
+
+            if zone_id:
+                stmt = stmt.where(a.zone_id == zone_id)
+            if farmer_id:
+                stmt = stmt.where(a.farmer_id == farmer_id)
+            if manager_id:
+                stmt = stmt.where(w.manager_id == manager_id)
+            if created_from:
+                stmt = stmt.where(d.created_at >= created_from)
+            if created_to:
+                stmt = stmt.where(d.created_at < created_to)
+            stmt = stmt.order_by(d.created_at, d.delivery_id)
+
+            return await session.stream(
+                stmt.execution_options(yield_per=batch_size)
+            )
         except Exception:
             raise DeliveryRepo.GetAllError()
 
     @staticmethod
     async def update(
-        session: AsyncSession, delivery_id: int, **kwargs
+        session: AsyncSession, delivery_id: int, commit: bool = True, **kwargs
     ) -> Optional[Delivery]:
         """Update delivery by ID"""
         try:
@@ -158,7 +294,10 @@ class DeliveryRepo:
             )
 
             result = await session.execute(stmt)
-            await session.commit()
+            if commit:
+                await session.commit()
+            else:
+                await session.flush()
 
             updated = result.scalar_one_or_none()
             if updated is None:
@@ -174,7 +313,7 @@ class DeliveryRepo:
             raise DeliveryRepo.UpdateError()
 
     @staticmethod
-    async def soft_delete(session: AsyncSession, delivery_id: int) -> bool:
+    async def soft_delete(session: AsyncSession, delivery_id: int, commit: bool = True) -> bool:
         """Soft delete delivery by setting deleted_at timestamp"""
         try:
             stmt = (
@@ -186,7 +325,10 @@ class DeliveryRepo:
             )
 
             result = await session.execute(stmt)
-            await session.commit()
+            if commit:
+                await session.commit()
+            else:
+                await session.flush()
 
             return result.rowcount > 0
         except Exception:
@@ -194,13 +336,16 @@ class DeliveryRepo:
             raise DeliveryRepo.SoftDeleteError()
 
     @staticmethod
-    async def hard_delete(session: AsyncSession, delivery_id: int) -> bool:
+    async def hard_delete(session: AsyncSession, delivery_id: int, commit: bool = True) -> bool:
         """Hard delete delivery from database"""
         try:
             stmt = delete(Delivery).where(Delivery.delivery_id == delivery_id)
 
             result = await session.execute(stmt)
-            await session.commit()
+            if commit:
+                await session.commit()
+            else:
+                await session.flush()
 
             return result.rowcount > 0
         except Exception:
@@ -8,6 +8,7 @@ from fastapi import status
 from src.database.db import Grain
 from src.models.grain import GrainCreate
 from src.HTTPBaseException import HTTPBaseException
+from src.utils.pagination import paginate, InvalidCursor
 
 
 class GrainRepo:
@@ -50,14 +51,17 @@ class GrainRepo:
         message = "Failed to check grain existence"
 
     @staticmethod
-    async def create(session: AsyncSession, grain_data: GrainCreate) -> Grain:
+    async def create(session: AsyncSession, grain_data: GrainCreate, commit: bool = True) -> Grain:
         """Create a new grain"""
         try:
             grain_dict = grain_data.model_dump()
             orm_grain = Grain(**grain_dict)
             session.add(orm_grain)
-            await session.commit()
-            await session.refresh(orm_grain)
+            if commit:
+                await session.commit()
+                await session.refresh(orm_grain)
+            else:
+                await session.flush()
             return orm_grain
         except IntegrityError:
             await session.rollback()
@@ -88,19 +92,24 @@ class GrainRepo:
         session: AsyncSession,
         skip: int = 0,
         limit: int = 100,
+        cursor: Optional[str] = None,
     ) -> List[Grain]:
         try:
             stmt = select(Grain).where(Grain.deleted_at.is_(None))
 
-            stmt = stmt.offset(skip).limit(limit).order_by(Grain.created_at.desc())
+            stmt = paginate(
+                stmt, Grain.created_at, Grain.grain_id, limit, cursor=cursor, skip=skip
+            )
 
             result = await session.execute(stmt)
             return list(result.scalars().all())
+        except InvalidCursor:
+            raise
         except Exception:
             raise GrainRepo.GetAllError()
 
     @staticmethod
-    async def update(session: AsyncSession, grain_id: int, **kwargs) -> Optional[Grain]:
+    async def update(session: AsyncSession, grain_id: int, commit: bool = True, **kwargs) -> Optional[Grain]:
         try:
             kwargs["updated_at"] = datetime.utcnow()
 
@@ -112,7 +121,10 @@ class GrainRepo:
             )
 
             result = await session.execute(stmt)
-            await session.commit()
+            if commit:
+                await session.commit()
+            else:
+                await session.flush()
 
             updated = result.scalar_one_or_none()
             if updated is None:
@@ -125,7 +137,7 @@ class GrainRepo:
             raise GrainRepo.UpdateError()
 
     @staticmethod
-    async def soft_delete(session: AsyncSession, grain_id: int) -> bool:
+    async def soft_delete(session: AsyncSession, grain_id: int, commit: bool = True) -> bool:
         try:
             stmt = (
                 update(Grain)
@@ -134,7 +146,10 @@ class GrainRepo:
             )
 
             result = await session.execute(stmt)
-            await session.commit()
+            if commit:
+                await session.commit()
+            else:
+                await session.flush()
 
             return result.rowcount > 0
         except Exception:
@@ -142,12 +157,15 @@ class GrainRepo:
             raise GrainRepo.SoftDeleteError()
 
     @staticmethod
-    async def hard_delete(session: AsyncSession, grain_id: int) -> bool:
+    async def hard_delete(session: AsyncSession, grain_id: int, commit: bool = True) -> bool:
         try:
             stmt = delete(Grain).where(Grain.grain_id == grain_id)
 
             result = await session.execute(stmt)
-            await session.commit()
+            if commit:
+                await session.commit()
+            else:
+                await session.flush()
 
             return result.rowcount > 0
         except Exception:
@@ -0,0 +1,133 @@
+from typing import Optional
+from datetime import datetime, timedelta
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, update, delete
+from sqlalchemy.dialects.postgresql import insert
+from fastapi import status
+
+from src.database.db import IdempotencyKey
+from src.HTTPBaseException import HTTPBaseException
+
+
+class IdempotencyKeyRepo:
+    class KeyReused(HTTPBaseException):
+        code = status.HTTP_422_UNPROCESSABLE_ENTITY
+        message = "Idempotency-Key was already used with a different request"
+
+    class ClaimError(HTTPBaseException):
+        code = status.HTTP_500_INTERNAL_SERVER_ERROR
+        message = "Failed to claim idempotency key"
+
+    class GetError(HTTPBaseException):
+        code = status.HTTP_500_INTERNAL_SERVER_ERROR
+        message = "Failed to get idempotency key"
+
+    class CompleteError(HTTPBaseException):
+        code = status.HTTP_500_INTERNAL_SERVER_ERROR
+        message = "Failed to store idempotent response"
+
+    class PurgeError(HTTPBaseException):
+        code = status.HTTP_500_INTERNAL_SERVER_ERROR
+        message = "Failed to purge idempotency keys"
+
+    @staticmethod
+    async def claim(
+        session: AsyncSession,
+        key: str,
+        user_id: int,
+        endpoint: str,
+        request_hash: str,
+        ttl_seconds: int,
+    ) -> Optional[IdempotencyKey]:
+        """Insert the key (or take over an expired one) without committing.
+
+        Returns the row when this transaction owns the key, None when a live
+        row exists. A duplicate arriving while the owner's transaction is
+        still open blocks here on the unique key until the owner commits or
+        rolls back, so concurrent duplicates are serialized by the database.
+        """
+        try:
+            now = datetime.utcnow()
+            fresh = {
+                "request_hash": request_hash,
+                "status_code": None,
+                "response": None,
+                "created_at": now,
+                "expires_at": now + timedelta(seconds=ttl_seconds),
+            }
+            stmt = (
+                insert(IdempotencyKey)
+                .values(key=key, user_id=user_id, endpoint=endpoint, **fresh)
+                .on_conflict_do_update(
+                    index_elements=["key", "user_id", "endpoint"],
+                    set_=fresh,
+                    where=IdempotencyKey.expires_at <= now,
+                )
+                .returning(IdempotencyKey)
+            )
+            result = await session.execute(stmt)
+            return result.scalar_one_or_none()
+        except Exception:
+            await session.rollback()
+            raise IdempotencyKeyRepo.ClaimError()
+
+    @staticmethod
+    async def get(
+        session: AsyncSession, key: str, user_id: int, endpoint: str
+    ) -> Optional[IdempotencyKey]:
+        try:
+            stmt = select(IdempotencyKey).where(
+                IdempotencyKey.key == key,
+                IdempotencyKey.user_id == user_id,
+                IdempotencyKey.endpoint == endpoint,
+            )
+            result = await session.execute(stmt)
+            return result.scalar_one_or_none()
+        except Exception:
+            raise IdempotencyKeyRepo.GetError()
+
+    @staticmethod
+    async def complete(
+        session: AsyncSession,
+        key: str,
+        user_id: int,
+        endpoint: str,
+        status_code: int,
+        response,
+        commit: bool = True,
+    ) -> None:
+        """Store the outcome of a claimed key"""
+        try:
+            stmt = (
+                update(IdempotencyKey)
+                .where(
+                    IdempotencyKey.key == key,
+                    IdempotencyKey.user_id == user_id,
+                    IdempotencyKey.endpoint == endpoint,
+                )
+                .values(status_code=status_code, response=response)
+            )
+            await session.execute(stmt)
+            if commit:
+                await session.commit()
+            else:
+                await session.flush()
+        except Exception:
+            await session.rollback()
+            raise IdempotencyKeyRepo.CompleteError()
+
+    @staticmethod
+    async def purge_expired(session: AsyncSession, commit: bool = True) -> int:
+        try:
+            stmt = delete(IdempotencyKey).where(
+                IdempotencyKey.expires_at <= datetime.utcnow()
+            )
+            result = await session.execute(stmt)
+            if commit:
+                await session.commit()
+            else:
+                await session.flush()
+            return result.rowcount
+        except Exception:
+            await session.rollback()
+            raise IdempotencyKeyRepo.PurgeError()
@@ -1,16 +1,23 @@
-from typing import Optional, List, Union
+from typing import Optional, List, Sequence, Union
 from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete, func
+from sqlalchemy import Row, select, update, delete, func
 from sqlalchemy.exc import IntegrityError
 from fastapi import status
 
-from src.database.db import StorageZone, ZoneStatus
+from src.database.db import StorageZone, Warehouse, ZoneStatus
 from src.models.storagezone import StorageZoneCreate
 from src.HTTPBaseException import HTTPBaseException
+from src.utils.pagination import paginate, InvalidCursor
+from src.utils.include import apply_includes, live, load, InvalidInclude
 
 
 class StorageZoneRepo:
+    # Related rows that get_by_id / get_all can load with include=
+    INCLUDES = {
+        "warehouse": load(live(StorageZone.warehouse, Warehouse)),
+    }
+
     class StorageZoneNotFound(HTTPBaseException):
         code = status.HTTP_404_NOT_FOUND
         message = "Storage zone not found"
@@ -57,7 +64,7 @@ class StorageZoneRepo:
 
     @staticmethod
     async def create(
-        session: AsyncSession, zone_data: Union[StorageZoneCreate, dict]
+        session: AsyncSession, zone_data: Union[StorageZoneCreate, dict], commit: bool = True
     ) -> StorageZone:
         try:
             # Handle both dict and Pydantic model
@@ -67,8 +74,11 @@ class StorageZoneRepo:
                 zone_dict = zone_data.model_dump()
             orm_zone = StorageZone(**zone_dict)
             session.add(orm_zone)
-            await session.commit()
-            await session.refresh(orm_zone)
+            if commit:
+                await session.commit()
+                await session.refresh(orm_zone)
+            else:
+                await session.flush()
             return orm_zone
         except IntegrityError:
             await session.rollback()
@@ -78,17 +88,20 @@ class StorageZoneRepo:
             raise StorageZoneRepo.CreateError()
 
     @staticmethod
-    async def get_by_id(session: AsyncSession, zone_id: int):
+    async def get_by_id(
+        session: AsyncSession, zone_id: int, include: Optional[Sequence[str]] = None
+    ):
         try:
             stmt = select(StorageZone).where(
                 StorageZone.zone_id == zone_id, StorageZone.deleted_at.is_(None)
             )
+            stmt = apply_includes(stmt, StorageZoneRepo.INCLUDES, include)
             result = await session.execute(stmt)
             zone = result.scalar_one_or_none()
             if zone is None:
                 raise StorageZoneRepo.StorageZoneNotFound()
             return zone
-        except StorageZoneRepo.StorageZoneNotFound:
+        except (StorageZoneRepo.StorageZoneNotFound, InvalidInclude):
             raise
         except Exception:
             raise StorageZoneRepo.GetError()
@@ -101,6 +114,8 @@ class StorageZoneRepo:
         warehouse_id: Optional[int] = None,
         grain_type_id: Optional[int] = None,
         status: Optional[ZoneStatus] = None,
+        cursor: Optional[str] = None,
+        include: Optional[Sequence[str]] = None,
     ) -> List[StorageZone]:
         try:
             stmt = select(StorageZone).where(StorageZone.deleted_at.is_(None))
@@ -114,18 +129,78 @@ class StorageZoneRepo:
             if status is not None:
                 stmt = stmt.where(StorageZone.status == status)
 
-            stmt = (
-                stmt.offset(skip).limit(limit).order_by(StorageZone.created_at.desc())
+            stmt = paginate(
+                stmt,
+                StorageZone.created_at,
+                StorageZone.zone_id,
+                limit,
+                cursor=cursor,
+                skip=skip,
             )
+            stmt = apply_includes(stmt, StorageZoneRepo.INCLUDES, include)
 
             result = await session.execute(stmt)
             return list(result.scalars().all())
+        except (InvalidCursor, InvalidInclude):
+            raise
+        except Exception:
+            raise StorageZoneRepo.GetAllError()
+
+    @staticmethod
+    async def get_rows_with_warehouse(
+        session: AsyncSession,
+        grain_type_id: Optional[int] = None,
+        status: Optional[ZoneStatus] = None,
+        warehouse_status: Optional[ZoneStatus] = None,
+    ) -> Sequence[Row]:
+        """Read-only zone listing joined with its warehouse, as plain rows.
+
+        Each row has the zone's zone_id, name, total_capacity,
+        available_capacity and grain_type_id, plus warehouse_id,
+        warehouse_name, location, x_float and y_float of its warehouse.
+        """
+        try:
+            z = StorageZone.__table__.c
+            w = Warehouse.__table__.c
+            stmt = (
+                select(
+                    z.zone_id,
+                    z.name,
+                    z.total_capacity,
+                    z.available_capacity,
+                    z.grain_type_id,
+                    w.warehouse_id,
+                    w.name.label("warehouse_name"),
+                    w.location,
+                    w.x_float,
+                    w.y_float,
+                )
+                .join_from(
+                    StorageZone.__table__,
+                    Warehouse.__table__,
+                    z.warehouse_id == w.warehouse_id,
+                )
+                .where(z.deleted_at.is_(None), w.deleted_at.is_(None))
+                .order_by(w.warehouse_id, z.zone_id)
+            )
+
+            if grain_type_id is not None:
+                stmt = stmt.where(z.grain_type_id == grain_type_id)
+
+            if status is not None:
+                stmt = stmt.where(z.status == status)
+
+            if warehouse_status is not None:
+                stmt = stmt.where(w.status == warehouse_status)
+
+            result = await session.execute(stmt)
+            return result.all()
         except Exception:
             raise StorageZoneRepo.GetAllError()
 
     @staticmethod
     async def update(
-        session: AsyncSession, zone_id: int, **kwargs
+        session: AsyncSession, zone_id: int, commit: bool = True, **kwargs
     ) -> Optional[StorageZone]:
         try:
             kwargs["updated_at"] = datetime.utcnow()
@@ -138,7 +213,10 @@ class StorageZoneRepo:
             )
 
             result = await session.execute(stmt)
-            await session.commit()
+            if commit:
+                await session.commit()
+            else:
+                await session.flush()
 
             updated = result.scalar_one_or_none()
             if updated is None:
@@ -151,7 +229,7 @@ class StorageZoneRepo:
             raise StorageZoneRepo.UpdateError()
 
     @staticmethod
-    async def soft_delete(session: AsyncSession, zone_id: int) -> bool:
+    async def soft_delete(session: AsyncSession, zone_id: int, commit: bool = True) -> bool:
         try:
             stmt = (
                 update(StorageZone)
@@ -160,7 +238,10 @@ class StorageZoneRepo:
             )
 
             result = await session.execute(stmt)
-            await session.commit()
+            if commit:
+                await session.commit()
+            else:
+                await session.flush()
 
             return result.rowcount > 0
         except Exception:
@@ -168,12 +249,15 @@ class StorageZoneRepo:
             raise StorageZoneRepo.SoftDeleteError()
 
     @staticmethod
-    async def hard_delete(session: AsyncSession, zone_id: int) -> bool:
+    async def hard_delete(session: AsyncSession, zone_id: int, commit: bool = True) -> bool:
         try:
             stmt = delete(StorageZone).where(StorageZone.zone_id == zone_id)
 
             result = await session.execute(stmt)
-            await session.commit()
+            if commit:
+                await session.commit()
+            else:
+                await session.flush()
 
             return result.rowcount > 0
         except Exception:
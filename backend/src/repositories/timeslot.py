@@ -1,14 +1,24 @@
-from typing import Optional, List, Union
-from datetime import datetime
+from typing import Optional, List, Sequence, Union
+from datetime import date, datetime
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete, func
+from sqlalchemy import Date, DateTime, Row, and_, extract, literal, or_, select, update, delete, func
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.exc import IntegrityError
 from fastapi import status
 import logging
 
-from src.database.db import TimeSlot, TimeSlotStatus
+from src.database.db import (
+    Appointment,
+    AppointmentStatus,
+    StorageZone,
+    TimeSlot,
+    TimeSlotStatus,
+    TimeSlotTemplate,
+    ZoneStatus,
+)
 from src.models.timeslot import TimeSlotCreate
 from src.HTTPBaseException import HTTPBaseException
+from src.utils.pagination import paginate, InvalidCursor
 
 
 class TimeSlotRepo:
@@ -52,33 +62,43 @@ class TimeSlotRepo:
         code = status.HTTP_500_INTERNAL_SERVER_ERROR
         message = "Failed to check time slot existence"
 
+    class SlotAlreadyExists(HTTPBaseException):
+        code = status.HTTP_409_CONFLICT
+        message = "A time slot already starts at this time in this zone"
+
+    @staticmethod
+    def _normalize(timeslot_data: Union[TimeSlotCreate, dict]) -> dict:
+        # Handle both Pydantic model and dict inputs
+        if isinstance(timeslot_data, dict):
+            timeslot_dict = timeslot_data.copy()
+        else:
+            timeslot_dict = timeslot_data.model_dump()
+
+        # Convert status string to enum if needed
+        if 'status' in timeslot_dict and isinstance(timeslot_dict['status'], str):
+            try:
+                timeslot_dict['status'] = TimeSlotStatus(timeslot_dict['status'])
+            except ValueError:
+                # If invalid status, default to ACTIVE
+                timeslot_dict['status'] = TimeSlotStatus.ACTIVE
+
+        # Ensure datetime fields are datetime objects, not strings
+        if 'start_at' in timeslot_dict and isinstance(timeslot_dict['start_at'], str):
+            timeslot_dict['start_at'] = datetime.fromisoformat(timeslot_dict['start_at'].replace('Z', '+00:00'))
+        if 'end_at' in timeslot_dict and isinstance(timeslot_dict['end_at'], str):
+            timeslot_dict['end_at'] = datetime.fromisoformat(timeslot_dict['end_at'].replace('Z', '+00:00'))
+
+        # Validate that end_at is after start_at
+        if timeslot_dict.get('end_at') <= timeslot_dict.get('start_at'):
+            raise TimeSlotRepo.InvalidTimeRange()
+
+        return timeslot_dict
+
     @staticmethod
-    async def create(session: AsyncSession, timeslot_data: Union[TimeSlotCreate, dict]) -> TimeSlot:
+    async def create(session: AsyncSession, timeslot_data: Union[TimeSlotCreate, dict], commit: bool = True) -> TimeSlot:
         """Create a new time slot. Accepts either TimeSlotCreate model or dict"""
         try:
-            # Handle both Pydantic model and dict inputs
-            if isinstance(timeslot_data, dict):
-                timeslot_dict = timeslot_data.copy()
-            else:
-                timeslot_dict = timeslot_data.model_dump()
-            
-            # Convert status string to enum if needed
-            if 'status' in timeslot_dict and isinstance(timeslot_dict['status'], str):
-                try:
-                    timeslot_dict['status'] = TimeSlotStatus(timeslot_dict['status'])
-                except ValueError:
-                    # If invalid status, default to ACTIVE
-                    timeslot_dict['status'] = TimeSlotStatus.ACTIVE
-            
-            # Ensure datetime fields are datetime objects, not strings
-            if 'start_at' in timeslot_dict and isinstance(timeslot_dict['start_at'], str):
-                timeslot_dict['start_at'] = datetime.fromisoformat(timeslot_dict['start_at'].replace('Z', '+00:00'))
-            if 'end_at' in timeslot_dict and isinstance(timeslot_dict['end_at'], str):
-                timeslot_dict['end_at'] = datetime.fromisoformat(timeslot_dict['end_at'].replace('Z', '+00:00'))
-
-            # Validate that end_at is after start_at
-            if timeslot_dict.get('end_at') <= timeslot_dict.get('start_at'):
-                raise TimeSlotRepo.InvalidTimeRange()
+            timeslot_dict = TimeSlotRepo._normalize(timeslot_data)
 
             # Log the data being created
             logging.info(f"📝 Creating TimeSlot: zone_id={timeslot_dict.get('zone_id')}, "
@@ -86,21 +106,119 @@ class TimeSlotRepo:
 
             orm_timeslot = TimeSlot(**timeslot_dict)
             session.add(orm_timeslot)
-            await session.flush()  # Flush to get the ID
-            await session.commit()
-            await session.refresh(orm_timeslot)
+            if commit:
+                await session.commit()
+                await session.refresh(orm_timeslot)
+            else:
+                await session.flush()
             logging.info(f"✅ TimeSlot created successfully: ID={orm_timeslot.time_id}, zone={orm_timeslot.zone_id}, start={orm_timeslot.start_at}")
             return orm_timeslot
         except TimeSlotRepo.InvalidTimeRange:
             await session.rollback()
             raise
-        except IntegrityError:
+        except IntegrityError as e:
             await session.rollback()
+            if "uq_timeslot_zone_start" in str(e.orig):
+                raise TimeSlotRepo.SlotAlreadyExists()
             raise TimeSlotRepo.CreateError()
         except Exception:
             await session.rollback()
             raise TimeSlotRepo.CreateError()
 
+    @staticmethod
+    async def generate_from_templates(
+        session: AsyncSession, first_day: date, days: int, commit: bool = True
+    ) -> Sequence[Row]:
+        """Expand the templates of every active zone over days days, in one statement.
+
+        A series of dates is joined to the templates on weekday and to the
+        live active zones; the resulting slots are inserted with ON CONFLICT
+        DO NOTHING on the (zone_id, start_at) index, so existing slots are
+        skipped and concurrent runs are safe. Returns (zone_id, created,
+        skipped) per zone that has templates on those days.
+        """
+        try:
+            now = datetime.utcnow()
+            t = TimeSlot.__table__.c
+            tpl = TimeSlotTemplate.__table__.c
+            z = StorageZone.__table__.c
+
+            # Rendered as AS anon("offset"): without the column list Postgres
+            # names a scalar function's column after the alias
+            offsets = (
+                func.generate_series(0, days - 1).table_valued("offset").render_derived()
+            )
+            day = literal(first_day, Date) + offsets.c.offset
+            candidates = (
+                select(
+                    tpl.zone_id,
+                    (day + tpl.start_time).label("start_at"),
+                    (day + tpl.end_time).label("end_at"),
+                )
+                .select_from(offsets)
+                # isodow: 1 = Monday ... 7 = Sunday; templates use 0 = Monday
+                .join(TimeSlotTemplate, tpl.day_of_week == extract("isodow", day) - 1)
+                .join(StorageZone, z.zone_id == tpl.zone_id)
+                .where(
+                    z.status == ZoneStatus.ACTIVE,
+                    z.deleted_at.is_(None),
+                    tpl.end_time > tpl.start_time,
+                )
+                .cte("candidates")
+            )
+            inserted = (
+                insert(TimeSlot)
+                .from_select(
+                    ["zone_id", "start_at", "end_at", "status", "created_at", "updated_at"],
+                    select(
+                        candidates.c.zone_id,
+                        candidates.c.start_at,
+                        candidates.c.end_at,
+                        literal(TimeSlotStatus.ACTIVE, t.status.type),
+                        literal(now, DateTime),
+                        literal(now, DateTime),
+                    ),
+                )
+                .on_conflict_do_nothing(
+                    index_elements=["zone_id", "start_at"],
+                    index_where=TimeSlot.deleted_at.is_(None),
+                )
+                .returning(t.zone_id)
+                .cte("inserted")
+            )
+
+            planned = (
+                select(candidates.c.zone_id, func.count().label("planned"))
+                .group_by(candidates.c.zone_id)
+                .subquery()
+            )
+            made = (
+                select(inserted.c.zone_id, func.count().label("created"))
+                .group_by(inserted.c.zone_id)
+                .subquery()
+            )
+            created = func.coalesce(made.c.created, 0)
+            stmt = (
+                select(
+                    planned.c.zone_id,
+                    created.label("created"),
+                    (planned.c.planned - created).label("skipped"),
+                )
+                .outerjoin(made, made.c.zone_id == planned.c.zone_id)
+                .order_by(planned.c.zone_id)
+            )
+
+            result = await session.execute(stmt)
+            counts = result.all()
+            if commit:
+                await session.commit()
+            else:
+                await session.flush()
+            return counts
+        except Exception:
+            await session.rollback()
+            raise TimeSlotRepo.CreateError()
+
     @staticmethod
     async def get_by_id(session: AsyncSession, time_id: int) -> Optional[TimeSlot]:
         try:
@@ -124,6 +242,7 @@ class TimeSlotRepo:
         limit: int = 100,
         zone_id: Optional[int] = None,
         status: Optional[TimeSlotStatus] = None,
+        cursor: Optional[str] = None,
     ) -> List[TimeSlot]:
         try:
             stmt = select(TimeSlot).where(TimeSlot.deleted_at.is_(None))
@@ -134,16 +253,278 @@ class TimeSlotRepo:
             if status:
                 stmt = stmt.where(TimeSlot.status == status)
 
-            stmt = stmt.offset(skip).limit(limit).order_by(TimeSlot.start_at.asc())
+            stmt = paginate(
+                stmt,
+                TimeSlot.start_at,
+                TimeSlot.time_id,
+                limit,
+                cursor=cursor,
+                skip=skip,
+                descending=False,
+            )
 
             result = await session.execute(stmt)
             return list(result.scalars().all())
+        except InvalidCursor:
+            raise
         except Exception:
             raise TimeSlotRepo.GetAllError()
 
+    @staticmethod
+    def _booked():
+        """EXISTS clause: a live pending or accepted appointment holds the slot"""
+        a = Appointment.__table__.c
+        return (
+            select(a.appointment_id)
+            .where(
+                a.timeslot_id == TimeSlot.__table__.c.time_id,
+                a.deleted_at.is_(None),
+                a.status.in_([AppointmentStatus.PENDING, AppointmentStatus.ACCEPTED]),
+            )
+            .exists()
+        )
+
+    @staticmethod
+    async def get_available(
+        session: AsyncSession,
+        zone_id: int,
+        start_after: datetime,
+        limit: int = 1000,
+        cursor: Optional[str] = None,
+    ) -> Sequence[Row]:
+        """Bookable slots of a zone, earliest first, in one query.
+
+        Active slots starting after start_after that no live pending or
+        accepted appointment holds (NOT EXISTS anti-join), keyset-paginated
+        on (start_at, time_id). Returns plain rows (time_id, zone_id,
+        start_at, end_at, status).
+        """
+        try:
+            t = TimeSlot.__table__.c
+            stmt = select(t.time_id, t.zone_id, t.start_at, t.end_at, t.status).where(
+                t.zone_id == zone_id,
+                t.deleted_at.is_(None),
+                t.status == TimeSlotStatus.ACTIVE,
+                t.start_at > start_after,
+                ~TimeSlotRepo._booked(),
+            )
+            stmt = paginate(
+                stmt, t.start_at, t.time_id, limit, cursor=cursor, descending=False
+            )
+
+            result = await session.execute(stmt)
+            return result.all()
+        except InvalidCursor:
+            raise
+        except Exception:
+            raise TimeSlotRepo.GetAllError()
+
+    @staticmethod
+    async def get_available_in_zones(
+        session: AsyncSession,
+        start_after: datetime,
+        start_before: datetime,
+        warehouse_id: Optional[int] = None,
+        grain_type_id: Optional[int] = None,
+    ) -> Sequence[Row]:
+        """Bookable slots of every active zone of a warehouse and/or grain type.
+
+        One query over [start_after, start_before), ordered by start_at then
+        zone, with the same NOT EXISTS anti-join as get_available. Returns
+        plain rows (time_id, zone_id, zone_name, grain_type_id, start_at,
+        end_at).
+        """
+        try:
+            t = TimeSlot.__table__.c
+            z = StorageZone.__table__.c
+            stmt = (
+                select(
+                    t.time_id,
+                    t.zone_id,
+                    z.name.label("zone_name"),
+                    z.grain_type_id,
+                    t.start_at,
+                    t.end_at,
+                )
+                .join(StorageZone, z.zone_id == t.zone_id)
+                .where(
+                    z.deleted_at.is_(None),
+                    z.status == ZoneStatus.ACTIVE,
+                    t.deleted_at.is_(None),
+                    t.status == TimeSlotStatus.ACTIVE,
+                    t.start_at >= start_after,
+                    t.start_at < start_before,
+                    ~TimeSlotRepo._booked(),
+                )
+                .order_by(t.start_at, t.zone_id, t.time_id)
+            )
+
+            if warehouse_id is not None:
+                stmt = stmt.where(z.warehouse_id == warehouse_id)
+
+            if grain_type_id is not None:
+                stmt = stmt.where(z.grain_type_id == grain_type_id)
+
+            result = await session.execute(stmt)
+            return result.all()
+        except Exception:
+            raise TimeSlotRepo.GetAllError()
+
+    @staticmethod
+    async def get_virtual_available(
+        session: AsyncSession,
+        start_after: datetime,
+        start_before: datetime,
+        zone_id: Optional[int] = None,
+        warehouse_id: Optional[int] = None,
+        grain_type_id: Optional[int] = None,
+        limit: Optional[int] = None,
+    ) -> Sequence[Row]:
+        """Free slots computed from templates instead of pre-generated rows.
+
+        Templates of live active zones are expanded over the dates of
+        [start_after, start_before) and left-joined to the slot rows
+        materialized at booking time: a materialized slot hides its virtual
+        twin unless it is active and unbooked. Ordered by start_at then zone.
+        Returns plain rows (time_id, zone_id, zone_name, grain_type_id,
+        start_at, end_at, status); time_id is None until the slot is booked.
+        """
+        try:
+            t = TimeSlot.__table__.c
+            tpl = TimeSlotTemplate.__table__.c
+            z = StorageZone.__table__.c
+
+            first_day = start_after.date()
+            days = (start_before.date() - first_day).days + 1
+            offsets = (
+                func.generate_series(0, days - 1).table_valued("offset").render_derived()
+            )
+            day = literal(first_day, Date) + offsets.c.offset
+            start_at = day + tpl.start_time
+            candidates = (
+                select(
+                    tpl.zone_id,
+                    z.name.label("zone_name"),
+                    z.grain_type_id,
+                    start_at.label("start_at"),
+                    (day + tpl.end_time).label("end_at"),
+                )
+                .select_from(offsets)
+                .join(TimeSlotTemplate, tpl.day_of_week == extract("isodow", day) - 1)
+                .join(StorageZone, z.zone_id == tpl.zone_id)
+                .where(
+                    z.status == ZoneStatus.ACTIVE,
+                    z.deleted_at.is_(None),
+                    tpl.end_time > tpl.start_time,
+                    start_at > start_after,
+                    start_at < start_before,
+                )
+                # Templates sharing a start time yield one slot
+                .distinct(tpl.zone_id, start_at)
+                .order_by(tpl.zone_id, start_at, tpl.template_id)
+            )
+
+            if zone_id is not None:
+                candidates = candidates.where(tpl.zone_id == zone_id)
+
+            if warehouse_id is not None:
+                candidates = candidates.where(z.warehouse_id == warehouse_id)
+
+            if grain_type_id is not None:
+                candidates = candidates.where(z.grain_type_id == grain_type_id)
+
+            c = candidates.cte("candidates")
+            stmt = (
+                select(
+                    t.time_id,
+                    c.c.zone_id,
+                    c.c.zone_name,
+                    c.c.grain_type_id,
+                    c.c.start_at,
+                    c.c.end_at,
+                    literal(TimeSlotStatus.ACTIVE, t.status.type).label("status"),
+                )
+                .select_from(c)
+                .outerjoin(
+                    TimeSlot,
+                    and_(
+                        t.zone_id == c.c.zone_id,
+                        t.start_at == c.c.start_at,
+                        t.deleted_at.is_(None),
+                    ),
+                )
+                .where(
+                    or_(
+                        t.time_id.is_(None),
+                        and_(t.status == TimeSlotStatus.ACTIVE, ~TimeSlotRepo._booked()),
+                    )
+                )
+                .order_by(c.c.start_at, c.c.zone_id)
+            )
+
+            if limit is not None:
+                stmt = stmt.limit(limit)
+
+            result = await session.execute(stmt)
+            return result.all()
+        except Exception:
+            raise TimeSlotRepo.GetAllError()
+
+    @staticmethod
+    async def materialize(
+        session: AsyncSession,
+        zone_id: int,
+        start_at: datetime,
+        end_at: datetime,
+        commit: bool = True,
+    ) -> TimeSlot:
+        """Concrete row of a virtual slot, inserted on first booking.
+
+        Returns the live row of (zone_id, start_at), whether this call
+        inserted it or another request did first.
+        """
+        try:
+            now = datetime.utcnow()
+            stmt = (
+                insert(TimeSlot)
+                .values(
+                    zone_id=zone_id,
+                    start_at=start_at,
+                    end_at=end_at,
+                    status=TimeSlotStatus.ACTIVE,
+                    created_at=now,
+                    updated_at=now,
+                )
+                .on_conflict_do_nothing(
+                    index_elements=["zone_id", "start_at"],
+                    index_where=TimeSlot.deleted_at.is_(None),
+                )
+                .returning(TimeSlot)
+            )
+            result = await session.execute(stmt)
+            slot = result.scalar_one_or_none()
+            if slot is None:
+                result = await session.execute(
+                    select(TimeSlot).where(
+                        TimeSlot.zone_id == zone_id,
+                        TimeSlot.start_at == start_at,
+                        TimeSlot.deleted_at.is_(None),
+                    )
+                )
+                slot = result.scalar_one()
+
+            if commit:
+                await session.commit()
+            else:
+                await session.flush()
+            return slot
+        except Exception:
+            await session.rollback()
+            raise TimeSlotRepo.CreateError()
+
     @staticmethod
     async def update(
-        session: AsyncSession, time_id: int, **kwargs
+        session: AsyncSession, time_id: int, commit: bool = True, **kwargs
     ) -> Optional[TimeSlot]:
         try:
             kwargs["updated_at"] = datetime.utcnow()
@@ -156,7 +537,10 @@ class TimeSlotRepo:
             )
 
             result = await session.execute(stmt)
-            await session.commit()
+            if commit:
+                await session.commit()
+            else:
+                await session.flush()
 
             updated = result.scalar_one_or_none()
             if updated is None:
@@ -169,7 +553,87 @@ class TimeSlotRepo:
             raise TimeSlotRepo.UpdateError()
 
     @staticmethod
-    async def soft_delete(session: AsyncSession, time_id: int) -> bool:
+    async def claim(
+        session: AsyncSession, time_id: int, commit: bool = True
+    ) -> Optional[TimeSlot]:
+        """Atomically close an active time slot.
+
+        A single conditional UPDATE: concurrent callers queue on the row lock
+        and only the first one still sees it ACTIVE. Returns the slot if this
+        call closed it, None if it was already taken (or does not exist).
+        """
+        try:
+            stmt = (
+                update(TimeSlot)
+                .where(
+                    TimeSlot.time_id == time_id,
+                    TimeSlot.status == TimeSlotStatus.ACTIVE,
+                    TimeSlot.deleted_at.is_(None),
+                )
+                .values(status=TimeSlotStatus.NOT_ACTIVE, updated_at=datetime.utcnow())
+                .returning(TimeSlot)
+            )
+
+            result = await session.execute(stmt)
+            claimed = result.scalar_one_or_none()
+            if commit:
+                await session.commit()
+            else:
+                await session.flush()
+            return claimed
+        except Exception:
+            await session.rollback()
+            raise TimeSlotRepo.UpdateError()
+
+    @staticmethod
+    async def reopen(
+        session: AsyncSession, time_ids: List[int], commit: bool = True
+    ) -> List[int]:
+        """Make claimed slots bookable again once no booking holds them.
+
+        The counterpart of claim, run when appointments are cancelled or
+        refused. Returns the ids of the slots set back to ACTIVE.
+        """
+        if not time_ids:
+            return []
+        try:
+            a = Appointment.__table__.c
+            held = (
+                select(a.appointment_id)
+                .where(
+                    a.timeslot_id == TimeSlot.__table__.c.time_id,
+                    a.deleted_at.is_(None),
+                    a.status.notin_(
+                        [AppointmentStatus.CANCELLED, AppointmentStatus.REFUSED]
+                    ),
+                )
+                .exists()
+            )
+            stmt = (
+                update(TimeSlot)
+                .where(
+                    TimeSlot.time_id.in_(time_ids),
+                    TimeSlot.status == TimeSlotStatus.NOT_ACTIVE,
+                    TimeSlot.deleted_at.is_(None),
+                    ~held,
+                )
+                .values(status=TimeSlotStatus.ACTIVE, updated_at=datetime.utcnow())
+                .returning(TimeSlot.time_id)
+            )
+
+            result = await session.execute(stmt)
+            reopened = list(result.scalars().all())
+            if commit:
+                await session.commit()
+            else:
+                await session.flush()
+            return reopened
+        except Exception:
+            await session.rollback()
+            raise TimeSlotRepo.UpdateError()
+
+    @staticmethod
+    async def soft_delete(session: AsyncSession, time_id: int, commit: bool = True) -> bool:
         try:
             stmt = (
                 update(TimeSlot)
@@ -178,7 +642,10 @@ class TimeSlotRepo:
             )
 
             result = await session.execute(stmt)
-            await session.commit()
+            if commit:
+                await session.commit()
+            else:
+                await session.flush()
 
             return result.rowcount > 0
         except Exception:
@@ -186,12 +653,15 @@ class TimeSlotRepo:
             raise TimeSlotRepo.SoftDeleteError()
 
     @staticmethod
-    async def hard_delete(session: AsyncSession, time_id: int) -> bool:
+    async def hard_delete(session: AsyncSession, time_id: int, commit: bool = True) -> bool:
         try:
             stmt = delete(TimeSlot).where(TimeSlot.time_id == time_id)
 
             result = await session.execute(stmt)
-            await session.commit()
+            if commit:
+                await session.commit()
+            else:
+                await session.flush()
 
             return result.rowcount > 0
         except Exception:
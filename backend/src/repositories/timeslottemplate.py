@@ -5,7 +5,7 @@ from sqlalchemy import select, update, delete, func
 from sqlalchemy.exc import IntegrityError
 from fastapi import status
 
-from src.database.db import TimeSlotTemplate
+from src.database.db import TimeSlotTemplate, StorageZone, ZoneStatus
 from src.HTTPBaseException import HTTPBaseException
 import logging
 
@@ -52,7 +52,7 @@ class TimeSlotTemplateRepo:
         message = "Failed to check time slot template existence"
 
     @staticmethod
-    async def create(session: AsyncSession, data: dict) -> TimeSlotTemplate:
+    async def create(session: AsyncSession, data: dict, commit: bool = True) -> TimeSlotTemplate:
         """Create a new time slot template"""
         try:
             from datetime import time as time_type
@@ -100,8 +100,11 @@ class TimeSlotTemplateRepo:
             
             template = TimeSlotTemplate(**data)
             session.add(template)
-            await session.commit()
-            await session.refresh(template)
+            if commit:
+                await session.commit()
+                await session.refresh(template)
+            else:
+                await session.flush()
             return template
         except TimeSlotTemplateRepo.InvalidTimeRange:
             await session.rollback()
@@ -149,6 +152,31 @@ class TimeSlotTemplateRepo:
             logging.exception(f"Error getting time slot templates by day: {e}")
             raise TimeSlotTemplateRepo.GetAllError()
 
+    @staticmethod
+    async def get_at(
+        session: AsyncSession, zone_id: int, day_of_week: int, start_time
+    ) -> Optional[TimeSlotTemplate]:
+        """Template of an active zone starting at start_time on day_of_week"""
+        try:
+            stmt = (
+                select(TimeSlotTemplate)
+                .join(StorageZone, StorageZone.zone_id == TimeSlotTemplate.zone_id)
+                .where(
+                    TimeSlotTemplate.zone_id == zone_id,
+                    TimeSlotTemplate.day_of_week == day_of_week,
+                    TimeSlotTemplate.start_time == start_time,
+                    TimeSlotTemplate.end_time > TimeSlotTemplate.start_time,
+                    StorageZone.status == ZoneStatus.ACTIVE,
+                    StorageZone.deleted_at.is_(None),
+                )
+                .order_by(TimeSlotTemplate.template_id)
+                .limit(1)
+            )
+            result = await session.execute(stmt)
+            return result.scalar_one_or_none()
+        except Exception:
+            raise TimeSlotTemplateRepo.GetError()
+
     @staticmethod
     async def get_by_zone(
         session: AsyncSession, zone_id: int
@@ -196,7 +224,7 @@ class TimeSlotTemplateRepo:
 
     @staticmethod
     async def update(
-        session: AsyncSession, template_id: int, **kwargs
+        session: AsyncSession, template_id: int, commit: bool = True, **kwargs
     ) -> Optional[TimeSlotTemplate]:
         """Update time slot template by ID"""
         try:
@@ -210,7 +238,10 @@ class TimeSlotTemplateRepo:
             )
 
             result = await session.execute(stmt)
-            await session.commit()
+            if commit:
+                await session.commit()
+            else:
+                await session.flush()
 
             updated = result.scalar_one_or_none()
             if updated is None:
@@ -224,7 +255,7 @@ class TimeSlotTemplateRepo:
             raise TimeSlotTemplateRepo.UpdateError()
 
     @staticmethod
-    async def soft_delete(session: AsyncSession, template_id: int) -> bool:
+    async def soft_delete(session: AsyncSession, template_id: int, commit: bool = True) -> bool:
         """Soft delete time slot template by setting deleted_at timestamp"""
         try:
             stmt = (
@@ -234,7 +265,10 @@ class TimeSlotTemplateRepo:
             )
 
             result = await session.execute(stmt)
-            await session.commit()
+            if commit:
+                await session.commit()
+            else:
+                await session.flush()
 
             return result.rowcount > 0
         except Exception as e:
@@ -243,7 +277,7 @@ class TimeSlotTemplateRepo:
             raise TimeSlotTemplateRepo.SoftDeleteError()
 
     @staticmethod
-    async def hard_delete(session: AsyncSession, template_id: int) -> bool:
+    async def hard_delete(session: AsyncSession, template_id: int, commit: bool = True) -> bool:
         """Hard delete time slot template from database"""
         try:
             stmt = delete(TimeSlotTemplate).where(
@@ -251,7 +285,10 @@ class TimeSlotTemplateRepo:
             )
 
             result = await session.execute(stmt)
-            await session.commit()
+            if commit:
+                await session.commit()
+            else:
+                await session.flush()
 
             return result.rowcount > 0
         except Exception as e:
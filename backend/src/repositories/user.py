@@ -9,6 +9,7 @@ import logging
 from src.database.db import User
 from src.models.user import UserCreate, UserRole
 from src.HTTPBaseException import HTTPBaseException
+from src.utils.pagination import paginate, InvalidCursor
 
 logger = logging.getLogger(__name__)
 
@@ -137,6 +138,7 @@ class UserRepo:
         limit: int = 100,
         role: Optional[UserRole] = None,
         account_status: bool = None,
+        cursor: Optional[str] = None,
     ) -> List[User]:
         try:
             stmt = select(User).where(User.deleted_at.is_(None))
@@ -147,10 +149,14 @@ class UserRepo:
             if account_status:
                 stmt = stmt.where(User.account_status == account_status)
 
-            stmt = stmt.offset(skip).limit(limit).order_by(User.created_at.desc())
+            stmt = paginate(
+                stmt, User.created_at, User.user_id, limit, cursor=cursor, skip=skip
+            )
 
             result = await session.execute(stmt)
             return list(result.scalars().all())
+        except InvalidCursor:
+            raise
         except Exception as e:
             logger.exception(f"❌ Failed to get users Error : {e}")
             raise UserRepo.GetAllError()
@@ -1,17 +1,25 @@
-from typing import Optional, List
+from typing import Optional, List, Sequence
 from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update, delete, func
 from sqlalchemy.exc import IntegrityError
 from fastapi import status
 
-from src.database.db import Warehouse, ZoneStatus
+from src.database.db import StorageZone, User, Warehouse, ZoneStatus
 from src.models.warehouse import WarehouseCreate
 from src.HTTPBaseException import HTTPBaseException
+from src.utils.pagination import paginate, InvalidCursor
+from src.utils.include import apply_includes, live, load, InvalidInclude
 import logging
 
 
 class WarehouseRepo:
+    # Related rows that get_by_id / get_all can load with include=
+    INCLUDES = {
+        "manager": load(live(Warehouse.manager, User)),
+        "zones": load(live(Warehouse.storage_zones, StorageZone)),
+    }
+
     class WarehouseNotFound(HTTPBaseException):
         code = status.HTTP_404_NOT_FOUND
         message = "Warehouse not found"
@@ -54,14 +62,17 @@ class WarehouseRepo:
 
     @staticmethod
     async def create(
-        session: AsyncSession, warehouse_data: WarehouseCreate
+        session: AsyncSession, warehouse_data: WarehouseCreate, commit: bool = True
     ) -> Warehouse:
         try:
             warehouse_dict = warehouse_data.model_dump()
             orm_warehouse = Warehouse(**warehouse_dict)
             session.add(orm_warehouse)
-            await session.commit()
-            await session.refresh(orm_warehouse)
+            if commit:
+                await session.commit()
+                await session.refresh(orm_warehouse)
+            else:
+                await session.flush()
             return orm_warehouse
         except IntegrityError:
             await session.rollback()
@@ -73,18 +84,21 @@ class WarehouseRepo:
 
     @staticmethod
     async def get_by_id(
-        session: AsyncSession, warehouse_id: int
+        session: AsyncSession,
+        warehouse_id: int,
+        include: Optional[Sequence[str]] = None,
     ) -> Optional[Warehouse]:
         try:
             stmt = select(Warehouse).where(
                 Warehouse.warehouse_id == warehouse_id, Warehouse.deleted_at.is_(None)
             )
+            stmt = apply_includes(stmt, WarehouseRepo.INCLUDES, include)
             result = await session.execute(stmt)
             warehouse = result.scalar_one_or_none()
             if warehouse is None:
                 raise WarehouseRepo.WarehouseNotFound()
             return warehouse
-        except WarehouseRepo.WarehouseNotFound:
+        except (WarehouseRepo.WarehouseNotFound, InvalidInclude):
             raise
         except Exception as e:
             logging.exception(f"Error getting the warehouse : {e}")
@@ -97,6 +111,8 @@ class WarehouseRepo:
         limit: int = 100,
         manager_id: Optional[int] = None,
         status: Optional[ZoneStatus] = None,
+        cursor: Optional[str] = None,
+        include: Optional[Sequence[str]] = None,
     ) -> List[Warehouse]:
         try:
             stmt = select(Warehouse).where(Warehouse.deleted_at.is_(None))
@@ -107,17 +123,27 @@ class WarehouseRepo:
             if status:
                 stmt = stmt.where(Warehouse.status == status)
 
-            stmt = stmt.offset(skip).limit(limit).order_by(Warehouse.created_at.desc())
+            stmt = paginate(
+                stmt,
+                Warehouse.created_at,
+                Warehouse.warehouse_id,
+                limit,
+                cursor=cursor,
+                skip=skip,
+            )
+            stmt = apply_includes(stmt, WarehouseRepo.INCLUDES, include)
 
             result = await session.execute(stmt)
             return list(result.scalars().all())
+        except (InvalidCursor, InvalidInclude):
+            raise
         except Exception as e:
             logging.exception(f"Error get all warehouse : {e}")
             raise WarehouseRepo.GetAllError()
 
     @staticmethod
     async def update(
-        session: AsyncSession, warehouse_id: int, **kwargs
+        session: AsyncSession, warehouse_id: int, commit: bool = True, **kwargs
     ) -> Optional[Warehouse]:
         try:
             kwargs["updated_at"] = datetime.utcnow()
@@ -133,7 +159,10 @@ class WarehouseRepo:
             )
 
             result = await session.execute(stmt)
-            await session.commit()
+            if commit:
+                await session.commit()
+            else:
+                await session.flush()
 
             updated = result.scalar_one_or_none()
             if updated is None:
@@ -147,7 +176,7 @@ class WarehouseRepo:
             raise WarehouseRepo.UpdateError()
 
     @staticmethod
-    async def soft_delete(session: AsyncSession, warehouse_id: int) -> bool:
+    async def soft_delete(session: AsyncSession, warehouse_id: int, commit: bool = True) -> bool:
         try:
             stmt = (
                 update(Warehouse)
@@ -159,7 +188,10 @@ class WarehouseRepo:
             )
 
             result = await session.execute(stmt)
-            await session.commit()
+            if commit:
+                await session.commit()
+            else:
+                await session.flush()
 
             return result.rowcount > 0
         except Exception as e:
@@ -168,12 +200,15 @@ class WarehouseRepo:
             raise WarehouseRepo.SoftDeleteError()
 
     @staticmethod
-    async def hard_delete(session: AsyncSession, warehouse_id: int) -> bool:
+    async def hard_delete(session: AsyncSession, warehouse_id: int, commit: bool = True) -> bool:
         try:
             stmt = delete(Warehouse).where(Warehouse.warehouse_id == warehouse_id)
 
             result = await session.execute(stmt)
-            await session.commit()
+            if commit:
+                await session.commit()
+            else:
+                await session.flush()
 
             return result.rowcount > 0
         except Exception:
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 from src.config.database import ConManager
+from src.config.security import get_current_admin
 
 router = APIRouter()
 
@@ -14,4 +15,20 @@ async def get_statistics(session: AsyncSession = Depends(ConManager.get_session)
             "total_appointments": 120,
             "total_deliveries": 75
         }
-    }
\ No newline at end of file
+    }
+
+@router.get(
+    "/db/pool",
+    description="Get live database connection pool statistics",
+    dependencies=[Depends(get_current_admin)],
+)
+async def get_pool_statistics():
+    return {"data": ConManager.pool_stats()}
+
+@router.get(
+    "/db/queries",
+    description="Get SQL statement counts and database time per route",
+    dependencies=[Depends(get_current_admin)],
+)
+async def get_query_statistics():
+    return {"data": ConManager.query_stats()}
@@ -1,13 +1,25 @@
-from fastapi import Depends, APIRouter, Query, status, HTTPException, Body
+from fastapi import Depends, APIRouter, Query, status, HTTPException, Body, Header, Response
+from fastapi.responses import StreamingResponse
 from src.config.database import ConManager
 from sqlalchemy.ext.asyncio import AsyncSession
 from src.services.appointment import AppointementService
-from src.models.appointment import AppointmentCreate, AppointmentCreateFromFrontend
+from src.services.idempotency import IdempotencyService
+from src.services.events import AppointmentEventService
+from src.models.appointment import (
+    AppointmentBulkStatus,
+    AppointmentCreate,
+    AppointmentCreateFromFrontend,
+)
 from src.models.user import UserRole
-from src.config.security import get_current_user
+from src.config.security import create_events_token, get_current_user, get_events_user
+from src.config.settings import settings
 from src.database.db import AppointmentStatus, User
 from src.repositories.warehouse import WarehouseRepo
-from typing import Optional
+from src.utils.pagination import next_cursor
+from src.utils.filters import date_range, parse_statuses
+from src.utils.export import export_response
+from datetime import date
+from typing import Literal, Optional
 import logging
 
 
@@ -16,48 +28,63 @@ router = APIRouter()
 
 @router.get("/", description="Get all appointments")
 async def get_all(
+    response: Response,
     zone_id: Optional[int] = Query(None, description="Zone ID to filter"),
     farmer_id: Optional[int] = Query(None, description="Farmer ID to filter"),
-    status: Optional[str] = Query(None, description="Status to filter"),
+    status: Optional[str] = Query(None, description="Status to filter, comma-separated for several"),
+    date_from: Optional[date] = Query(None, description="Created on or after this date"),
+    date_to: Optional[date] = Query(None, description="Created on or before this date"),
     skip: int = Query(0, description="Number of items to skip"),
     limit: int = Query(100, description="Max number of items to return"),
+    cursor: Optional[str] = Query(None, description="Cursor from X-Next-Cursor"),
     session: AsyncSession = Depends(ConManager.get_session),
     current_user: User = Depends(get_current_user),
 ):
-    from src.database.db import AppointmentStatus
-    
-    status_enum = None
-    if status:
-        try:
-            status_enum = AppointmentStatus(status.lower())
-        except ValueError:
-            pass
-    
+    created_from, created_to = date_range(date_from, date_to)
     appointments = await AppointementService.get_appointments(
-        session, zone_id=zone_id, farmer_id=farmer_id, status=status_enum, current_user=current_user
+        session,
+        zone_id=zone_id,
+        farmer_id=farmer_id,
+        status=parse_statuses(status, AppointmentStatus),
+        current_user=current_user,
+        skip=skip,
+        limit=limit,
+        cursor=cursor,
+        created_from=created_from,
+        created_to=created_to,
     )
+    cursor = next_cursor(appointments, limit, "created_at", "appointment_id")
+    if cursor:
+        response.headers["X-Next-Cursor"] = cursor
     return appointments
 
 
 @router.get("/my-appointments", description="Get my appointments (for farmers)")
 async def get_my_appointments(
-    status: Optional[str] = Query(None, description="Status to filter"),
+    status: Optional[str] = Query(None, description="Status to filter, comma-separated for several"),
+    date_from: Optional[date] = Query(None, description="Created on or after this date"),
+    date_to: Optional[date] = Query(None, description="Created on or before this date"),
+    limit: int = Query(100, description="Max number of items to return"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
     session: AsyncSession = Depends(ConManager.get_session),
     current_user: User = Depends(get_current_user),
 ):
     
     try:
-        status_enum = None
-        if status:
-            try:
-                status_enum = AppointmentStatus(status.lower())
-            except ValueError:
-                pass
-        
+        created_from, created_to = date_range(date_from, date_to)
         appointments = await AppointementService.get_my_appointments(
-            session=session, farmer_id=current_user.user_id, status=status_enum
+            session=session,
+            farmer_id=current_user.user_id,
+            status=parse_statuses(status, AppointmentStatus),
+            limit=limit,
+            cursor=cursor,
+            created_from=created_from,
+            created_to=created_to,
         )
-        return {"appointments": appointments}
+        return {
+            "appointments": appointments,
+            "next_cursor": next_cursor(appointments, limit, "created_at", "id"),
+        }
     except HTTPException:
         raise
     except Exception as e:
@@ -67,6 +94,113 @@ async def get_my_appointments(
         )
 
 
+@router.get("/stats", description="Aggregated appointment counts and quantities")
+async def get_stats(
+    group_by: str = Query("status", description="Comma-separated: zone, warehouse, status, day"),
+    zone_id: Optional[int] = Query(None, description="Zone ID to filter"),
+    status: Optional[str] = Query(None, description="Status to filter, comma-separated for several"),
+    date_from: Optional[date] = Query(None, description="Created on or after this date"),
+    date_to: Optional[date] = Query(None, description="Created on or before this date"),
+    session: AsyncSession = Depends(ConManager.get_session),
+    current_user: User = Depends(get_current_user),
+):
+    """Counts and requested quantity (kg) per group, computed in SQL"""
+    keys = list(dict.fromkeys(name.strip() for name in group_by.split(",") if name.strip()))
+    created_from, created_to = date_range(date_from, date_to)
+    groups = await AppointementService.get_stats(
+        session,
+        current_user,
+        group_by=keys,
+        zone_id=zone_id,
+        status=parse_statuses(status, AppointmentStatus),
+        created_from=created_from,
+        created_to=created_to,
+    )
+    return {"group_by": keys, "groups": groups}
+
+
+@router.get("/export", description="Stream appointments as CSV or NDJSON")
+async def export(
+    format: Literal["csv", "ndjson"] = Query("csv", description="csv or ndjson"),
+    zone_id: Optional[int] = Query(None, description="Zone ID to filter"),
+    farmer_id: Optional[int] = Query(None, description="Farmer ID to filter"),
+    status: Optional[str] = Query(None, description="Status to filter, comma-separated for several"),
+    date_from: Optional[date] = Query(None, description="Created on or after this date"),
+    date_to: Optional[date] = Query(None, description="Created on or before this date"),
+    session: AsyncSession = Depends(ConManager.get_session),
+    current_user: User = Depends(get_current_user),
+):
+    """Every matching appointment, oldest first, read through a server-side cursor"""
+    created_from, created_to = date_range(date_from, date_to)
+    result = await AppointementService.export_appointments(
+        session,
+        current_user,
+        zone_id=zone_id,
+        farmer_id=farmer_id,
+        status=parse_statuses(status, AppointmentStatus),
+        created_from=created_from,
+        created_to=created_to,
+    )
+    return export_response(result, format, "appointments")
+
+
+@router.post("/events/token", description="Get a short-lived token for the events stream")
+async def events_token(current_user: User = Depends(get_current_user)):
+    """Token for GET /appointment/events?token=..., since the browser
+    EventSource cannot send the Authorization header"""
+    return {
+        "token": create_events_token(current_user.user_id),
+        "expires_in": settings.EVENTS_TOKEN_SECONDS,
+    }
+
+
+@router.get("/events", description="Server-Sent Events stream of appointment changes")
+async def events(
+    session: AsyncSession = Depends(ConManager.get_session),
+    current_user: User = Depends(get_events_user),
+):
+    """Push committed appointment changes instead of polling the listings.
+
+    Farmers receive their own appointments, warehouse admins those of the
+    warehouses they manage, admins all of them. Authenticated by the
+    Authorization header or by ?token= from POST /appointment/events/token.
+    """
+    # The stream stays open for minutes: give the auth connection back now
+    await session.close()
+    return StreamingResponse(
+        AppointmentEventService.stream(current_user),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# Declared before /{appointment_id} so "history" is not taken for an id
+@router.get("/history", description="Get appointment history")
+async def get_history(
+    date_from: Optional[date] = Query(None, description="Created on or after this date"),
+    date_to: Optional[date] = Query(None, description="Created on or before this date"),
+    limit: int = Query(100, description="Max number of items to return"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    session: AsyncSession = Depends(ConManager.get_session),
+    current_user: User = Depends(get_current_user),
+):
+    """Completed and cancelled appointments of the current user, newest first"""
+    created_from, created_to = date_range(date_from, date_to)
+    history = await AppointementService.get_my_appointments(
+        session=session,
+        farmer_id=current_user.user_id,
+        status=[AppointmentStatus.COMPLETED, AppointmentStatus.CANCELLED],
+        limit=limit,
+        cursor=cursor,
+        created_from=created_from,
+        created_to=created_to,
+    )
+    return {
+        "appointments": history,
+        "next_cursor": next_cursor(history, limit, "created_at", "id"),
+    }
+
+
 @router.get("/{appointment_id}", description="get a single appointment")
 async def get_appointment(
     appointment_id: int,
@@ -82,14 +216,49 @@ async def get_appointment(
 @router.post("/", description="create an appointment")
 async def create(
     data: AppointmentCreateFromFrontend,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+    session: AsyncSession = Depends(ConManager.get_session),
+    current_user: User = Depends(get_current_user),
+):
+    """Create appointment - frontend format.
+
+    With an Idempotency-Key header, a retry replays the first response
+    instead of booking again.
+    """
+    async def handler():
+        return await AppointementService.create_appointment_from_frontend(
+            data, session, current_user.user_id
+        )
+
+    if idempotency_key is None:
+        return await handler()
+    return await IdempotencyService.run(
+        session,
+        idempotency_key,
+        current_user.user_id,
+        "POST /appointment",
+        IdempotencyService.fingerprint(data),
+        handler,
+    )
+
+
+@router.put("/bulk-status", description="Accept or refuse many appointments at once")
+async def bulk_update_status(
+    data: AppointmentBulkStatus,
     session: AsyncSession = Depends(ConManager.get_session),
     current_user: User = Depends(get_current_user),
 ):
-    """Create appointment - frontend format"""
-    appointment = await AppointementService.create_appointment_from_frontend(
-        data, session, current_user.user_id
+    """Accept or refuse a batch of pending appointments (warehouse admin only)"""
+    if current_user.role != UserRole.WAREHOUSE_ADMIN:
+        raise HTTPException(status_code=403, detail="Only warehouse admins can accept or refuse appointments")
+
+    results = await AppointementService.bulk_update_status(
+        session, data.appointment_ids, data.status, current_user
     )
-    return appointment
+    return {
+        "results": results,
+        "updated": sum(1 for result in results if result["success"]),
+    }
 
 
 @router.put("/{appointment_id}/cancel", description="Cancel an appointment")
@@ -114,8 +283,8 @@ async def cancel_appointment(
             raise HTTPException(status_code=403, detail="You can only cancel your own appointments")
         
         # Update appointment status to cancelled
-        updated = await AppointementService.update_appointment(
-            session, appointment_id, status=AppointmentStatus.CANCELLED
+        updated = await AppointementService.release_appointment(
+            session, appointment_id, AppointmentStatus.CANCELLED
         )
         return {"message": "Appointment cancelled successfully", "appointment": updated}
     except HTTPException:
@@ -147,10 +316,8 @@ async def accept_appointment(
         if appointment.status != AppointmentStatus.PENDING:
             raise HTTPException(status_code=400, detail="Only pending appointments can be accepted")
         
-        # Update appointment status to accepted
-        updated = await AppointementService.update_appointment(
-            session, appointment_id, status=AppointmentStatus.ACCEPTED
-        )
+        # Accept and reserve the requested quantity in the zone
+        updated = await AppointementService.accept_appointment(session, appointment_id)
         return {"message": "Appointment accepted successfully", "appointment": updated}
     except HTTPException:
         raise
@@ -181,9 +348,12 @@ async def refuse_appointment(
         if appointment.status != AppointmentStatus.PENDING:
             raise HTTPException(status_code=400, detail="Only pending appointments can be refused")
         
-        # Update appointment status to refused
-        updated = await AppointementService.update_appointment(
-            session, appointment_id, status=AppointmentStatus.REFUSED
+        # Refuse and release any capacity held for it
+        updated = await AppointementService.release_appointment(
+            session,
+            appointment_id,
+            AppointmentStatus.REFUSED,
+            from_statuses=(AppointmentStatus.PENDING,),
         )
         return {"message": "Appointment refused successfully", "appointment": updated}
     except HTTPException:
@@ -216,30 +386,8 @@ async def confirm_attendance(
         updated = await AppointementService.update_appointment(
             session, appointment_id, status=AppointmentStatus.COMPLETED
         )
-        await session.commit()
-        await session.refresh(updated)
         return {"message": "Attendance confirmed successfully", "appointment": updated}
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to confirm attendance: {str(e)}")
-
-
-@router.get("/history", description="Get appointment history")
-async def get_history(
-    session: AsyncSession = Depends(ConManager.get_session),
-    current_user: User = Depends(get_current_user),
-):
-    """Get appointment history for the current user"""
-    from src.database.db import AppointmentStatus
-    
-    # Get completed and cancelled appointments
-    completed = await AppointementService.get_my_appointments(
-        session=session, farmer_id=current_user.user_id, status=AppointmentStatus.COMPLETED
-    )
-    cancelled = await AppointementService.get_my_appointments(
-        session=session, farmer_id=current_user.user_id, status=AppointmentStatus.CANCELLED
-    )
-    
-    history = completed + cancelled
-    return {"appointments": history}
@@ -1,12 +1,17 @@
-from fastapi import APIRouter, Depends, Query, status, HTTPException
+from fastapi import APIRouter, Depends, Query, status, HTTPException, Header, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from src.config.database import ConManager
 from src.services.delivery import DeliveryService
+from src.services.idempotency import IdempotencyService
 from src.models.delivery import DeliveryCreate
 from src.models.user import UserRole
 from src.config.security import get_current_user
 from src.database.db import User
-from typing import Optional
+from src.utils.pagination import next_cursor
+from src.utils.filters import date_range
+from src.utils.export import export_response
+from datetime import date
+from typing import Literal, Optional
 import logging
 
 
@@ -15,9 +20,11 @@ router = APIRouter()
 
 @router.get("/", description="Get all deliveries")
 async def get_all(
+    response: Response,
     appointment_id: Optional[int] = Query(None, description="Appointment ID to filter"),
     skip: int = Query(0, description="Number of items to skip"),
     limit: int = Query(100, description="Max number of items to return"),
+    cursor: Optional[str] = Query(None, description="Cursor from X-Next-Cursor"),
     session: AsyncSession = Depends(ConManager.get_session),
     current_user: User = Depends(get_current_user),
 ):
@@ -28,21 +35,30 @@ async def get_all(
         skip=skip,
         limit=limit,
         current_user=current_user,
+        cursor=cursor,
     )
+    cursor = next_cursor(deliveries, limit, "created_at", "delivery_id")
+    if cursor:
+        response.headers["X-Next-Cursor"] = cursor
     return deliveries
 
 
 @router.get("/my-deliveries", description="Get my deliveries (for farmers)")
 async def get_my_deliveries(
+    limit: int = Query(100, description="Max number of items to return"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
     session: AsyncSession = Depends(ConManager.get_session),
     current_user: User = Depends(get_current_user),
 ):
     """Get deliveries for the current farmer"""
     try:
         deliveries = await DeliveryService.get_my_deliveries(
-            session=session, farmer_id=current_user.user_id
+            session=session, farmer_id=current_user.user_id, limit=limit, cursor=cursor
         )
-        return {"deliveries": deliveries}
+        return {
+            "deliveries": deliveries,
+            "next_cursor": next_cursor(deliveries, limit, "created_at", "id"),
+        }
     except HTTPException:
         raise
     except Exception as e:
@@ -52,6 +68,29 @@ async def get_my_deliveries(
         )
 
 
+@router.get("/export", description="Stream deliveries as CSV or NDJSON")
+async def export(
+    format: Literal["csv", "ndjson"] = Query("csv", description="csv or ndjson"),
+    zone_id: Optional[int] = Query(None, description="Zone ID to filter"),
+    farmer_id: Optional[int] = Query(None, description="Farmer ID to filter"),
+    date_from: Optional[date] = Query(None, description="Delivered on or after this date"),
+    date_to: Optional[date] = Query(None, description="Delivered on or before this date"),
+    session: AsyncSession = Depends(ConManager.get_session),
+    current_user: User = Depends(get_current_user),
+):
+    """Every matching delivery, oldest first, read through a server-side cursor"""
+    created_from, created_to = date_range(date_from, date_to)
+    result = await DeliveryService.export_deliveries(
+        session,
+        current_user,
+        zone_id=zone_id,
+        farmer_id=farmer_id,
+        created_from=created_from,
+        created_to=created_to,
+    )
+    return export_response(result, format, "deliveries")
+
+
 @router.get("/{delivery_id}", description="Get a single delivery")
 async def get_delivery(
     delivery_id: int,
@@ -66,10 +105,26 @@ async def get_delivery(
 @router.post("/", description="Create a delivery")
 async def create(
     data: DeliveryCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
     session: AsyncSession = Depends(ConManager.get_session),
     current_user: User = Depends(get_current_user),
 ):
-    """Create a new delivery"""
-    delivery = await DeliveryService.create_delivery(session, data, current_user)
-    return delivery
+    """Create a new delivery.
+
+    With an Idempotency-Key header, a retry replays the first response
+    instead of recording the delivery twice.
+    """
+    async def handler():
+        return await DeliveryService.create_delivery(session, data, current_user)
+
+    if idempotency_key is None:
+        return await handler()
+    return await IdempotencyService.run(
+        session,
+        idempotency_key,
+        current_user.user_id,
+        "POST /delivery",
+        IdempotencyService.fingerprint(data),
+        handler,
+    )
 
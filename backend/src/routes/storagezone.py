@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, Query, HTTPException, status
+from fastapi import APIRouter, Depends, Query, HTTPException, status, Response
 from src.config.database import ConManager
 from src.config.security import get_current_user
 from src.models.storagezone import StorageZoneCreate, StorageZoneUpdate, ZoneStatus
@@ -6,6 +6,7 @@ from src.models.user import UserRole
 from src.services.storagezone import StorageService
 from src.repositories.warehouse import WarehouseRepo
 from src.repositories.user import User
+from src.utils.pagination import next_cursor
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 
@@ -29,6 +30,7 @@ async def check_warehouse_access(
 
 @router.get("/", description="List all zones")
 async def get_all(
+    response: Response,
     session: AsyncSession = Depends(ConManager.get_session),
     current_user: User = Depends(get_current_user),
     skip: int = Query(0, ge=0),
@@ -36,6 +38,7 @@ async def get_all(
     warehouse_id: Optional[int] = None,
     grain_type_id: Optional[int] = None,
     status: Optional[ZoneStatus] = None,
+    cursor: Optional[str] = Query(None, description="Cursor from X-Next-Cursor"),
 ):
     # Check warehouse access for warehouse admins
     if current_user.role == UserRole.WAREHOUSE_ADMIN:
@@ -60,7 +63,11 @@ async def get_all(
         warehouse_id=warehouse_id,
         grain_type_id=grain_type_id,
         status=status,
+        cursor=cursor,
     )
+    cursor = next_cursor(zones, limit, "created_at", "zone_id")
+    if cursor:
+        response.headers["X-Next-Cursor"] = cursor
     return zones
 
 
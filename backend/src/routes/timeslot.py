@@ -2,7 +2,10 @@ from fastapi import APIRouter, Depends, Query, HTTPException, status, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from src.config.database import ConManager
 from src.services.timeslot import TimeSlotService
+from src.services.availability import cursor_id_attr
 from src.models.timeslot import TimeSlotCreate, TimeSlotUpdate
+from src.utils.pagination import next_cursor
+from datetime import date, datetime, timedelta
 from typing import Optional
 import logging
 
@@ -15,15 +18,20 @@ async def list_all(
     zone_id: int = Query(..., description="Zone ID"),
     skip: int = Query(0, description="Number of items to skip"),
     limit: int = Query(100, description="Max number of items to return"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
     session: AsyncSession = Depends(ConManager.get_session),
 ):
-    times = await TimeSlotService.get_all(session, zone_id, skip=skip, limit=limit)
-    return {"data": times}
+    times = await TimeSlotService.get_all(
+        session, zone_id, skip=skip, limit=limit, cursor=cursor
+    )
+    return {"data": times, "next_cursor": next_cursor(times, limit, "start_at", "time_id")}
 
 
 @router.get("/available", description="Get available time slots for a zone")
 async def get_available(
     request: Request,
+    limit: int = Query(1000, ge=1, description="Max number of items to return"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
     session: AsyncSession = Depends(ConManager.get_session),
 ):
     """Get available time slots for a zone"""
@@ -64,8 +72,10 @@ async def get_available(
                 grain_type_id_int = None
         
         logging.info(f"get_available: zone_id={zone_id_int}, grain_type_id={grain_type_id_int}")
-        slots = await TimeSlotService.get_available(session, zone_id_int, grain_type_id_int)
-        return {"data": slots}
+        slots = await TimeSlotService.get_available(
+            session, zone_id_int, grain_type_id_int, limit=limit, cursor=cursor
+        )
+        return {"data": slots, "next_cursor": next_cursor(slots, limit, "start_at", cursor_id_attr())}
     except HTTPException:
         raise
     except Exception as e:
@@ -76,6 +86,33 @@ async def get_available(
         )
 
 
+@router.get("/availability", description="Available time slots of many zones, grouped by day")
+async def get_availability(
+    warehouse_id: Optional[int] = Query(None, description="All active zones of this warehouse"),
+    grain_type_id: Optional[int] = Query(None, description="All active zones storing this grain type"),
+    date_from: Optional[date] = Query(None, description="First day, defaults to today"),
+    date_to: Optional[date] = Query(None, description="Last day (inclusive), defaults to a week after date_from"),
+    session: AsyncSession = Depends(ConManager.get_session),
+):
+    """Calendar of free slots across zones, from a single query"""
+    date_from = date_from or datetime.utcnow().date()
+    date_to = date_to or date_from + timedelta(days=6)
+    days = await TimeSlotService.get_availability(
+        session,
+        date_from,
+        date_to,
+        warehouse_id=warehouse_id,
+        grain_type_id=grain_type_id,
+    )
+    return {
+        "warehouse_id": warehouse_id,
+        "grain_type_id": grain_type_id,
+        "date_from": date_from,
+        "date_to": date_to,
+        "days": days,
+    }
+
+
 @router.get("/{time_id}", description="get time")
 async def get_time(
     time_id: int, session: AsyncSession = Depends(ConManager.get_session)
@@ -115,17 +152,19 @@ async def delete(time_id: int, session: AsyncSession = Depends(ConManager.get_se
 async def generate(session: AsyncSession = Depends(ConManager.get_session)):
     """Generate time slots for the next day based on templates"""
     try:
-        slots = await TimeSlotService.generate_timeslots_for_next_day(session)
-        if len(slots) == 0:
+        result = await TimeSlotService.generate_timeslots_for_next_day(session)
+        if result["created"] == 0:
             return {
                 "message": "No time slots generated. Make sure you have templates for tomorrow's weekday.",
-                "slots": [],
-                "count": 0
+                "count": 0,
+                "skipped": result["skipped"],
+                "zones": result["zones"],
             }
         return {
-            "message": f"Generated {len(slots)} time slots for tomorrow",
-            "slots": slots,
-            "count": len(slots)
+            "message": f"Generated {result['created']} time slots for tomorrow",
+            "count": result["created"],
+            "skipped": result["skipped"],
+            "zones": result["zones"],
         }
     except Exception as e:
         import logging
@@ -137,17 +176,19 @@ async def generate(session: AsyncSession = Depends(ConManager.get_session)):
 async def generate_week(session: AsyncSession = Depends(ConManager.get_session)):
     """Generate time slots for the next 7 days based on templates"""
     try:
-        slots = await TimeSlotService.generate_timeslots_for_next_week(session)
-        if len(slots) == 0:
+        result = await TimeSlotService.generate_timeslots_for_next_week(session)
+        if result["created"] == 0:
             return {
                 "message": "No time slots generated. Make sure you have templates for the upcoming weekdays.",
-                "slots": [],
-                "count": 0
+                "count": 0,
+                "skipped": result["skipped"],
+                "zones": result["zones"],
             }
         return {
-            "message": f"Generated {len(slots)} time slots for the next week",
-            "slots": slots,
-            "count": len(slots)
+            "message": f"Generated {result['created']} time slots for the next week",
+            "count": result["created"],
+            "skipped": result["skipped"],
+            "zones": result["zones"],
         }
     except Exception as e:
         import logging
@@ -5,17 +5,29 @@ from src.repositories.user import UserRepo
 from src.repositories.timeslot import TimeSlotRepo
 from src.repositories.grain import GrainRepo
 from src.repositories.storagezone import StorageZoneRepo
-from src.HTTPBaseException import HTTPBaseException
+from src.repositories.capacityreservation import CapacityReservationRepo
+from src.config.database import ConManager
+from src.utils.export import EXPORT_BATCH_SIZE
+from src.utils.cache import TTLCache
+from src.services.events import APPOINTMENT_EVENTS_CHANNEL
+from src.services.availability import AvailabilityIndex
+from src.services.timeslot import TimeSlotService
+from src.config.settings import settings
 from src.models.appointment import (
     AppointmentCreate,
     AppointmentCreateFromFrontend,
     AppointmentUpdate,
 )
-from src.database.db import TimeSlotStatus, AppointmentStatus
-from typing import Optional
+from src.database.db import AppointmentStatus
+from datetime import datetime
+from typing import List, Optional, Union
 import logging
 
 
+# Aggregated statistics, keyed by caller scope and query
+_stats_cache = TTLCache(ttl=settings.STATS_CACHE_SECONDS)
+
+
 class AppointementService:
     @staticmethod
     async def create_appointment(
@@ -23,6 +35,9 @@ class AppointementService:
     ):
         """Create appointment - can accept either AppointmentCreate or farmer_id separately"""
         try:
+            # Booking checks must not see replica lag
+            ConManager.use_primary(session)
+
             # Use farmer_id from parameter if provided, otherwise from data
             farmer_id = farmer_id or data.farmer_id
             farmer = await UserRepo.get_by_id(session, farmer_id)
@@ -30,24 +45,11 @@ class AppointementService:
             time = await TimeSlotRepo.get_by_id(session, data.timeslot_id)
             grain = await GrainRepo.get_by_id(session, data.grain_type_id)
 
-            if time.status != TimeSlotStatus.ACTIVE:
-                raise HTTPException(status_code=403, detail="Cannot use this time")
-
             if zone.available_capacity < data.requested_quantity:
                 raise HTTPException(
                     status_code=403, detail="Storage capacity not sufficient"
                 )
 
-            existing_appointment = await AppointmentRepo.get_by_timeslot(
-                session, time.time_id
-            )
-            if existing_appointment:
-                raise HTTPException(status_code=403, detail="Time slot already booked")
-
-            await TimeSlotRepo.update(
-                session, time.time_id, status=TimeSlotStatus.NOT_ACTIVE
-            )
-
             # Create appointment with farmer_id
             appointment_data = AppointmentCreate(
                 farmer_id=farmer_id,
@@ -58,7 +60,28 @@ class AppointementService:
                 status=AppointmentStatus.PENDING,
             )
 
-            appointment = await AppointmentRepo.create(session, appointment_data)
+            # Claim the slot and insert the appointment in one transaction.
+            # The conditional UPDATE and the unique booking index decide the
+            # race, so exactly one request wins and every loser gets 409.
+            async with ConManager.unit_of_work(session):
+                claimed = await TimeSlotRepo.claim(
+                    session, time.time_id, commit=False
+                )
+                if claimed is None:
+                    if await AppointmentRepo.is_booked(session, time.time_id):
+                        raise AppointmentRepo.SlotAlreadyBooked()
+                    # Not active and nobody holds it: disabled by an admin
+                    raise HTTPException(status_code=403, detail="Cannot use this time")
+                appointment = await AppointmentRepo.create(
+                    session, appointment_data, commit=False
+                )
+                await AppointmentRepo.notify_changes(
+                    session,
+                    [appointment.appointment_id],
+                    APPOINTMENT_EVENTS_CHANNEL,
+                    commit=False,
+                )
+            AvailabilityIndex.invalidate_after_commit(session, time.zone_id)
 
             return appointment
 
@@ -78,19 +101,30 @@ class AppointementService:
     ):
         """Create appointment from frontend format"""
         try:
-            # Convert frontend format to backend format
-            appointment_data = AppointmentCreate(
-                farmer_id=farmer_id,
-                zone_id=data.warehouseZoneId,
-                grain_type_id=int(data.grainTypeId),
-                timeslot_id=data.timeSlotId,
-                requested_quantity=int(data.requestedQuantity),
-                status=AppointmentStatus.PENDING,
-            )
+            # A virtual slot's row is inserted in the booking transaction
+            # (create_appointment's unit of work joins this one), so a
+            # booking that fails leaves no slot row behind
+            async with ConManager.unit_of_work(session):
+                timeslot_id = data.timeSlotId
+                if timeslot_id is None:
+                    slot = await TimeSlotService.materialize(
+                        session, data.warehouseZoneId, data.startAt, commit=False
+                    )
+                    timeslot_id = slot.time_id
 
-            return await AppointementService.create_appointment(
-                appointment_data, session, farmer_id
-            )
+                # Convert frontend format to backend format
+                appointment_data = AppointmentCreate(
+                    farmer_id=farmer_id,
+                    zone_id=data.warehouseZoneId,
+                    grain_type_id=int(data.grainTypeId),
+                    timeslot_id=timeslot_id,
+                    requested_quantity=int(data.requestedQuantity),
+                    status=AppointmentStatus.PENDING,
+                )
+
+                return await AppointementService.create_appointment(
+                    appointment_data, session, farmer_id
+                )
 
         except HTTPException:
             raise
@@ -105,139 +139,186 @@ class AppointementService:
         session: AsyncSession,
         zone_id: Optional[int] = None,
         farmer_id: Optional[int] = None,
-        status: Optional[AppointmentStatus] = None,
+        status: Optional[Union[AppointmentStatus, List[AppointmentStatus]]] = None,
         current_user=None,
+        skip: int = 0,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
     ):
         from src.models.user import UserRole
         
-        # If warehouse admin, only return appointments for their warehouse zones
+        # If warehouse admin, only return appointments in zones of the
+        # warehouses they manage, joined through to warehouse.manager_id
         if current_user and current_user.role == UserRole.WAREHOUSE_ADMIN:
-            from src.repositories.warehouse import WarehouseRepo
-            from src.repositories.storagezone import StorageZoneRepo
-            
-            # Get all zones for this warehouse admin
-            warehouses = await WarehouseRepo.get_all(
-                session, manager_id=current_user.user_id
+            return await AppointmentRepo.get_all(
+                session,
+                zone_id=zone_id,
+                farmer_id=farmer_id,
+                status=status,
+                skip=skip,
+                limit=limit,
+                cursor=cursor,
+                manager_id=current_user.user_id,
+                created_from=created_from,
+                created_to=created_to,
             )
-            if not warehouses:
-                return []
-            
-            warehouse_id = warehouses[0].warehouse_id
-            zones = await StorageZoneRepo.get_all(session, warehouse_id=warehouse_id)
-            zone_ids = [z.zone_id for z in zones]
-            
-            # Get appointments for these zones
-            appointments = []
-            for z_id in zone_ids:
-                zones_apps = await AppointmentRepo.get_all(
-                    session, zone_id=z_id, farmer_id=farmer_id, status=status
-                )
-                appointments.extend(zones_apps)
-            return appointments
         
         appointments = await AppointmentRepo.get_all(
-            session, zone_id=zone_id, farmer_id=farmer_id, status=status
+            session,
+            zone_id=zone_id,
+            farmer_id=farmer_id,
+            status=status,
+            skip=skip,
+            limit=limit,
+            cursor=cursor,
+            created_from=created_from,
+            created_to=created_to,
         )
         return appointments
 
+    @staticmethod
+    async def export_appointments(
+        session: AsyncSession,
+        current_user,
+        zone_id: Optional[int] = None,
+        farmer_id: Optional[int] = None,
+        status: Optional[Union[AppointmentStatus, List[AppointmentStatus]]] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+    ):
+        """Open a streaming result of the appointments current_user may export"""
+        from src.models.user import UserRole
+
+        manager_id = None
+        if current_user.role == UserRole.WAREHOUSE_ADMIN:
+            manager_id = current_user.user_id
+        elif current_user.role == UserRole.FARMER:
+            farmer_id = current_user.user_id
+
+        return await AppointmentRepo.stream_rows(
+            session,
+            zone_id=zone_id,
+            farmer_id=farmer_id,
+            manager_id=manager_id,
+            status=status,
+            created_from=created_from,
+            created_to=created_to,
+            batch_size=EXPORT_BATCH_SIZE,
+        )
+
+    @staticmethod
+    async def get_stats(
+        session: AsyncSession,
+        current_user,
+        group_by: List[str],
+        zone_id: Optional[int] = None,
+        status: Optional[List[AppointmentStatus]] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+    ):
+        """Appointment counts and requested quantity per group, from one GROUP BY.
+
+        Results are cached for STATS_CACHE_SECONDS per caller scope.
+        """
+        from src.models.user import UserRole
+
+        if not group_by:
+            raise AppointmentRepo.InvalidGroupBy()
+
+        manager_id = farmer_id = None
+        if current_user.role == UserRole.WAREHOUSE_ADMIN:
+            manager_id = current_user.user_id
+        elif current_user.role == UserRole.FARMER:
+            farmer_id = current_user.user_id
+
+        key = (
+            manager_id,
+            farmer_id,
+            tuple(group_by),
+            zone_id,
+            tuple(status or ()),
+            created_from,
+            created_to,
+        )
+        groups = _stats_cache.get(key)
+        if groups is None:
+            rows = await AppointmentRepo.count(
+                session,
+                farmer_id=farmer_id,
+                zone_id=zone_id,
+                status=status,
+                group_by=group_by,
+                manager_id=manager_id,
+                created_from=created_from,
+                created_to=created_to,
+            )
+            groups = [dict(row._mapping) for row in rows]
+            _stats_cache.set(key, groups)
+        return groups
+
     @staticmethod
     async def get_my_appointments(
         session: AsyncSession,
         farmer_id: int,
-        status: Optional[AppointmentStatus] = None,
+        status: Optional[Union[AppointmentStatus, List[AppointmentStatus]]] = None,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
     ):
         try:
-            appointments = await AppointmentRepo.get_all(
-                session, farmer_id=farmer_id, status=status
+            # One joined query, whatever the number of appointments
+            rows = await AppointmentRepo.get_farmer_feed(
+                session,
+                farmer_id,
+                status=status,
+                limit=limit,
+                cursor=cursor,
+                created_from=created_from,
+                created_to=created_to,
             )
 
             formatted_appointments = []
-            for apt in appointments:
-                grain = None
+            for row in rows:
                 time_slot = None
-                zone = None
-                warehouse = None
-                
-                try:
-                    grain = await GrainRepo.get_by_id(session, apt.grain_type_id)
-                except (HTTPBaseException, HTTPException, Exception) as e:
-                    logging.warning(f"Grain {apt.grain_type_id} not found for appointment {apt.appointment_id}: {e}")
-                    grain = None
-                
-                try:
-                    time_slot = await TimeSlotRepo.get_by_id(session, apt.timeslot_id)
-                except (HTTPBaseException, HTTPException, Exception) as e:
-                    logging.warning(f"Time slot {apt.timeslot_id} not found for appointment {apt.appointment_id}: {e}")
-                    time_slot = None
-                
-                try:
-                    zone = await StorageZoneRepo.get_by_id(session, apt.zone_id)
-                except (HTTPBaseException, HTTPException, Exception) as e:
-                    logging.warning(f"Zone {apt.zone_id} not found for appointment {apt.appointment_id}: {e}")
-                    zone = None
-                
-                if zone:
-                    from src.repositories.warehouse import WarehouseRepo
-                    try:
-                        warehouse = await WarehouseRepo.get_by_id(
-                            session, zone.warehouse_id
-                        )
-                    except (HTTPBaseException, HTTPException, Exception) as e:
-                        logging.warning(f"Warehouse {zone.warehouse_id} not found for zone {zone.zone_id}: {e}")
-                        warehouse = None
-
-                status_str = "UNKNOWN"
-                if apt.status:
-                    try:
-                        if isinstance(apt.status, AppointmentStatus):
-                            status_str = apt.status.value.upper()
-                        elif isinstance(apt.status, str):
-                            status_str = apt.status.upper()
-                        else:
-                            status_str = str(apt.status).upper()
-                    except Exception as e:
-                        logging.warning(f"Error formatting status for appointment {apt.appointment_id}: {e}")
-                        status_str = "UNKNOWN"
-                
-                formatted_appointments.append(
-                    {
-                        "id": apt.appointment_id,
-                        "appointment_id": apt.appointment_id,
-                        "farmer_id": apt.farmer_id,
-                        "zone_id": apt.zone_id,
-                        "grain_type_id": apt.grain_type_id,
-                        "grainType": grain.name if grain and hasattr(grain, 'name') else f"Grain {apt.grain_type_id}",
-                        "requestedQuantity": float(apt.requested_quantity) if apt.requested_quantity else 0.0,
-                        "status": status_str,
-                        "scheduledDate": time_slot.start_at.isoformat()
-                        if time_slot and hasattr(time_slot, 'start_at') and time_slot.start_at
-                        else None,
-                        "timeSlot": {
-                            "id": time_slot.time_id if time_slot and hasattr(time_slot, 'time_id') else None,
-                            "start_at": time_slot.start_at.isoformat()
-                            if time_slot and hasattr(time_slot, 'start_at') and time_slot.start_at
-                            else None,
-                            "end_at": time_slot.end_at.isoformat()
-                            if time_slot and hasattr(time_slot, 'end_at') and time_slot.end_at
-                            else None,
-                        }
-                        if time_slot
-                        else None,
-                        "warehouseZone": {
-                            "id": zone.zone_id if zone and hasattr(zone, 'zone_id') else None,
-                            "name": zone.name if zone and hasattr(zone, 'name') else None,
-                            "warehouse": {
-                                "id": warehouse.warehouse_id if warehouse and hasattr(warehouse, 'warehouse_id') else None,
-                                "name": warehouse.name if warehouse and hasattr(warehouse, 'name') else None,
-                                "location": warehouse.location if warehouse and hasattr(warehouse, 'location') else None,
-                            }
-                            if warehouse
-                            else None,
+                if row.time_id is not None:
+                    time_slot = {
+                        "id": row.time_id,
+                        "start_at": row.start_at.isoformat(),
+                        "end_at": row.end_at.isoformat(),
+                    }
+
+                warehouse_zone = None
+                if row.zone_name is not None:
+                    warehouse_zone = {
+                        "id": row.zone_id,
+                        "name": row.zone_name,
+                        "warehouse": {
+                            "id": row.warehouse_id,
+                            "name": row.warehouse_name,
+                            "location": row.warehouse_location,
                         }
-                        if zone
+                        if row.warehouse_id is not None
                         else None,
-                        "created_at": apt.created_at.isoformat() if apt.created_at else None,
-                        "updated_at": apt.updated_at.isoformat() if apt.updated_at else None,
+                    }
+
+                formatted_appointments.append(
+                    {
+                        "id": row.appointment_id,
+                        "appointment_id": row.appointment_id,
+                        "farmer_id": row.farmer_id,
+                        "zone_id": row.zone_id,
+                        "grain_type_id": row.grain_type_id,
+                        "grainType": row.grain_name or f"Grain {row.grain_type_id}",
+                        "requestedQuantity": float(row.requested_quantity or 0),
+                        "status": row.status.value.upper() if row.status else "UNKNOWN",
+                        "scheduledDate": time_slot["start_at"] if time_slot else None,
+                        "timeSlot": time_slot,
+                        "warehouseZone": warehouse_zone,
+                        "created_at": row.created_at.isoformat(),
+                        "updated_at": row.updated_at.isoformat(),
                     }
                 )
 
@@ -255,12 +336,21 @@ class AppointementService:
         from src.models.user import UserRole
         from src.repositories.warehouse import WarehouseRepo
         
-        appointment = await AppointmentRepo.get_by_id(session, id)
+        is_warehouse_admin = (
+            current_user and current_user.role == UserRole.WAREHOUSE_ADMIN
+        )
+        appointment = await AppointmentRepo.get_by_id(
+            session, id, include=("warehouse",) if is_warehouse_admin else None
+        )
         
         # Check warehouse admin access
-        if current_user and current_user.role == UserRole.WAREHOUSE_ADMIN:
-            zone = await StorageZoneRepo.get_by_id(session, appointment.zone_id)
-            warehouse = await WarehouseRepo.get_by_id(session, zone.warehouse_id)
+        if is_warehouse_admin:
+            zone = appointment.zone
+            if zone is None:
+                raise StorageZoneRepo.StorageZoneNotFound()
+            warehouse = zone.warehouse
+            if warehouse is None:
+                raise WarehouseRepo.WarehouseNotFound()
             
             if warehouse.manager_id != current_user.user_id:
                 raise HTTPException(
@@ -270,13 +360,187 @@ class AppointementService:
         
         return appointment
 
+    @staticmethod
+    async def accept_appointment(session: AsyncSession, appointment_id: int):
+        """Accept a pending appointment and reserve its quantity in the zone"""
+        ConManager.use_primary(session)
+        async with ConManager.unit_of_work(session):
+            appointment = await AppointmentRepo.transition(
+                session,
+                appointment_id,
+                AppointmentStatus.ACCEPTED,
+                from_statuses=(AppointmentStatus.PENDING,),
+                commit=False,
+            )
+            if appointment is None:
+                raise HTTPException(
+                    status_code=400, detail="Only pending appointments can be accepted"
+                )
+            await CapacityReservationRepo.reserve(
+                session,
+                appointment.appointment_id,
+                appointment.zone_id,
+                appointment.requested_quantity,
+                commit=False,
+            )
+            await AppointmentRepo.notify_changes(
+                session, [appointment_id], APPOINTMENT_EVENTS_CHANNEL, commit=False
+            )
+        return appointment
+
+    @staticmethod
+    async def release_appointment(
+        session: AsyncSession,
+        appointment_id: int,
+        status: AppointmentStatus,
+        from_statuses: Optional[tuple] = None,
+    ):
+        """Cancel or refuse an appointment and give back any capacity it reserved"""
+        ConManager.use_primary(session)
+        async with ConManager.unit_of_work(session):
+            if from_statuses:
+                appointment = await AppointmentRepo.transition(
+                    session, appointment_id, status, from_statuses, commit=False
+                )
+                if appointment is None:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"Appointment cannot be {status.value} in its current status",
+                    )
+            else:
+                appointment = await AppointmentRepo.update(
+                    session, appointment_id, commit=False, status=status
+                )
+            await CapacityReservationRepo.release(
+                session, appointment_id, commit=False
+            )
+            # The slot claimed at booking is free again
+            await TimeSlotRepo.reopen(
+                session, [appointment.timeslot_id], commit=False
+            )
+            await AppointmentRepo.notify_changes(
+                session, [appointment_id], APPOINTMENT_EVENTS_CHANNEL, commit=False
+            )
+        AvailabilityIndex.invalidate_after_commit(session, appointment.zone_id)
+        return appointment
+
+    @staticmethod
+    async def bulk_update_status(
+        session: AsyncSession,
+        appointment_ids: List[int],
+        status: AppointmentStatus,
+        current_user,
+    ):
+        """Accept or refuse many pending appointments in one transaction.
+
+        Ownership and status are checked for the whole batch with one locking
+        query; returns one result per requested id, in request order.
+        """
+        if status not in (AppointmentStatus.ACCEPTED, AppointmentStatus.REFUSED):
+            raise HTTPException(
+                status_code=400, detail="Bulk status must be accepted or refused"
+            )
+
+        appointment_ids = list(dict.fromkeys(appointment_ids))
+        failures = {}
+
+        ConManager.use_primary(session)
+        async with ConManager.unit_of_work(session):
+            rows = await AppointmentRepo.get_for_update(session, appointment_ids)
+
+            # Oldest first, so earlier requests get zone capacity first
+            eligible = []
+            for row in rows:
+                if row.manager_id != current_user.user_id:
+                    failures[row.appointment_id] = (
+                        "You can only manage appointments in your own warehouse"
+                    )
+                elif row.status != AppointmentStatus.PENDING:
+                    failures[row.appointment_id] = (
+                        f"Only pending appointments can be {status.value}"
+                    )
+                else:
+                    eligible.append(row)
+
+            if status == AppointmentStatus.ACCEPTED:
+                reserved = set(
+                    await CapacityReservationRepo.reserve_many(
+                        session,
+                        [
+                            (row.appointment_id, row.zone_id, row.requested_quantity)
+                            for row in eligible
+                        ],
+                        commit=False,
+                    )
+                )
+                for row in eligible:
+                    if row.appointment_id not in reserved:
+                        failures[row.appointment_id] = "Storage capacity not sufficient"
+                to_update = list(reserved)
+            else:
+                # Pending appointments hold no reservation, nothing to release
+                to_update = [row.appointment_id for row in eligible]
+
+            updated = set(
+                await AppointmentRepo.transition_many(
+                    session,
+                    to_update,
+                    status,
+                    from_statuses=(AppointmentStatus.PENDING,),
+                    commit=False,
+                )
+            )
+            if status == AppointmentStatus.REFUSED:
+                await TimeSlotRepo.reopen(
+                    session,
+                    [row.timeslot_id for row in eligible if row.appointment_id in updated],
+                    commit=False,
+                )
+            await AppointmentRepo.notify_changes(
+                session, list(updated), APPOINTMENT_EVENTS_CHANNEL, commit=False
+            )
+        AvailabilityIndex.invalidate_after_commit(
+            session,
+            *{row.zone_id for row in rows if row.appointment_id in updated}
+        )
+
+        results = []
+        for appointment_id in appointment_ids:
+            if appointment_id in updated:
+                results.append(
+                    {"appointment_id": appointment_id, "success": True, "status": status}
+                )
+            else:
+                results.append(
+                    {
+                        "appointment_id": appointment_id,
+                        "success": False,
+                        "detail": failures.get(appointment_id, "Appointment not found"),
+                    }
+                )
+        return results
+
     @staticmethod
     async def update_appointment(
         session: AsyncSession, appointment_id: int, **kwargs
     ):
-        """Update an appointment"""
+        """Update an appointment and publish the change to event subscribers"""
         try:
-            updated = await AppointmentRepo.update(session, appointment_id, **kwargs)
+            async with ConManager.unit_of_work(session):
+                updated = await AppointmentRepo.update(
+                    session, appointment_id, commit=False, **kwargs
+                )
+                if updated is not None and kwargs.get("status") in (
+                    AppointmentStatus.CANCELLED,
+                    AppointmentStatus.REFUSED,
+                ):
+                    await TimeSlotRepo.reopen(
+                        session, [updated.timeslot_id], commit=False
+                    )
+                    AvailabilityIndex.invalidate_after_commit(session, updated.zone_id)
+                await AppointmentRepo.notify_changes(
+                    session, [appointment_id], APPOINTMENT_EVENTS_CHANNEL, commit=False
+                )
             return updated
         except Exception as e:
             await session.rollback()
@@ -0,0 +1,159 @@
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config.database import ConManager
+from src.config.settings import settings
+from src.repositories.storagezone import StorageZoneRepo
+from src.repositories.timeslot import TimeSlotRepo
+from src.utils.cache import TTLCache
+from src.utils.pagination import decode_cursor
+
+# Zones with more upcoming free slots than this are paged from the database
+AVAILABILITY_INDEX_MAX_SLOTS = 5000
+
+
+def virtual_slots() -> bool:
+    return settings.TIMESLOT_MODE == "virtual"
+
+
+def cursor_id_attr() -> str:
+    """Slot key that next_cursor pairs with start_at in the current mode"""
+    return "zone_id" if virtual_slots() else "time_id"
+
+
+async def fetch_available(
+    session: AsyncSession,
+    zone_id: int,
+    start_after: datetime,
+    limit: int,
+    cursor: Optional[str] = None,
+):
+    """One page of a zone's free slots straight from the database"""
+    if not virtual_slots():
+        return await TimeSlotRepo.get_available(
+            session, zone_id, start_after=start_after, limit=limit, cursor=cursor
+        )
+    if cursor:
+        start_after = max(start_after, decode_cursor(cursor)[0])
+    return await TimeSlotRepo.get_virtual_available(
+        session,
+        start_after,
+        datetime.utcnow() + timedelta(days=settings.TIMESLOT_HORIZON_DAYS),
+        zone_id=zone_id,
+        limit=limit,
+    )
+
+
+def slot_dict(row) -> dict:
+    """Available slot as the booking frontend expects it"""
+    return {
+        "time_id": row.time_id,
+        "zone_id": row.zone_id,
+        "start_at": row.start_at.isoformat(),
+        "end_at": row.end_at.isoformat(),
+        "date": row.start_at.strftime("%Y-%m-%d"),
+        "startTime": row.start_at.strftime("%H:%M"),
+        "endTime": row.end_at.strftime("%H:%M"),
+        "status": row.status.value,
+        "available": True,
+    }
+
+
+class ZoneSlots:
+    """Upcoming free slots of one zone, sorted by (start_at, time_id).
+
+    complete is False when the zone had more than AVAILABILITY_INDEX_MAX_SLOTS
+    free slots; such an entry holds no slots and only tells the grain type,
+    the pages then come from the database.
+    Virtual slots have no time_id: they sort on start_at alone (unique per
+    zone), and their cursors carry the zone_id, which is never below 1.
+    """
+
+    __slots__ = ("grain_type_id", "complete", "keys", "slots")
+
+    def __init__(self, grain_type_id: int, rows, complete: bool = True):
+        self.grain_type_id = grain_type_id
+        self.complete = complete
+        if virtual_slots():
+            self.keys = [(row.start_at, 0) for row in rows]
+        else:
+            self.keys = [(row.start_at, row.time_id) for row in rows]
+        self.slots = [slot_dict(row) for row in rows]
+
+    def page(self, limit: int, cursor: Optional[str] = None) -> List[dict]:
+        """Slots starting after now (and after the cursor), at most limit of them"""
+        # (now, inf) sorts after every slot starting at or before now
+        start = bisect_right(self.keys, (datetime.utcnow(), float("inf")))
+        if cursor:
+            start = max(start, bisect_right(self.keys, decode_cursor(cursor)))
+        return self.slots[start : start + limit]
+
+
+_zones = TTLCache(ttl=settings.AVAILABILITY_INDEX_SECONDS)
+
+
+class AvailabilityIndex:
+    """In-process index of each zone's free slots, built lazily on first read.
+
+    Writes in this process invalidate the zone once they commit; appointment
+    events (LISTEN/NOTIFY) invalidate it in the other processes. Anything
+    else is picked up when the entry expires, so a read is at most
+    AVAILABILITY_INDEX_SECONDS stale. A stale slot is harmless: booking it
+    fails with 409 because the slot claim is atomic.
+    """
+
+    # Bumped on every invalidation, so a build that raced a write is not stored
+    _epoch: int = 0
+    _generations: Dict[int, int] = {}
+
+    @staticmethod
+    def _version(zone_id: int) -> tuple:
+        return AvailabilityIndex._epoch, AvailabilityIndex._generations.get(zone_id, 0)
+
+    @staticmethod
+    async def get(session: AsyncSession, zone_id: int) -> ZoneSlots:
+        zone_slots = _zones.get(zone_id)
+        if zone_slots is not None:
+            return zone_slots
+
+        version = AvailabilityIndex._version(zone_id)
+        zone = await StorageZoneRepo.get_by_id(session, zone_id)
+        rows = await fetch_available(
+            session,
+            zone_id,
+            start_after=datetime.utcnow(),
+            limit=AVAILABILITY_INDEX_MAX_SLOTS + 1,
+        )
+        if len(rows) > AVAILABILITY_INDEX_MAX_SLOTS:
+            zone_slots = ZoneSlots(zone.grain_type_id, [], complete=False)
+        else:
+            zone_slots = ZoneSlots(zone.grain_type_id, rows)
+        if AvailabilityIndex._version(zone_id) == version:
+            _zones.set(zone_id, zone_slots)
+        return zone_slots
+
+    @staticmethod
+    def invalidate(*zone_ids: Optional[int]) -> None:
+        generations = AvailabilityIndex._generations
+        for zone_id in zone_ids:
+            if zone_id is None:
+                continue
+            generations[zone_id] = generations.get(zone_id, 0) + 1
+            _zones.discard(zone_id)
+
+    @staticmethod
+    def invalidate_after_commit(session: AsyncSession, *zone_ids: Optional[int]) -> None:
+        """invalidate, deferred until the session's transaction commits.
+
+        Invalidating earlier would let a concurrent read refill the index
+        from the state before the write.
+        """
+        ConManager.after_commit(session, lambda: AvailabilityIndex.invalidate(*zone_ids))
+
+    @staticmethod
+    def invalidate_all() -> None:
+        AvailabilityIndex._epoch += 1
+        _zones.clear()
@@ -1,10 +1,12 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from src.repositories.delivery import DeliveryRepo
 from src.repositories.appointment import AppointmentRepo
-from src.repositories.grain import GrainRepo
+from src.repositories.capacityreservation import CapacityReservationRepo
 from src.models.delivery import DeliveryCreate
-from src.HTTPBaseException import HTTPBaseException
+from src.config.database import ConManager
+from src.utils.export import EXPORT_BATCH_SIZE
 from fastapi import HTTPException
+from datetime import datetime
 from typing import Optional, List
 import logging
 
@@ -20,15 +22,27 @@ class DeliveryService:
         from src.repositories.storagezone import StorageZoneRepo
         
         try:
+            ConManager.use_primary(session)
+
+            is_warehouse_admin = (
+                current_user and current_user.role == UserRole.WAREHOUSE_ADMIN
+            )
+
             # Verify appointment exists
             appointment = await AppointmentRepo.get_by_id(
-                session, data.appointment_id
+                session,
+                data.appointment_id,
+                include=("warehouse",) if is_warehouse_admin else None,
             )
             
             # Check warehouse admin access
-            if current_user and current_user.role == UserRole.WAREHOUSE_ADMIN:
-                zone = await StorageZoneRepo.get_by_id(session, appointment.zone_id)
-                warehouse = await WarehouseRepo.get_by_id(session, zone.warehouse_id)
+            if is_warehouse_admin:
+                zone = appointment.zone
+                if zone is None:
+                    raise StorageZoneRepo.StorageZoneNotFound()
+                warehouse = zone.warehouse
+                if warehouse is None:
+                    raise WarehouseRepo.WarehouseNotFound()
                 
                 if warehouse.manager_id != current_user.user_id:
                     raise HTTPException(
@@ -36,7 +50,12 @@ class DeliveryService:
                         detail="You can only create deliveries for appointments in your own warehouse"
                     )
             
-            delivery = await DeliveryRepo.create(session, data)
+            # The delivered grain now occupies the capacity reserved on accept
+            async with ConManager.unit_of_work(session):
+                delivery = await DeliveryRepo.create(session, data, commit=False)
+                await CapacityReservationRepo.settle(
+                    session, data.appointment_id, commit=False
+                )
             return delivery
         except HTTPException:
             raise
@@ -53,47 +72,22 @@ class DeliveryService:
         skip: int = 0,
         limit: int = 100,
         current_user=None,
+        cursor: Optional[str] = None,
     ):
         """Get all deliveries with optional filters"""
         from src.models.user import UserRole
         
         try:
-            # If warehouse admin, we need to filter by their warehouse
-            # This requires getting all appointments in their zones
+            # If warehouse admin, only deliveries from the warehouses they manage
             if current_user and current_user.role == UserRole.WAREHOUSE_ADMIN:
-                from src.repositories.warehouse import WarehouseRepo
-                from src.repositories.storagezone import StorageZoneRepo
-                from src.repositories.appointment import AppointmentRepo
-                
-                # Get all zones for this warehouse admin
-                warehouses = await WarehouseRepo.get_all(
-                    session, manager_id=current_user.user_id
+                return await DeliveryRepo.get_all(
+                    session=session,
+                    appointment_id=appointment_id,
+                    skip=skip,
+                    limit=limit,
+                    cursor=cursor,
+                    manager_id=current_user.user_id,
                 )
-                if not warehouses:
-                    return []
-                
-                warehouse_id = warehouses[0].warehouse_id
-                zones = await StorageZoneRepo.get_all(session, warehouse_id=warehouse_id)
-                zone_ids = [z.zone_id for z in zones]
-                
-                if not zone_ids:
-                    return []
-                
-                # Get all appointments in these zones
-                all_deliveries = []
-                for z_id in zone_ids:
-                    appointments = await AppointmentRepo.get_all(session, zone_id=z_id)
-                    for apt in appointments:
-                        # Get deliveries for this appointment
-                        deliveries = await DeliveryRepo.get_all(
-                            session=session,
-                            appointment_id=apt.appointment_id,
-                            skip=0,
-                            limit=1000,
-                        )
-                        all_deliveries.extend(deliveries)
-                
-                return all_deliveries[skip:skip+limit]
             
             deliveries = await DeliveryRepo.get_all(
                 session=session,
@@ -101,45 +95,69 @@ class DeliveryService:
                 farmer_id=farmer_id,
                 skip=skip,
                 limit=limit,
+                cursor=cursor,
             )
             return deliveries
         except Exception as e:
             logging.exception(f"Error getting deliveries: {e}")
             raise
 
+    @staticmethod
+    async def export_deliveries(
+        session: AsyncSession,
+        current_user,
+        zone_id: Optional[int] = None,
+        farmer_id: Optional[int] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+    ):
+        """Open a streaming result of the deliveries current_user may export"""
+        from src.models.user import UserRole
+
+        manager_id = None
+        if current_user.role == UserRole.WAREHOUSE_ADMIN:
+            manager_id = current_user.user_id
+        elif current_user.role == UserRole.FARMER:
+            farmer_id = current_user.user_id
+
+        return await DeliveryRepo.stream_rows(
+            session,
+            zone_id=zone_id,
+            farmer_id=farmer_id,
+            manager_id=manager_id,
+            created_from=created_from,
+            created_to=created_to,
+            batch_size=EXPORT_BATCH_SIZE,
+        )
+
     @staticmethod
     async def get_my_deliveries(
-        session: AsyncSession, farmer_id: int
+        session: AsyncSession,
+        farmer_id: int,
+        limit: int = 100,
+        cursor: Optional[str] = None,
     ):
         """Get deliveries for a specific farmer with related data formatted for frontend"""
         try:
             deliveries = await DeliveryRepo.get_all(
-                session=session, farmer_id=farmer_id
+                session=session,
+                farmer_id=farmer_id,
+                limit=limit,
+                cursor=cursor,
+                include=("appointment", "grain"),
             )
 
             # Format deliveries with related data
             formatted_deliveries = []
             for delivery in deliveries:
-                # Get appointment and related data with error handling
-                try:
-                    appointment = await AppointmentRepo.get_by_id(
-                        session, delivery.appointment_id
-                    )
-                    if not appointment:
-                        logging.warning(f"Appointment {delivery.appointment_id} not found for delivery {delivery.delivery_id}")
-                        continue
-                except (HTTPBaseException, HTTPException, Exception) as e:
-                    logging.warning(f"Error getting appointment {delivery.appointment_id} for delivery {delivery.delivery_id}: {e}")
+                appointment = delivery.appointment
+                if appointment is None:
+                    logging.warning(f"Appointment {delivery.appointment_id} not found for delivery {delivery.delivery_id}")
                     continue
 
-                grain = None
-                try:
-                    grain = await GrainRepo.get_by_id(
-                        session, appointment.grain_type_id
-                    )
-                except (HTTPBaseException, HTTPException, Exception) as e:
-                    logging.warning(f"Grain {appointment.grain_type_id} not found for appointment {appointment.appointment_id}: {e}")
-                    grain = None
+                grain = appointment.grain_type
+                if grain is None:
+                    logging.warning(f"Grain {appointment.grain_type_id} not found for appointment {appointment.appointment_id}")
 
                 formatted_deliveries.append(
                     {
@@ -176,18 +194,27 @@ class DeliveryService:
         from src.repositories.storagezone import StorageZoneRepo
         
         try:
-            delivery = await DeliveryRepo.get_by_id(session, delivery_id)
+            is_warehouse_admin = (
+                current_user and current_user.role == UserRole.WAREHOUSE_ADMIN
+            )
+            delivery = await DeliveryRepo.get_by_id(
+                session,
+                delivery_id,
+                include=("warehouse",) if is_warehouse_admin else None,
+            )
             
             # Check warehouse admin access
-            if current_user and current_user.role == UserRole.WAREHOUSE_ADMIN:
-                # Get appointment for this delivery
-                appointment = await AppointmentRepo.get_by_id(
-                    session, delivery.appointment_id
-                )
-                # Get zone for this appointment
-                zone = await StorageZoneRepo.get_by_id(session, appointment.zone_id)
-                # Get warehouse for this zone
-                warehouse = await WarehouseRepo.get_by_id(session, zone.warehouse_id)
+            if is_warehouse_admin:
+                # Appointment -> zone -> warehouse, loaded with the delivery
+                appointment = delivery.appointment
+                if appointment is None:
+                    raise AppointmentRepo.AppointmentNotFound()
+                zone = appointment.zone
+                if zone is None:
+                    raise StorageZoneRepo.StorageZoneNotFound()
+                warehouse = zone.warehouse
+                if warehouse is None:
+                    raise WarehouseRepo.WarehouseNotFound()
                 
                 if warehouse.manager_id != current_user.user_id:
                     raise HTTPException(
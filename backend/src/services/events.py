@@ -0,0 +1,146 @@
+import asyncio
+import json
+import logging
+from typing import Optional
+
+import asyncpg
+
+from src.config.database import Database
+from src.config.settings import settings
+from src.database.db import UserRole
+from src.services.availability import AvailabilityIndex
+
+logger = logging.getLogger(__name__)
+
+# Postgres NOTIFY channel carrying committed appointment changes
+APPOINTMENT_EVENTS_CHANNEL = "appointment_events"
+
+# Comment line sent to idle streams so proxies keep them open
+HEARTBEAT_SECONDS = 15
+# Events buffered per subscriber before it is told to resync
+SUBSCRIBER_QUEUE_SIZE = 100
+# Delay before reconnecting a lost listener connection
+RECONNECT_SECONDS = 5
+
+_RESYNC = {"type": "resync"}
+
+
+class _Subscriber:
+    def __init__(self, user):
+        self.user_id = user.user_id
+        self.role = user.role
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def wants(self, event: dict) -> bool:
+        if self.role == UserRole.ADMIN:
+            return True
+        if self.role == UserRole.WAREHOUSE_ADMIN:
+            return event.get("manager_id") == self.user_id
+        return event.get("farmer_id") == self.user_id
+
+    def push(self, event: dict) -> None:
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Too slow to keep up: drop the backlog, the client refetches once
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(_RESYNC)
+
+
+class AppointmentEventService:
+    """Fan-out of committed appointment changes to Server-Sent Events streams.
+
+    Writers NOTIFY in their transaction (AppointmentRepo.notify_changes);
+    each worker process holds one LISTEN connection and forwards every
+    notification to the matching local subscribers, so events reach clients
+    whichever worker handled the write.
+    """
+
+    _subscribers: set = set()
+    _listener: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def start() -> None:
+        if AppointmentEventService._listener is None:
+            AppointmentEventService._listener = asyncio.create_task(
+                AppointmentEventService._listen()
+            )
+
+    @staticmethod
+    async def stop() -> None:
+        task = AppointmentEventService._listener
+        AppointmentEventService._listener = None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    @staticmethod
+    async def _listen() -> None:
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(
+                    f"{Database.BASE_URL}/{settings.POSTGRES_DB}"
+                )
+                await connection.add_listener(
+                    APPOINTMENT_EVENTS_CHANNEL, AppointmentEventService._dispatch
+                )
+                logger.info("Listening for appointment events")
+                # Idle LISTEN connections only notice a dead peer on I/O
+                while True:
+                    await asyncio.sleep(HEARTBEAT_SECONDS)
+                    await connection.execute("SELECT 1")
+            except asyncio.CancelledError:
+                if connection is not None:
+                    await connection.close()
+                raise
+            except Exception as e:
+                logger.warning(f"Appointment event listener lost: {e}")
+                if connection is not None and not connection.is_closed():
+                    connection.terminate()
+                # Changes made while disconnected are missed, tell clients
+                AppointmentEventService._broadcast(_RESYNC)
+                AvailabilityIndex.invalidate_all()
+            await asyncio.sleep(RECONNECT_SECONDS)
+
+    @staticmethod
+    def _dispatch(connection, pid, channel, payload: str) -> None:
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            logger.warning(f"Ignoring malformed appointment event: {payload}")
+            return
+        event["type"] = "appointment"
+        # Bookings made by any process change that zone's free slots
+        AvailabilityIndex.invalidate(event.get("zone_id"))
+        for subscriber in list(AppointmentEventService._subscribers):
+            if subscriber.wants(event):
+                subscriber.push(event)
+
+    @staticmethod
+    def _broadcast(event: dict) -> None:
+        for subscriber in list(AppointmentEventService._subscribers):
+            subscriber.push(event)
+
+    @staticmethod
+    async def stream(user):
+        """SSE frames of the appointment changes visible to user, until disconnect"""
+        subscriber = _Subscriber(user)
+        AppointmentEventService._subscribers.add(subscriber)
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(
+                        subscriber.queue.get(), timeout=HEARTBEAT_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            AppointmentEventService._subscribers.discard(subscriber)
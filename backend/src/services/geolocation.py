@@ -1,4 +1,6 @@
+import heapq
 import math
+from itertools import groupby
 from typing import List, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from src.repositories.warehouse import WarehouseRepo
@@ -50,79 +52,70 @@ class GeolocationService:
         Returns warehouses with distance, zones, and capacity information.
         """
         try:
-            # Get all active warehouses
-            warehouses = await WarehouseRepo.get_all(
+            # Active zones for the grain type with their active warehouse, as
+            # plain read-only rows from one query, ordered by warehouse
+            rows = await StorageZoneRepo.get_rows_with_warehouse(
                 session=session,
-                skip=0,
-                limit=1000,  # Get all warehouses to calculate distances
+                grain_type_id=grain_type_id,
                 status=ZoneStatus.ACTIVE,
+                warehouse_status=ZoneStatus.ACTIVE,
             )
 
-            # Filter warehouses that have zones for the specified grain type
+            # Get grain type name if grain_type_id is provided
+            grain_name = None
+            if grain_type_id:
+                try:
+                    grain = await GrainRepo.get_by_id(session, grain_type_id)
+                    grain_name = grain.name
+                except Exception:
+                    pass
+
+            # Only warehouses that have zones for this grain type show up here
             warehouse_data = []
-            for warehouse in warehouses:
-                # Get zones for this warehouse
-                zones = await StorageZoneRepo.get_all(
-                    session=session,
-                    warehouse_id=warehouse.warehouse_id,
-                    grain_type_id=grain_type_id,
-                    status=ZoneStatus.ACTIVE,
+            for _, group in groupby(rows, key=lambda row: row.warehouse_id):
+                zones = list(group)
+                warehouse = zones[0]
+
+                # Calculate distance
+                distance = calculate_distance(
+                    latitude,
+                    longitude,
+                    warehouse.y_float,
+                    warehouse.x_float,
+                )
+
+                # Calculate total capacity and available capacity
+                total_capacity = sum(zone.total_capacity for zone in zones)
+                available_capacity = sum(zone.available_capacity for zone in zones)
+
+                warehouse_data.append(
+                    {
+                        "id": warehouse.warehouse_id,
+                        "name": warehouse.warehouse_name,
+                        "location": warehouse.location,
+                        "latitude": warehouse.y_float,
+                        "longitude": warehouse.x_float,
+                        "distance": round(distance, 2),
+                        "zones": [
+                            {
+                                "zone_id": zone.zone_id,
+                                "name": zone.name,
+                                "total_capacity": zone.total_capacity,
+                                "available_capacity": zone.available_capacity,
+                                "grain_type_id": zone.grain_type_id,
+                            }
+                            for zone in zones
+                        ],
+                        "grainType": grain_name,
+                        "maxCapacity": total_capacity,
+                        "currentStock": total_capacity - available_capacity,
+                        "availableCapacity": available_capacity,
+                        "address": warehouse.location,
+                    }
                 )
 
-                # Only include warehouses that have zones for this grain type
-                if zones:
-                    # Calculate distance
-                    distance = calculate_distance(
-                        latitude,
-                        longitude,
-                        warehouse.y_float,
-                        warehouse.x_float,
-                    )
-
-                    # Calculate total capacity and available capacity
-                    total_capacity = sum(zone.total_capacity for zone in zones)
-                    available_capacity = sum(
-                        zone.available_capacity for zone in zones
-                    )
-
-                    # Get grain type name if grain_type_id is provided
-                    grain_name = None
-                    if grain_type_id:
-                        try:
-                            grain = await GrainRepo.get_by_id(session, grain_type_id)
-                            grain_name = grain.name
-                        except Exception:
-                            pass
-
-                    warehouse_data.append(
-                        {
-                            "id": warehouse.warehouse_id,
-                            "name": warehouse.name,
-                            "location": warehouse.location,
-                            "latitude": warehouse.y_float,
-                            "longitude": warehouse.x_float,
-                            "distance": round(distance, 2),
-                            "zones": [
-                                {
-                                    "zone_id": zone.zone_id,
-                                    "name": zone.name,
-                                    "total_capacity": zone.total_capacity,
-                                    "available_capacity": zone.available_capacity,
-                                    "grain_type_id": zone.grain_type_id,
-                                }
-                                for zone in zones
-                            ],
-                            "grainType": grain_name,
-                            "maxCapacity": total_capacity,
-                            "currentStock": total_capacity - available_capacity,
-                            "availableCapacity": available_capacity,
-                            "address": warehouse.location,
-                        }
-                    )
-
-            # Sort by distance and limit results
-            warehouse_data.sort(key=lambda x: x["distance"])
-            return warehouse_data[:limit]
+            # Nearest first, limited
+            return heapq.nsmallest(limit, warehouse_data, key=lambda x: x["distance"])
 
         except Exception as e:
             logging.exception(f"Error getting nearest warehouses: {e}")
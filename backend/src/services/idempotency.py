@@ -0,0 +1,86 @@
+import hashlib
+import logging
+from typing import Any, Awaitable, Callable
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.config.database import ConManager
+from src.config.settings import settings
+from src.repositories.idempotencykey import IdempotencyKeyRepo
+
+logger = logging.getLogger(__name__)
+
+# Attempts to claim a key whose owner rolled back between our claim and read
+_CLAIM_ATTEMPTS = 3
+
+
+class IdempotencyService:
+    @staticmethod
+    def fingerprint(data: BaseModel) -> str:
+        """Hash of a request body, to detect a key reused with another payload"""
+        return hashlib.sha256(data.model_dump_json().encode()).hexdigest()
+
+    @staticmethod
+    async def run(
+        session: AsyncSession,
+        key: str,
+        user_id: int,
+        endpoint: str,
+        request_hash: str,
+        handler: Callable[[], Awaitable[Any]],
+    ):
+        """Run handler at most once per (key, user, endpoint).
+
+        The key is claimed, the handler's writes made and the response stored
+        in one transaction on the request session, so the key commits exactly
+        when the write does. A duplicate sent meanwhile waits on the key row,
+        then replays the stored response once the first request commits. If
+        the handler raises, the claim is rolled back with everything else and
+        the client can retry with the same key.
+        """
+        ConManager.use_primary(session)
+        for _ in range(_CLAIM_ATTEMPTS):
+            async with ConManager.unit_of_work(session):
+                claimed = await IdempotencyKeyRepo.claim(
+                    session,
+                    key,
+                    user_id,
+                    endpoint,
+                    request_hash,
+                    settings.IDEMPOTENCY_TTL_SECONDS,
+                )
+                if claimed is not None:
+                    # The handler's own unit of work joins this one
+                    result = await handler()
+                    await IdempotencyKeyRepo.complete(
+                        session,
+                        key,
+                        user_id,
+                        endpoint,
+                        200,
+                        jsonable_encoder(result),
+                        commit=False,
+                    )
+                    return result
+
+                stored = await IdempotencyKeyRepo.get(session, key, user_id, endpoint)
+
+            if stored is None:
+                # The owner rolled back after our claim conflicted; try again
+                continue
+            if stored.request_hash != request_hash:
+                raise IdempotencyKeyRepo.KeyReused()
+            return JSONResponse(
+                content=stored.response,
+                status_code=stored.status_code,
+                headers={"Idempotent-Replayed": "true"},
+            )
+        raise IdempotencyKeyRepo.ClaimError()
+
+    @staticmethod
+    async def purge_expired(session: AsyncSession) -> int:
+        """Delete keys past their expiry"""
+        return await IdempotencyKeyRepo.purge_expired(session)
@@ -3,7 +3,9 @@ import logging
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 from src.config.database import ConManager
+from src.config.settings import settings
 from src.services.timeslot import TimeSlotService
+from src.services.idempotency import IdempotencyService
 
 logger = logging.getLogger(__name__)
 
@@ -18,8 +20,11 @@ async def generate_weekly_timeslots():
         # Get a database session
         async for session in ConManager.get_session():
             try:
-                slots = await TimeSlotService.generate_timeslots_for_next_week(session)
-                logger.info(f"Successfully generated {len(slots)} time slots")
+                result = await TimeSlotService.generate_timeslots_for_next_week(session)
+                logger.info(
+                    f"Successfully generated {result['created']} time slots "
+                    f"({result['skipped']} already existed)"
+                )
             except Exception as e:
                 logger.exception(f"Error generating time slots: {e}")
             finally:
@@ -30,20 +35,54 @@ async def generate_weekly_timeslots():
         logger.exception(f"Error in scheduled task: {e}")
 
 
+async def purge_idempotency_keys():
+    """Background task to delete expired idempotency keys"""
+    try:
+        async for session in ConManager.get_session():
+            try:
+                deleted = await IdempotencyService.purge_expired(session)
+                logger.info(f"Purged {deleted} expired idempotency keys")
+            except Exception as e:
+                logger.exception(f"Error purging idempotency keys: {e}")
+            finally:
+                await session.close()
+                break
+
+    except Exception as e:
+        logger.exception(f"Error in scheduled task: {e}")
+
+
 async def setup_scheduler():
     """Setup and start the scheduler"""
     try:
+        # Virtual time slots are computed from templates, nothing to generate
+        generate_slots = settings.TIMESLOT_MODE == "pregenerated"
+
         # Schedule task to run every 3 days
+        if generate_slots:
+            scheduler.add_job(
+                generate_weekly_timeslots,
+                trigger=IntervalTrigger(days=3),
+                id="generate_weekly_timeslots",
+                name="Generate time slots for next week",
+                replace_existing=True,
+                max_instances=1,  # Prevent overlapping executions
+            )
+        
         scheduler.add_job(
-            generate_weekly_timeslots,
-            trigger=IntervalTrigger(days=3),
-            id="generate_weekly_timeslots",
-            name="Generate time slots for next week",
+            purge_idempotency_keys,
+            trigger=IntervalTrigger(hours=1),
+            id="purge_idempotency_keys",
+            name="Purge expired idempotency keys",
             replace_existing=True,
-            max_instances=1,  # Prevent overlapping executions
+            max_instances=1,
         )
-        
+
         scheduler.start()
+        if not generate_slots:
+            logger.info("Scheduler started: virtual time slots, no slot generation")
+            return
+
         logger.info("Scheduler started: Time slots will be generated every 3 days for the next week")
         
         # Also run immediately on startup to ensure slots are available
@@ -3,6 +3,7 @@ from src.models.storagezone import StorageZoneCreate, StorageZoneUpdate, ZoneSta
 from src.repositories.storagezone import StorageZoneRepo
 from src.repositories.warehouse import WarehouseRepo
 from src.repositories.grain import GrainRepo
+from src.services.availability import AvailabilityIndex
 from typing import Optional
 import logging
 
@@ -33,6 +34,7 @@ class StorageService:
         warehouse_id: Optional[int] = None,
         grain_type_id: Optional[int] = None,
         status: Optional[ZoneStatus] = None,
+        cursor: Optional[str] = None,
     ):
         try:
             return await StorageZoneRepo.get_all(
@@ -42,6 +44,7 @@ class StorageService:
                 warehouse_id=warehouse_id,
                 grain_type_id=grain_type_id,
                 status=status,
+                cursor=cursor,
             )
         except StorageZoneRepo.GetAllError:
             raise
@@ -55,4 +58,5 @@ class StorageService:
     async def update_zone(session: AsyncSession, data: StorageZoneUpdate, zone_id: int):
         updated_data = data.model_dump(exclude_unset=True)
         zone = await StorageZoneRepo.update(session, zone_id, **updated_data)
+        AvailabilityIndex.invalidate(zone_id)
         return zone
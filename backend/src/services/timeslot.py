@@ -1,21 +1,33 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from src.models.timeslot import TimeSlotCreate, TimeSlotUpdate, TimeSlotStatus
+from src.models.timeslot import TimeSlotCreate, TimeSlotUpdate
 from src.repositories.timeslot import TimeSlotRepo
-from src.repositories.timeslottemplate import TimeSlotTemplateRepo
 from src.repositories.storagezone import StorageZoneRepo
-from src.repositories.appointment import AppointmentRepo
-from src.database.db import ZoneStatus, AppointmentStatus
+from src.repositories.timeslottemplate import TimeSlotTemplateRepo
+from src.services.availability import (
+    AvailabilityIndex,
+    fetch_available,
+    slot_dict,
+    virtual_slots,
+)
+from src.utils.filters import date_range
+from src.config.database import ConManager
+from fastapi import HTTPException
 from typing import Optional
-from datetime import datetime, time, timedelta
+from datetime import date, datetime, time, timedelta, timezone
 import logging
 
 
+# Longest date range /time/availability answers in one call
+AVAILABILITY_MAX_DAYS = 31
+
+
 class TimeSlotService:
     @staticmethod
     async def create_time(session: AsyncSession, data: TimeSlotCreate):
         try:
             zone = await StorageZoneRepo.get_by_id(session, data.zone_id)
             timeslot = await TimeSlotRepo.create(session, data)
+            AvailabilityIndex.invalidate(timeslot.zone_id)
             return timeslot
         except Exception as e:
             await session.rollback()
@@ -28,11 +40,12 @@ class TimeSlotService:
         zone_id: int,
         skip: int = 0,
         limit: int = 100,
+        cursor: Optional[str] = None,
     ):
         try:
             zone = await StorageZoneRepo.get_by_id(session, zone_id)
             times = await TimeSlotRepo.get_all(
-                session, skip=skip, limit=limit, zone_id=zone_id
+                session, skip=skip, limit=limit, zone_id=zone_id, cursor=cursor
             )
             return times
         except Exception as e:
@@ -44,56 +57,144 @@ class TimeSlotService:
         session: AsyncSession,
         zone_id: int,
         grain_type_id: Optional[int] = None,
+        limit: int = 1000,
+        cursor: Optional[str] = None,
     ):
-        """Get available time slots for a zone, optionally filtered by grain type"""
+        """Get available time slots for a zone, optionally filtered by grain type.
+
+        Served from the in-process AvailabilityIndex; only a cold or
+        invalidated zone costs a database round trip.
+        """
         try:
-            zone = await StorageZoneRepo.get_by_id(session, zone_id)
+            zone_slots = await AvailabilityIndex.get(session, zone_id)
             
             # If grain_type_id is provided, verify the zone supports this grain type
-            if grain_type_id and zone.grain_type_id != grain_type_id:
+            if grain_type_id and zone_slots.grain_type_id != grain_type_id:
                 return []
-            
-            # Get all active time slots for this zone
-            times = await TimeSlotRepo.get_all(
-                session, skip=0, limit=1000, zone_id=zone_id, status=TimeSlotStatus.ACTIVE
+
+            if zone_slots.complete:
+                return zone_slots.page(limit, cursor)
+
+            # Too many free slots to index: one paginated query
+            times = await fetch_available(
+                session,
+                zone_id,
+                start_after=datetime.utcnow(),
+                limit=limit,
+                cursor=cursor,
             )
-            
-            # Filter out time slots that are already booked or in the past
-            # Only consider appointments with PENDING or ACCEPTED status as "booked"
-            now = datetime.utcnow()
-            available_slots = []
-            for time_slot in times:
-                # Skip time slots that have already passed
-                if time_slot.start_at < now:
-                    continue
-                
-                # Check if this time slot has an active appointment (pending or accepted)
-                appointment = await AppointmentRepo.get_by_timeslot(session, time_slot.time_id)
-                if appointment and appointment.status in [AppointmentStatus.PENDING, AppointmentStatus.ACCEPTED]:
-                    # Skip timeslots with active appointments
-                    continue
-                
-                # Format the time slot for frontend
-                available_slots.append({
-                    "time_id": time_slot.time_id,
-                    "zone_id": time_slot.zone_id,
-                    "start_at": time_slot.start_at.isoformat(),
-                    "end_at": time_slot.end_at.isoformat(),
-                    "date": time_slot.start_at.strftime("%Y-%m-%d"),
-                    "startTime": time_slot.start_at.strftime("%H:%M"),
-                    "endTime": time_slot.end_at.strftime("%H:%M"),
-                    "status": time_slot.status.value,
-                    "available": True,
-                })
-            
-            # Sort by start_at (earliest first)
-            available_slots.sort(key=lambda x: x["start_at"])
-            
-            return available_slots
+            return [slot_dict(time_slot) for time_slot in times]
         except Exception as e:
             logging.exception(f"Error getting available time slots: {e}")
             raise
 
+    @staticmethod
+    async def get_availability(
+        session: AsyncSession,
+        date_from: date,
+        date_to: date,
+        warehouse_id: Optional[int] = None,
+        grain_type_id: Optional[int] = None,
+    ):
+        """Bookable slots of many zones over a date range, grouped by day.
+
+        Every day of the range is listed, days without a free slot included.
+        """
+        if warehouse_id is None and grain_type_id is None:
+            raise HTTPException(
+                status_code=400, detail="warehouse_id or grain_type_id is required"
+            )
+        if date_to < date_from:
+            raise HTTPException(
+                status_code=400, detail="date_to must not be before date_from"
+            )
+        if (date_to - date_from).days >= AVAILABILITY_MAX_DAYS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Date range is limited to {AVAILABILITY_MAX_DAYS} days",
+            )
+
+        try:
+            start, end = date_range(date_from, date_to)
+            if virtual_slots():
+                # start_after is exclusive here: keep a slot at midnight
+                rows = await TimeSlotRepo.get_virtual_available(
+                    session,
+                    start_after=max(start - timedelta(microseconds=1), datetime.utcnow()),
+                    start_before=end,
+                    warehouse_id=warehouse_id,
+                    grain_type_id=grain_type_id,
+                )
+            else:
+                rows = await TimeSlotRepo.get_available_in_zones(
+                    session,
+                    start_after=max(start, datetime.utcnow()),
+                    start_before=end,
+                    warehouse_id=warehouse_id,
+                    grain_type_id=grain_type_id,
+                )
+
+            days = {
+                date_from + timedelta(days=offset): []
+                for offset in range((date_to - date_from).days + 1)
+            }
+            for row in rows:
+                days[row.start_at.date()].append({
+                    "time_id": row.time_id,
+                    "zone_id": row.zone_id,
+                    "zone_name": row.zone_name,
+                    "grain_type_id": row.grain_type_id,
+                    "start_at": row.start_at.isoformat(),
+                    "end_at": row.end_at.isoformat(),
+                    "startTime": row.start_at.strftime("%H:%M"),
+                    "endTime": row.end_at.strftime("%H:%M"),
+                })
+
+            return [
+                {"date": day.isoformat(), "available": len(slots), "slots": slots}
+                for day, slots in days.items()
+            ]
+        except Exception as e:
+            logging.exception(f"Error getting availability: {e}")
+            raise
+
+    @staticmethod
+    async def materialize(
+        session: AsyncSession, zone_id: int, start_at: datetime, commit: bool = True
+    ):
+        """Slot row for booking a virtual slot, inserted if nobody booked it yet.
+
+        start_at must be in the future and match a template of the (active)
+        zone on that weekday; the template gives the end time.
+        """
+        if not virtual_slots():
+            raise HTTPException(
+                status_code=400,
+                detail="Booking by start time needs TIMESLOT_MODE=virtual, send timeSlotId",
+            )
+        if start_at.tzinfo is not None:
+            # Slots are stored as naive UTC
+            start_at = start_at.astimezone(timezone.utc).replace(tzinfo=None)
+        if start_at <= datetime.utcnow():
+            raise HTTPException(status_code=403, detail="Cannot use this time")
+
+        template = await TimeSlotTemplateRepo.get_at(
+            session, zone_id, start_at.weekday(), start_at.time()
+        )
+        if template is None:
+            raise HTTPException(
+                status_code=404, detail="No time slot template at this time"
+            )
+
+        ConManager.use_primary(session)
+        return await TimeSlotRepo.materialize(
+            session,
+            zone_id,
+            start_at,
+            datetime.combine(start_at.date(), template.end_time),
+            commit=commit,
+        )
+
     @staticmethod
     async def get_time(session: AsyncSession, time_id: int):
         time = await TimeSlotRepo.get_by_id(session, time_id)
@@ -103,83 +204,47 @@ class TimeSlotService:
     async def updated_time(session: AsyncSession, data: TimeSlotUpdate, time_id: int):
         updated_time = data.model_dump(exclude_unset=True)
         time = await TimeSlotRepo.update(session, time_id, **updated_time)
+        # Covers a slot moved to another zone: the old zone is unknown here
+        AvailabilityIndex.invalidate_all()
         return time
 
     @staticmethod
     async def delete_time(session: AsyncSession, time_id: int):
         time = await TimeSlotRepo.soft_delete(session, time_id)
+        AvailabilityIndex.invalidate_all()
         return time
     @staticmethod
+    async def generate_timeslots(session: AsyncSession, first_day: date, days: int):
+        """
+        Create the template slots of active zones for days days from first_day
+        with one set-based statement. Slots that already exist are skipped by
+        the unique (zone_id, start_at) index, so overlapping or concurrent
+        runs are safe. Returns the created and skipped counts per zone.
+        """
+        ConManager.use_primary(session)
+        counts = await TimeSlotRepo.generate_from_templates(session, first_day, days)
+        zones = [
+            {"zone_id": row.zone_id, "created": row.created, "skipped": row.skipped}
+            for row in counts
+        ]
+        created = sum(zone["created"] for zone in zones)
+        skipped = sum(zone["skipped"] for zone in zones)
+        AvailabilityIndex.invalidate(
+            *(zone["zone_id"] for zone in zones if zone["created"])
+        )
+        logging.info(
+            f"Generated {created} time slots for {len(zones)} zones from {first_day} "
+            f"over {days} days, {skipped} already existed"
+        )
+        return {"created": created, "skipped": skipped, "zones": zones}
+
+    @staticmethod
     async def generate_timeslots_for_next_day(session: AsyncSession):
         """Generate time slots for tomorrow based on templates"""
         try:
             tomorrow = datetime.utcnow().date() + timedelta(days=1)
-            weekday = tomorrow.weekday()  # 0 = Monday, 6 = Sunday
-            logging.info(f"Generating time slots for {tomorrow} (weekday: {weekday})")
-            
-            templates = await TimeSlotTemplateRepo.get_by_day(session, weekday)
-            logging.info(f"Found {len(templates)} templates for weekday {weekday}")
-
-            if not templates:
-                logging.warning(f"No templates found for weekday {weekday}")
-                return []
-
-            created_slots = []
-            for tpl in templates:
-                try:
-                    logging.info(f"📋 Processing template ID={tpl.template_id}: zone={tpl.zone_id}, day={tpl.day_of_week}, time={tpl.start_time}-{tpl.end_time}")
-                    
-                    # Verify zone exists and is active
-                    zone = await StorageZoneRepo.get_by_id(session, tpl.zone_id)
-                    if zone.status != ZoneStatus.ACTIVE:
-                        logging.info(
-                            f"⏭️  Skipping zone {tpl.zone_id} - zone is not active (status: {zone.status})"
-                        )
-                        continue
-
-                    # Combine date with time, ensuring timezone-aware datetime
-                    start_at = datetime.combine(tomorrow, tpl.start_time)
-                    end_at = datetime.combine(tomorrow, tpl.end_time)
-                    
-                    # Make timezone-aware (UTC)
-                    start_at = start_at.replace(tzinfo=None)
-                    end_at = end_at.replace(tzinfo=None)
-                    
-                    logging.info(f"🔍 Checking for existing slot: zone={tpl.zone_id}, start_at={start_at}")
-
-                    # Check if slot already exists to avoid duplicates
-                    existing = await TimeSlotRepo.get_by_zone_and_start(
-                        session, tpl.zone_id, start_at
-                    )
-                    if existing:
-                        logging.info(f"⏭️  Skipping: Time slot already exists for zone {tpl.zone_id} at {start_at} (existing slot ID: {existing.time_id}, existing start: {existing.start_at})")
-                        continue
-                    
-                    logging.info(f"✅ No existing slot found. Creating new time slot for zone {tpl.zone_id}: {start_at} to {end_at}")
-
-                    # Use TimeSlotCreate model
-                    slot_data = TimeSlotCreate(
-                        zone_id=tpl.zone_id,
-                        start_at=start_at,
-                        end_at=end_at,
-                        status=TimeSlotStatus.ACTIVE,
-                    )
-                    slot = await TimeSlotRepo.create(session, slot_data)
-                    created_slots.append(slot)
-                    logging.info(f"✅ Successfully created time slot ID={slot.time_id} for zone {tpl.zone_id}")
-                except StorageZoneRepo.StorageZoneNotFound:
-                    logging.warning(f"Zone {tpl.zone_id} not found, skipping template {tpl.template_id}")
-                    continue
-                except Exception as e:
-                    logging.exception(
-                        f"Error creating time slot for template {tpl.template_id}: {e}"
-                    )
-                    continue
-
-            logging.info(
-                f"Generated {len(created_slots)} time slots for {tomorrow}"
-            )
-            return created_slots
+            logging.info(f"Generating time slots for {tomorrow} (weekday: {tomorrow.weekday()})")
+            return await TimeSlotService.generate_timeslots(session, tomorrow, 1)
         except Exception as e:
             logging.exception(f"Error in generate_timeslots_for_next_day: {e}")
             raise
@@ -191,77 +256,9 @@ class TimeSlotService:
         Only generates for active zones and skips existing slots.
         """
         try:
-            today = datetime.utcnow().date()
-            created_slots = []
-            logging.info(f"Generating time slots for the next 7 days starting from {today}")
-
-            # Generate slots for each day in the next week (7 days)
-            for day_offset in range(1, 8):  # Days 1-7
-                target_date = today + timedelta(days=day_offset)
-                weekday = target_date.weekday()  # 0 = Monday, 6 = Sunday
-                logging.info(f"Processing day {day_offset}: {target_date} (weekday: {weekday})")
-
-                # Get all templates for this day of week
-                templates = await TimeSlotTemplateRepo.get_by_day(session, weekday)
-                logging.info(f"Found {len(templates)} templates for weekday {weekday}")
-
-                for tpl in templates:
-                    try:
-                        logging.info(f"📋 Processing template ID={tpl.template_id}: zone={tpl.zone_id}, day={tpl.day_of_week}, time={tpl.start_time}-{tpl.end_time} for {target_date}")
-                        
-                        # Verify zone exists and is active
-                        zone = await StorageZoneRepo.get_by_id(session, tpl.zone_id)
-                        if zone.status != ZoneStatus.ACTIVE:
-                            logging.info(
-                                f"⏭️  Skipping zone {tpl.zone_id} on {target_date} - zone is not active (status: {zone.status})"
-                            )
-                            continue
-
-                        start_at = datetime.combine(target_date, tpl.start_time)
-                        end_at = datetime.combine(target_date, tpl.end_time)
-                        
-                        # Make timezone-aware (UTC)
-                        start_at = start_at.replace(tzinfo=None)
-                        end_at = end_at.replace(tzinfo=None)
-                        
-                        logging.info(f"🔍 Checking for existing slot: zone={tpl.zone_id}, start_at={start_at} on {target_date}")
-
-                        # Check if slot already exists to avoid duplicates
-                        existing = await TimeSlotRepo.get_by_zone_and_start(
-                            session, tpl.zone_id, start_at
-                        )
-                        if existing:
-                            logging.info(f"⏭️  Skipping: Time slot already exists for zone {tpl.zone_id} at {start_at} on {target_date} (existing slot ID: {existing.time_id}, existing start: {existing.start_at})")
-                            continue
-                        
-                        logging.info(f"✅ No existing slot found. Creating new time slot for zone {tpl.zone_id} on {target_date}: {start_at} to {end_at}")
-
-                        # Use TimeSlotCreate model (proper pattern)
-                        slot_data = TimeSlotCreate(
-                            zone_id=tpl.zone_id,
-                            start_at=start_at,
-                            end_at=end_at,
-                            status=TimeSlotStatus.ACTIVE,
-                        )
-                        slot = await TimeSlotRepo.create(session, slot_data)
-                        created_slots.append(slot)
-                        logging.info(f"✅ Successfully created time slot ID={slot.time_id} for zone {tpl.zone_id} on {target_date}")
-                    except StorageZoneRepo.StorageZoneNotFound:
-                        logging.warning(
-                            f"Zone {tpl.zone_id} not found, skipping template {tpl.template_id}"
-                        )
-                        continue
-                    except Exception as e:
-                        logging.exception(
-                            f"Error creating time slot for zone {tpl.zone_id} on {target_date}: {e}"
-                        )
-                        continue
-
-            logging.info(
-                f"Generated {len(created_slots)} time slots for the next week (days 1-7)"
-            )
-            return created_slots
+            tomorrow = datetime.utcnow().date() + timedelta(days=1)
+            logging.info(f"Generating time slots for the next 7 days starting from {tomorrow}")
+            return await TimeSlotService.generate_timeslots(session, tomorrow, 7)
         except Exception as e:
             logging.exception(f"Error in generate_timeslots_for_next_week: {e}")
             raise
-
@@ -0,0 +1,44 @@
+import time
+from typing import Any, Hashable
+
+
+class TTLCache:
+    """Small in-process cache whose entries expire ttl seconds after being set.
+
+    Each worker process has its own copy; use it only for data where a few
+    seconds of staleness is acceptable.
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: dict = {}
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return default
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return default
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.ttl <= 0:
+            return
+        if len(self._entries) >= self.maxsize and key not in self._entries:
+            now = time.monotonic()
+            self._entries = {
+                k: entry for k, entry in self._entries.items() if entry[0] > now
+            }
+            if len(self._entries) >= self.maxsize:
+                # Still full: drop the oldest insertion
+                self._entries.pop(next(iter(self._entries)))
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+
+    def discard(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
@@ -0,0 +1,29 @@
+from datetime import date, datetime, time, timedelta
+from enum import Enum
+from typing import List, Optional, Tuple, Type
+
+
+def parse_statuses(value: Optional[str], enum: Type[Enum]) -> Optional[List[Enum]]:
+    """Comma-separated status query value ("completed,cancelled") to enum members.
+
+    Unknown names are ignored, as the single-status filters always did;
+    None when nothing valid is left (no filtering).
+    """
+    if not value:
+        return None
+    statuses = []
+    for name in value.split(","):
+        try:
+            statuses.append(enum(name.strip().lower()))
+        except ValueError:
+            continue
+    return statuses or None
+
+
+def date_range(
+    date_from: Optional[date], date_to: Optional[date]
+) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """Inclusive calendar dates to a half-open [start, end) datetime range"""
+    start = datetime.combine(date_from, time.min) if date_from else None
+    end = datetime.combine(date_to + timedelta(days=1), time.min) if date_to else None
+    return start, end
@@ -0,0 +1,41 @@
+from typing import Iterable, Optional
+
+from fastapi import status
+from sqlalchemy import Select
+from sqlalchemy.orm import selectinload
+
+from src.HTTPBaseException import HTTPBaseException
+
+
+class InvalidInclude(HTTPBaseException):
+    code = status.HTTP_400_BAD_REQUEST
+    message = "Unknown include option"
+
+
+def live(relationship, target):
+    """Relationship restricted to rows of target that are not soft-deleted"""
+    return relationship.and_(target.deleted_at.is_(None))
+
+
+def load(*path):
+    """selectinload chain along path, e.g. load(live(A.zone, Z), live(Z.warehouse, W))"""
+    option = selectinload(path[0])
+    for relationship in path[1:]:
+        option = option.selectinload(relationship)
+    return option
+
+
+def apply_includes(
+    stmt: Select, loaders: dict, include: Optional[Iterable[str]] = None
+) -> Select:
+    """Add the eager loaders named in include to stmt.
+
+    Each name costs one extra SELECT ... WHERE id IN (...) for the whole
+    result, however many rows it has.
+    """
+    if not include:
+        return stmt
+    include = set(include)
+    if not include <= loaders.keys():
+        raise InvalidInclude()
+    return stmt.options(*(loaders[name] for name in sorted(include)))
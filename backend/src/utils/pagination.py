@@ -0,0 +1,72 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Sequence
+
+from fastapi import status
+from sqlalchemy import Select, tuple_
+
+from src.HTTPBaseException import HTTPBaseException
+
+
+class InvalidCursor(HTTPBaseException):
+    code = status.HTTP_400_BAD_REQUEST
+    message = "Invalid pagination cursor"
+
+
+def encode_cursor(sort_value, row_id: int) -> str:
+    """Build an opaque cursor from the sort key and id of the last row of a page"""
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(sort_value), int(row_id)
+    except (ValueError, TypeError):
+        raise InvalidCursor()
+
+
+def paginate(
+    stmt: Select,
+    sort_column,
+    id_column,
+    limit: int,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    descending: bool = True,
+) -> Select:
+    """Order by (sort_column, id_column) and page with a keyset cursor.
+
+    Without a cursor the legacy offset (skip) is applied, so existing
+    clients keep working.
+    """
+    if cursor:
+        sort_value, row_id = decode_cursor(cursor)
+        key = tuple_(sort_column, id_column)
+        after = tuple_(sort_value, row_id)
+        stmt = stmt.where(key < after if descending else key > after)
+    elif skip:
+        stmt = stmt.offset(skip)
+
+    if descending:
+        stmt = stmt.order_by(sort_column.desc(), id_column.desc())
+    else:
+        stmt = stmt.order_by(sort_column.asc(), id_column.asc())
+    return stmt.limit(limit)
+
+
+def next_cursor(
+    rows: Sequence, limit: int, sort_attr: str, id_attr: str
+) -> Optional[str]:
+    """Cursor for the page after rows, or None when this was the last page"""
+    if not rows or len(rows) < limit:
+        return None
+    last = rows[-1]
+    if isinstance(last, dict):
+        return encode_cursor(last[sort_attr], last[id_attr])
+    return encode_cursor(getattr(last, sort_attr), getattr(last, id_attr))
@@ -10,6 +10,11 @@ export const appointmentAPI = {
   accept: (id) => api.put(`/appointment/${id}/accept`),
   refuse: (id) => api.put(`/appointment/${id}/refuse`),
   confirmAttendance: (id) => api.put(`/appointment/${id}/confirm-attendance`),
+  // EventSource cannot send the Authorization header: open it with a short-lived token
+  subscribe: async () => {
+    const { data } = await api.post('/appointment/events/token')
+    return new EventSource(`${api.defaults.baseURL.replace(/\/$/, '')}/appointment/events?token=${encodeURIComponent(data.token)}`)
+  },
 }
 
 